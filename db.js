@@ -8,9 +8,18 @@ if (!fs.existsSync(dataDir)) {
 }
 
 const dbPath = path.join(dataDir, "codingomoku.db");
+const BUSY_TIMEOUT = 30000; // ms a statement waits for another connection's write lock
 const db = new sqlite3.Database(dbPath, () => {
     console.log("Connected to database successfully");
 });
+db.configure("busyTimeout", BUSY_TIMEOUT);
+
+// WAL lets readers go on while results are written, and with it NORMAL
+// synchronous mode is still safe against corruption
+db.serialize(() => {
+    db.run("PRAGMA journal_mode = WAL");
+    db.run("PRAGMA synchronous = NORMAL");
+});
 
 
 const initDb = () => {
@@ -57,40 +66,108 @@ const initDb = () => {
 
 initDb();
 
-const dbRun = (sql, params = []) => {
-    return new Promise((res, rej) => {
-        db.run(sql, params, function(err) {
-            if (err) {
-                rej(err);
-                return;
-            }
-            res({id: this.lastID, changes: this.changes});
+const INSERT_CHUNK_PARAMS = 900; // below SQLite's old 999 variable limit
+
+// Query helpers bound to one connection
+const queries = (connection) => {
+    const dbRun = (sql, params = []) => {
+        return new Promise((res, rej) => {
+            connection.run(sql, params, function(err) {
+                if (err) {
+                    rej(err);
+                    return;
+                }
+                res({id: this.lastID, changes: this.changes});
+            });
         });
-    });
-};
+    };
 
-const dbGet = (sql, params = []) => {
-    return new Promise((res, rej) => {
-        db.get(sql, params, function(err, row) {
-            if (err) {
-                rej(err);
-                return;
-            }
-            res(row);
+    const dbGet = (sql, params = []) => {
+        return new Promise((res, rej) => {
+            connection.get(sql, params, function(err, row) {
+                if (err) {
+                    rej(err);
+                    return;
+                }
+                res(row);
+            });
         });
-    });
-};
+    };
 
-const dbAll = (sql, params = []) => {
-    return new Promise((res, rej) => {
-        db.all(sql, params, function(err, rows) {
-            if (err) {
-                rej(err);
-                return;
-            }
-            res(rows);
+    const dbAll = (sql, params = []) => {
+        return new Promise((res, rej) => {
+            connection.all(sql, params, function(err, rows) {
+                if (err) {
+                    rej(err);
+                    return;
+                }
+                res(rows);
+            });
         });
+    };
+
+    // Inserts rows (arrays of values for columns) with multi-row INSERTs, using
+    // one prepared statement for all full chunks
+    const dbInsertMany = async (table, columns, rows) => {
+        const rowsPerChunk = Math.max(1, Math.floor(INSERT_CHUNK_PARAMS / columns.length));
+        const placeholders = (count) =>
+            Array(count).fill(`(${columns.map(() => "?").join(", ")})`).join(", ");
+        const insert = (count) =>
+            `INSERT INTO ${table} (${columns.join(", ")}) VALUES ${placeholders(count)}`;
+
+        const fullChunks = Math.floor(rows.length / rowsPerChunk);
+        if (fullChunks > 0) {
+            const statement = connection.prepare(insert(rowsPerChunk));
+            try {
+                for (let i = 0; i < fullChunks; i++) {
+                    const chunk = rows.slice(i * rowsPerChunk, (i + 1) * rowsPerChunk);
+                    await new Promise((res, rej) =>
+                        statement.run(chunk.flat(), (err) => (err ? rej(err) : res())),
+                    );
+                }
+            } finally {
+                statement.finalize();
+            }
+        }
+
+        const rest = rows.slice(fullChunks * rowsPerChunk);
+        if (rest.length > 0) {
+            await dbRun(insert(rest.length), rest.flat());
+        }
+    };
+
+    return { dbRun, dbGet, dbAll, dbInsertMany };
+};
+
+const { dbRun, dbGet, dbAll, dbInsertMany } = queries(db);
+
+// Transactions get a connection of their own. Statements of other requests
+// on the shared connection would otherwise join an open transaction (and be
+// rolled back with it); on their own connection they wait for its COMMIT.
+const transactionDb = new sqlite3.Database(dbPath);
+transactionDb.configure("busyTimeout", BUSY_TIMEOUT);
+const transactionQueries = queries(transactionDb);
+
+// Runs work() inside BEGIN IMMEDIATE ... COMMIT, rolling back if it throws.
+// work() gets the query helpers of the transaction's connection and must use
+// them for every statement of the transaction. Transactions are queued, as
+// they all share that one connection.
+let transactionQueue = Promise.resolve();
+const dbTransaction = (work) => {
+    const { dbRun } = transactionQueries;
+    const run = transactionQueue.then(async () => {
+        await dbRun("BEGIN IMMEDIATE");
+        try {
+            const result = await work(transactionQueries);
+            await dbRun("COMMIT");
+            return result;
+        } catch (error) {
+            await dbRun("ROLLBACK").catch(() => {});
+            throw error;
+        }
     });
+    transactionQueue = run.catch(() => {});
+    return run;
 };
 
 (function initTournamentTables() {
@@ -114,9 +191,12 @@ const dbAll = (sql, params = []) => {
                 tournament_id INTEGER NOT NULL,
                 player1 TEXT NOT NULL,
                 player2 TEXT NOT NULL,
+                player1_piece TEXT DEFAULT 'O',
                 winner TEXT,
                 moves TEXT,
                 status TEXT DEFAULT 'pending',
+                worker TEXT,
+                lease_until REAL,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 completed_at TIMESTAMP,
                 FOREIGN KEY (tournament_id) REFERENCES tournaments (id)
@@ -136,6 +216,31 @@ const dbAll = (sql, params = []) => {
             )
         `);
 
+        // Per-bot game statistics, filled in by playing_programs/analytics.py;
+        // tournament_id 0 holds the statistics over all archived games
+        db.run(`
+            CREATE TABLE IF NOT EXISTS bot_stats (
+                tournament_id INTEGER NOT NULL,
+                player TEXT NOT NULL,
+                games INTEGER NOT NULL,
+                wins INTEGER NOT NULL,
+                draws INTEGER NOT NULL,
+                losses INTEGER NOT NULL,
+                games_as_o INTEGER NOT NULL,
+                wins_as_o INTEGER NOT NULL,
+                games_as_x INTEGER NOT NULL,
+                wins_as_x INTEGER NOT NULL,
+                avg_plies REAL NOT NULL,
+                win_chances INTEGER NOT NULL,
+                missed_wins INTEGER NOT NULL,
+                block_chances INTEGER NOT NULL,
+                missed_blocks INTEGER NOT NULL,
+                heatmap TEXT NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (tournament_id, player)
+            )
+        `);
+
         console.log("Tournament tables initialized");
     })
 })();
@@ -145,5 +250,7 @@ module.exports = {
     db,
     dbRun,
     dbGet,
-    dbAll
+    dbAll,
+    dbTransaction,
+    dbInsertMany
 };
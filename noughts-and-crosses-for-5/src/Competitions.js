@@ -111,6 +111,12 @@ function Competitions() {
                             {leaderboardData.tournament.failedMatches}
                         </p>
                     )}
+                    {leaderboardData.tournament.skippedMatches > 0 && (
+                        <p>
+                            <strong>mecze pominięte (rozstrzygnięte wcześniej, ranking według punktów na mecz):</strong>{" "}
+                            {leaderboardData.tournament.skippedMatches}
+                        </p>
+                    )}
                 </div>
             </div>
 
@@ -121,10 +127,15 @@ function Competitions() {
                             <th>Miejsce</th>
                             <th>Program</th>
                             <th>Punkty</th>
+                            <th>Pkt / mecz</th>
                             <th>Wygrane</th>
                             <th>Remisy</th>
                             <th>Przegrane</th>
                             <th>Mecze</th>
+                            <th>Wygrane O / X</th>
+                            <th>Śr. ruchów</th>
+                            <th>Przeoczone wygrane</th>
+                            <th>Przeoczone blokady</th>
                         </tr>
                     </thead>
                     <tbody>
@@ -135,12 +146,37 @@ function Competitions() {
                                 </td>
                                 <td className="player-name">{entry.player}</td>
                                 <td className="points">{entry.points}</td>
+                                <td className="points-per-game">
+                                    {entry.pointsPerGame.toFixed(2)}
+                                </td>
                                 <td className="wins">{entry.wins}</td>
                                 <td className="draws">{entry.draws}</td>
                                 <td className="losses">{entry.losses}</td>
                                 <td className="total-matches">
                                     {entry.matchesPlayed}
                                 </td>
+                                {entry.stats ? (
+                                    <>
+                                        <td className="side-wins">
+                                            {entry.stats.wins_as_o}/{entry.stats.games_as_o}
+                                            {" · "}
+                                            {entry.stats.wins_as_x}/{entry.stats.games_as_x}
+                                        </td>
+                                        <td className="avg-plies">
+                                            {entry.stats.avg_plies.toFixed(1)}
+                                        </td>
+                                        <td className="missed-wins">
+                                            {entry.stats.missed_wins}/{entry.stats.win_chances}
+                                        </td>
+                                        <td className="missed-blocks">
+                                            {entry.stats.missed_blocks}/{entry.stats.block_chances}
+                                        </td>
+                                    </>
+                                ) : (
+                                    <td className="no-stats" colSpan={4}>
+                                        —
+                                    </td>
+                                )}
                             </tr>
                         ))}
                     </tbody>
@@ -60,12 +60,15 @@ function FirstScreen() {
             );
             setLastMove(null);
 
+            // The server streams the moves as the bots play them, one JSON
+            // object per line
             const response = await fetch(
                 `${API_URL}/api/start-bot-game`,
                 {
                     method: "POST",
                     headers: {
                         "Content-Type": "application/json",
+                        Accept: "application/x-ndjson",
                     },
                     body: JSON.stringify({
                         player1: nickname,
@@ -75,35 +78,52 @@ function FirstScreen() {
                 },
             );
 
-            const data = await response.json();
-            console.log("Game data received:", data);
-
-            if (data.success && data.moves && data.moves.length > 0) {
-                // Process moves one by one
-                let currentBoard = Array(N)
-                    .fill()
-                    .map(() => Array(N).fill(" "));
+            let currentBoard = Array(N)
+                .fill()
+                .map(() => Array(N).fill(" "));
 
-                for (const move of data.moves) {
-                    // Update the working copy of the board
-                    currentBoard = currentBoard.map((row) => [...row]);
-                    currentBoard[move.x][move.y] = move.symbol;
+            const showMove = async (move) => {
+                // Update the working copy of the board
+                currentBoard = currentBoard.map((row) => [...row]);
+                currentBoard[move.x][move.y] = move.symbol;
 
-                    // Update the state with the new board
-                    setBoard([...currentBoard]);
-                    setLastMove([move.x, move.y]);
+                // Update the state with the new board
+                setBoard([...currentBoard]);
+                setLastMove([move.x, move.y]);
 
-                    // Check for winner
-                    if (move.winner) {
-                        setWinner(move.symbol);
-                        if (move.winning_cells) {
-                            setWinningCells(move.winning_cells);
-                        }
-                        setGameEnded(true);
+                // Check for winner
+                if (move.winner) {
+                    setWinner(move.symbol);
+                    if (move.winning_cells) {
+                        setWinningCells(move.winning_cells);
                     }
+                    setGameEnded(true);
+                }
+
+                // Wait before processing next move
+                await new Promise((resolve) => setTimeout(resolve, 500));
+            };
 
-                    // Wait before processing next move
-                    await new Promise((resolve) => setTimeout(resolve, 500));
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let pending = "";
+
+            while (true) {
+                const { done, value } = await reader.read();
+                if (done) break;
+
+                pending += decoder.decode(value, { stream: true });
+                const lines = pending.split("\n");
+                pending = lines.pop();
+
+                for (const line of lines) {
+                    if (!line.trim()) continue;
+                    const event = JSON.parse(line);
+                    if (event.event === "move") {
+                        await showMove(event);
+                    } else if (event.event === "result") {
+                        console.log("Game result received:", event);
+                    }
                 }
             }
         } catch (error) {
@@ -1,12 +1,11 @@
-import React, { useState, useEffect } from "react";
-import { useLocation, useNavigate } from "react-router-dom";
+import React, { useState, useEffect, useRef } from "react";
+import { useLocation } from "react-router-dom";
 import Board from "./Board";
 import CodeEditor from "./CodeEditor";
 import "./TestMode.css";
 
 function TestMode() {
     const location = useLocation();
-    const navigate = useNavigate();
     const [board, setBoard] = useState(
         Array(10)
             .fill()
@@ -27,6 +26,22 @@ function TestMode() {
     const [otherPiece, setOtherPiece] = useState(null);
     const [piecesAssigned, setPiecesAssigned] = useState(false);
 
+    // The game runs over one WebSocket; the player's moves are numbered and
+    // kept until the reply with the same number arrives
+    const socketRef = useRef(null);
+    const moveSeq = useRef(0);
+    const pendingMoves = useRef(new Map());
+
+    const closeSocket = () => {
+        if (socketRef.current) {
+            socketRef.current.onclose = null;
+            socketRef.current.close();
+            socketRef.current = null;
+        }
+    };
+
+    useEffect(() => closeSocket, []);
+
     const handleDrawPieces = () => {
         const pieces = ["O", "X"];
         const randomIndex = Math.floor(Math.random() * pieces.length);
@@ -115,6 +130,8 @@ function TestMode() {
     };
 
     const handleRestart = () => {
+        closeSocket();
+
         // Reset all game-related states
         setBoard(
             Array(10)
@@ -131,85 +148,106 @@ function TestMode() {
         setIsPlayerTurn(true);
     };
 
-    const handlePlayClick = async () => {
-        if (!isCompiled || !piecesAssigned) return;
+    const handleSocketMessage = (message) => {
+        const botPiece = selectedPiece === "O" ? "X" : "O";
+
+        if (message.gameId) {
+            // The game has started; the bot may have opened it
+            setGameId(message.gameId);
+            if (message.initial) {
+                console.log("Received initial move:", message);
+                setBoard((prev) => {
+                    const newBoard = prev.map((row) => [...row]);
+                    newBoard[message.x][message.y] = "O";
+                    return newBoard;
+                });
+            }
+            setIsPlayerTurn(selectedPiece === "O" || Boolean(message.initial));
+            return;
+        }
 
-        try {
-            console.log("Starting game with piece:", selectedPiece);
+        const playerMove = pendingMoves.current.get(message.seq);
+        pendingMoves.current.delete(message.seq);
 
-            const response = await fetch(
-                "http://localhost:4000/api/start-interactive-game",
-                {
-                    method: "POST",
-                    headers: {
-                        "Content-Type": "application/json",
-                    },
-                    body: JSON.stringify({
-                        nickname,
-                        selectedPiece,
-                    }),
-                },
-            );
+        if (message.error) {
+            console.error("Move error:", message.error);
+            if (message.seq === undefined) {
+                alert(`Game error: ${message.error}`);
+                return;
+            }
+            // The judge did not take the move, so its number is free again
+            moveSeq.current = message.seq - 1;
+            setIsPlayerTurn(true);
+            return;
+        }
+        if (!playerMove) {
+            console.error("Reply to an unknown move:", message);
+            return;
+        }
+        console.log("Received bot move:", message);
 
-            const data = await response.json();
-            if (!data.success) {
-                throw new Error(data.error || "Failed to start game");
+        setBoard((prev) => {
+            const newBoard = prev.map((row) => [...row]);
+            newBoard[playerMove.x][playerMove.y] = selectedPiece;
+            if (message.x >= 0 && message.y >= 0) {
+                newBoard[message.x][message.y] = botPiece;
             }
+            return newBoard;
+        });
+
+        if (message.winner) {
+            setWinner(message.winner);
+            setGameEnded(true);
+            if (message.winning_cells) {
+                setWinningCells(message.winning_cells);
+            }
+        } else {
+            setIsPlayerTurn(true);
+        }
+    };
+
+    const handlePlayClick = () => {
+        if (!isCompiled || !piecesAssigned) return;
+
+        console.log("Starting game with piece:", selectedPiece);
+        closeSocket();
+
+        setGameId(null);
+        setBoard(
+            Array(10)
+                .fill()
+                .map(() => Array(10).fill(" ")),
+        );
+        setWinner(null);
+        setGameEnded(false);
+        setWinningCells([]);
+        setIsPlayerTurn(false);
+        moveSeq.current = 0;
+        pendingMoves.current.clear();
+
+        const socket = new WebSocket("ws://localhost:4000/api/game-socket");
+        socketRef.current = socket;
 
-            setGameId(data.gameId);
-            setBoard(
-                Array(10)
-                    .fill()
-                    .map(() => Array(10).fill(" ")),
+        socket.onopen = () => {
+            socket.send(
+                JSON.stringify({ type: "start", nickname, selectedPiece }),
             );
-            setWinner(null);
-            setGameEnded(false);
-            setWinningCells([]);
-
-            // Important: Set initial turn state based on piece selection
-            if (selectedPiece === "O") {
-                console.log("Player is O, setting player's turn");
-                setIsPlayerTurn(true);
-            } else {
-                console.log("Player is X, waiting for bot's move");
-                setIsPlayerTurn(false);
-
-                // Get bot's first move
-                const initialMoveResponse = await fetch(
-                    "http://localhost:4000/api/make-move",
-                    {
-                        method: "POST",
-                        headers: {
-                            "Content-Type": "application/json",
-                        },
-                        body: JSON.stringify({
-                            gameId: data.gameId,
-                            x: -1,
-                            y: -1,
-                        }),
-                    },
-                );
-
-                const initialMove = await initialMoveResponse.json();
-                console.log("Received initial move:", initialMove);
-
-                if (initialMove.error) {
-                    throw new Error(initialMove.error);
-                }
-
-                if (initialMove.x >= 0 && initialMove.y >= 0) {
-                    setBoard((prev) => {
-                        const newBoard = prev.map((row) => [...row]);
-                        newBoard[initialMove.x][initialMove.y] = "O";
-                        return newBoard;
-                    });
-                    setIsPlayerTurn(true); // Now it's player's turn
-                }
+        };
+        socket.onmessage = (event) => {
+            try {
+                handleSocketMessage(JSON.parse(event.data));
+            } catch (error) {
+                console.error("Invalid game message:", event.data);
             }
-        } catch (error) {
-            console.error("Error starting game:", error);
-            alert(`Failed to start game: ${error.message}`);
-        }
+        };
+        socket.onclose = (event) => {
+            socketRef.current = null;
+            // 1000 is the server closing a finished game
+            if (event.code !== 1000) {
+                setGameEnded(true);
+                alert("Connection to the game was lost. Please start a new game.");
+            }
+        };
     };
 
     useEffect(() => {
@@ -225,7 +263,7 @@ function TestMode() {
         }
     }, [nickname]);
 
-    const handleCellClick = async (x, y) => {
+    const handleCellClick = (x, y) => {
         console.log("Cell clicked:", { x, y, isPlayerTurn, gameId, gameEnded });
 
         if (!isPlayerTurn || board[x][y] !== " " || !gameId || gameEnded) {
@@ -238,63 +276,17 @@ function TestMode() {
             return;
         }
 
-        setIsPlayerTurn(false);
-
-        try {
-            const response = await fetch(
-                "http://localhost:4000/api/make-move",
-                {
-                    method: "POST",
-                    headers: {
-                        "Content-Type": "application/json",
-                    },
-                    body: JSON.stringify({ gameId, x, y }),
-                },
-            );
-
-            const botMove = await response.json();
-            console.log("Received bot move:", botMove);
-
-            if (botMove.error) {
-                console.error("Move error:", botMove.error);
-                setIsPlayerTurn(true);
-                if (botMove.error === "Move timeout") {
-                    alert("Game timed out. Please start a new game.");
-                    navigate("/welcome");
-                }
-                return;
-            }
+        const socket = socketRef.current;
+        if (!socket || socket.readyState !== WebSocket.OPEN) {
+            console.error("Game connection is not open");
+            return;
+        }
 
-            setBoard((prev) => {
-                const newBoard = prev.map((row) => [...row]);
-                newBoard[x][y] = selectedPiece;
-                if (botMove.x >= 0 && botMove.y >= 0) {
-                    newBoard[botMove.x][botMove.y] =
-                        selectedPiece === "O" ? "X" : "O";
-                }
-                return newBoard;
-            });
+        setIsPlayerTurn(false);
 
-            if (botMove.winner) {
-                setWinner(botMove.winner);
-                setGameEnded(true);
-                if (botMove.winning_cells) {
-                    setWinningCells(botMove.winning_cells);
-                }
-                await fetch("http://localhost:4000/api/end-game", {
-                    method: "POST",
-                    headers: {
-                        "Content-Type": "application/json",
-                    },
-                    body: JSON.stringify({ gameId }),
-                });
-            } else {
-                setIsPlayerTurn(true);
-            }
-        } catch (error) {
-            console.error("Error making move:", error);
-            setIsPlayerTurn(true);
-        }
+        const seq = ++moveSeq.current;
+        pendingMoves.current.set(seq, { x, y });
+        socket.send(JSON.stringify({ type: "move", seq, x, y }));
     };
 
     return (
@@ -0,0 +1,290 @@
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+from contextlib import closing
+
+import numpy as np
+
+from board import N, line_cells, cell_lines
+from positions import replay, match_players
+
+DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "codingomoku.db")
+CHUNK_GAMES = 4096  # games replayed side by side at a time
+ALL_GAMES = 0       # tournament_id of the statistics over every archived game
+
+# Offline per-bot statistics over the archived games (tournament_matches and
+# game_history), written to the bot_stats table of the server database for
+# the leaderboard to read. The games are loaded into NumPy arrays (games x plies, cell x * n + y, -1 past the end)
+# and replayed ply by ply for a whole chunk of games at once.
+#
+# The threat detector uses the judges' rule that a player wins by filling
+# one of the five-cell lines of board.line_cells. It keeps the stones of
+# each player on every line; before each move, a line holding four of the
+# mover's stones and none of the opponent's means the mover could win at
+# once, and four of the opponent's mean a five has to be blocked. A move
+# that does neither counts as a missed win or a missed block. Blocks only
+# count when the opponent threatens a single cell, as two cannot both be
+# blocked.
+#
+# bot_stats has one row per tournament and bot, and rows with tournament_id
+# 0 over all games; heatmap is the bot's move count per cell as a JSON list.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS bot_stats (
+    tournament_id INTEGER NOT NULL,
+    player TEXT NOT NULL,
+    games INTEGER NOT NULL,
+    wins INTEGER NOT NULL,
+    draws INTEGER NOT NULL,
+    losses INTEGER NOT NULL,
+    games_as_o INTEGER NOT NULL,
+    wins_as_o INTEGER NOT NULL,
+    games_as_x INTEGER NOT NULL,
+    wins_as_x INTEGER NOT NULL,
+    avg_plies REAL NOT NULL,
+    win_chances INTEGER NOT NULL,
+    missed_wins INTEGER NOT NULL,
+    block_chances INTEGER NOT NULL,
+    missed_blocks INTEGER NOT NULL,
+    heatmap TEXT NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (tournament_id, player)
+)
+"""
+
+WINNER_CODES = {'O': 1, 'X': 2, '_': 3}  # 0: no winner recorded
+
+
+def load_games(database, tournament=None):
+    # [(tournament id or 0, player_O, player_X, winner, [(x, y, symbol), ...])]
+    games = []
+
+    def add(scope, player_O, player_X, winner, moves):
+        try:
+            moves = replay(json.loads(moves) if isinstance(moves, str) else moves)
+        except (TypeError, json.JSONDecodeError):
+            return
+        # Sides are told apart by ply parity, so only games alternating from O count
+        if moves and all(symbol == 'OX'[ply % 2] for ply, (_, _, symbol) in enumerate(moves)):
+            games.append((scope, player_O, player_X, winner, moves))
+
+    with closing(sqlite3.connect(f"file:{os.path.abspath(database)}?mode=ro", uri=True, timeout=30)) as db:
+        query = """SELECT tournament_id, player1, player2, player1_piece, winner, moves FROM tournament_matches
+                   WHERE status = 'completed' AND moves IS NOT NULL"""
+        params = ()
+        if tournament is not None:
+            query += " AND tournament_id = ?"
+            params = (tournament,)
+        for scope, player1, player2, piece, winner, moves in db.execute(query, params):
+            player_O, player_X, symbol = match_players(player1, player2, piece, winner)
+            add(scope, player_O, player_X, symbol, moves)
+
+        # winner holds a symbol here; rows saved before player1_piece was
+        # recorded cannot be told apart by seat and are left out
+        history = {row[1] for row in db.execute("PRAGMA table_info(game_history)")}
+        if tournament is None and "player1_piece" in history:
+            for player1, player2, piece, winner, moves in db.execute(
+                    """SELECT player1, player2, player1_piece, winner, moves FROM game_history
+                       WHERE moves IS NOT NULL AND player1_piece IS NOT NULL"""):
+                player_O, player_X, _ = match_players(player1, player2, piece, None)
+                add(ALL_GAMES, player_O, player_X, winner, moves)
+    return games
+
+
+def to_arrays(games, n=N):
+    # cells (games x plies, -1 past the end), lengths and winner codes
+    plies = max((len(moves) for *_, moves in games), default=0)
+    cells = np.full((len(games), plies), -1, dtype=np.int16)
+    for g, (*_, moves) in enumerate(games):
+        cells[g, :len(moves)] = [x * n + y for x, y, _ in moves]
+    lengths = np.array([len(moves) for *_, moves in games], dtype=np.int32)
+    winners = np.array([WINNER_CODES.get(game[3], 0) for game in games], dtype=np.int8)
+    return cells, lengths, winners
+
+
+def line_arrays(n=N):
+    # The cells of every five-cell line (lines x 5), and the lines through
+    # every cell (cells x most lines per cell), padded with a dummy line number
+    lines = line_cells(n)
+    through = cell_lines(n)
+    padded = np.full((n * n, max(map(len, through))), len(lines), dtype=np.int32)
+    for cell, entries in enumerate(through):
+        padded[cell, :len(entries)] = entries
+    return np.array(lines, dtype=np.int32), padded
+
+
+def threats(cells, lengths, n=N, chunk=CHUNK_GAMES):
+    # Per game and side (0 for O, 1 for X): chances to win at once, missed
+    # wins, single-cell threats to block and missed blocks
+    cells_of, lines_of = line_arrays(n)
+    lines = len(cells_of)
+    counts = {name: np.zeros((len(cells), 2), dtype=np.int32)
+              for name in ("win_chances", "missed_wins", "block_chances", "missed_blocks")}
+
+    # Longest games first, so the games still running at a ply are a prefix
+    order = np.argsort(-lengths, kind="stable")
+    for start in range(0, len(order), chunk):
+        games = order[start:start + chunk]
+        block = cells[games].astype(np.int64)
+        active_until = lengths[games]
+        board = np.zeros((len(games), n * n), dtype=np.int8)
+        stones = np.zeros((2, len(games), lines + 1), dtype=np.int8)  # per side, dummy line last
+
+        for ply in range(int(active_until[0])):
+            side = ply % 2
+            size = int(np.count_nonzero(active_until > ply))
+            rows = np.arange(size)
+            played = block[:size, ply]
+            mine, theirs = stones[side, :size, :lines], stones[1 - side, :size, :lines]
+
+            win_at = cells_completing(board[:size], cells_of, (mine == 4) & (theirs == 0))
+            threat_at = cells_completing(board[:size], cells_of, (theirs == 4) & (mine == 0))
+
+            can_win = win_at.any(axis=1)
+            missed_win = can_win & ~win_at[rows, played]
+            must_block = (threat_at.sum(axis=1) == 1) & ~can_win
+            missed_block = must_block & ~threat_at[rows, played]
+
+            running = games[:size]
+            counts["win_chances"][running, side] += can_win
+            counts["missed_wins"][running, side] += missed_win
+            counts["block_chances"][running, side] += must_block
+            counts["missed_blocks"][running, side] += missed_block
+
+            board[rows, played] = side + 1
+            # The lines of a cell are distinct apart from the dummy padding
+            stones[side, rows[:, None], lines_of[played]] += 1
+    return counts
+
+
+def cells_completing(board, cells_of, full_lines):
+    # Mask (games x cells) of the empty cells of the lines flagged in
+    # full_lines, which have exactly one empty cell
+    found = np.zeros(board.shape, dtype=bool)
+    games, lines = np.nonzero(full_lines)
+    if len(games):
+        candidates = cells_of[lines]                          # (k, 5)
+        empty = board[games[:, None], candidates] == 0
+        found[games, candidates[np.arange(len(games)), empty.argmax(axis=1)]] = True
+    return found
+
+
+def summarize(games, n=N):
+    # bot_stats rows for every (tournament, bot) and for all games per bot
+    cells, lengths, winners = to_arrays(games, n)
+    detected = threats(cells, lengths, n)
+
+    # One entry per game and side, repeated under ALL_GAMES for tournament games
+    scopes = np.array([game[0] for game in games], dtype=np.int64)
+    names = sorted({player for game in games for player in game[1:3]})
+    player_ids = {name: i for i, name in enumerate(names)}
+    players = np.array([[player_ids[game[1]], player_ids[game[2]]] for game in games],
+                       dtype=np.int64).reshape(-1, 2)
+
+    entry_game = np.concatenate([np.arange(len(games))] * 2)
+    entry_side = np.repeat([0, 1], len(games))
+    entry_scope = np.concatenate([scopes, scopes])
+    tournament_entries = entry_scope != ALL_GAMES
+    entry_game = np.concatenate([entry_game, entry_game[tournament_entries]])
+    entry_side = np.concatenate([entry_side, entry_side[tournament_entries]])
+    entry_scope = np.concatenate([entry_scope, np.zeros(tournament_entries.sum(), dtype=np.int64)])
+    entry_player = players[entry_game, entry_side]
+
+    keys, key_of = np.unique(np.stack([entry_scope, entry_player], axis=1), axis=0, return_inverse=True)
+    key_of = key_of.reshape(-1)
+    total = len(keys)
+
+    def per_key(values):
+        return np.bincount(key_of, weights=values, minlength=total)
+
+    winner = winners[entry_game]
+    own_code = entry_side + 1
+    won = winner == own_code
+    lost = (winner == 3 - own_code) & (winner != 3)
+    as_o = entry_side == 0
+
+    # Heatmaps: the moves of every entry's side counted under its key
+    heatmaps = np.zeros(total * n * n, dtype=np.int64)
+    for start in range(0, len(entry_game), CHUNK_GAMES):
+        part = slice(start, start + CHUNK_GAMES)
+        for side in (0, 1):
+            picked = entry_side[part] == side
+            moves = cells[entry_game[part][picked], side::2].astype(np.int64)
+            keys_of_moves = np.broadcast_to(key_of[part][picked, None], moves.shape)
+            played = moves >= 0
+            heatmaps += np.bincount(keys_of_moves[played] * (n * n) + moves[played],
+                                    minlength=total * n * n)
+    heatmaps = heatmaps.reshape(total, n * n)
+
+    columns = {
+        "games": per_key(np.ones(len(entry_game))),
+        "wins": per_key(won),
+        "draws": per_key(winner == 3),
+        "losses": per_key(lost),
+        "games_as_o": per_key(as_o),
+        "wins_as_o": per_key(won & as_o),
+        "games_as_x": per_key(~as_o),
+        "wins_as_x": per_key(won & ~as_o),
+        "plies": per_key(lengths[entry_game]),
+    }
+    for name, values in detected.items():
+        columns[name] = per_key(values[entry_game, entry_side])
+
+    rows = []
+    for k, (scope, player) in enumerate(keys):
+        games_played = int(columns["games"][k])
+        rows.append({
+            "tournament_id": int(scope),
+            "player": names[player],
+            **{name: int(columns[name][k]) for name in columns if name != "plies"},
+            "avg_plies": round(columns["plies"][k] / games_played, 2),
+            "heatmap": json.dumps(heatmaps[k].tolist(), separators=(",", ":")),
+        })
+    return rows
+
+
+def write_stats(database, rows, tournament=None):
+    # Replace the statistics of the scopes that were computed in one transaction
+    with closing(sqlite3.connect(database, timeout=30)) as db:
+        db.execute(SCHEMA)
+        with db:
+            if tournament is None:
+                db.execute("DELETE FROM bot_stats")
+            else:
+                db.execute("DELETE FROM bot_stats WHERE tournament_id = ?", (tournament,))
+            db.executemany(
+                """INSERT INTO bot_stats (tournament_id, player, games, wins, draws, losses,
+                       games_as_o, wins_as_o, games_as_x, wins_as_x, avg_plies,
+                       win_chances, missed_wins, block_chances, missed_blocks, heatmap)
+                   VALUES (:tournament_id, :player, :games, :wins, :draws, :losses,
+                       :games_as_o, :wins_as_o, :games_as_x, :wins_as_x, :avg_plies,
+                       :win_chances, :missed_wins, :block_chances, :missed_blocks, :heatmap)""",
+                rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-bot statistics over the archived games")
+    parser.add_argument("--db", default=DB_PATH, help="server database to read games from and write bot_stats to")
+    parser.add_argument("--tournament", type=int,
+                        help="only recompute this tournament's statistics")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="print the rows as JSON lines instead of writing them")
+    args = parser.parse_args()
+
+    started = time.monotonic()
+    games = load_games(args.db, args.tournament)
+    loaded = time.monotonic()
+    rows = summarize(games) if games else []
+    if args.tournament is not None:
+        rows = [row for row in rows if row["tournament_id"] == args.tournament]
+
+    if args.dry_run:
+        for row in rows:
+            print(json.dumps({**row, "heatmap": json.loads(row["heatmap"])}))
+    else:
+        write_stats(args.db, rows, args.tournament)
+    print(f"{len(games)} games, {len(rows)} rows: loaded in {loaded - started:.2f}s, "
+          f"analysed in {time.monotonic() - loaded:.2f}s", file=sys.stderr)
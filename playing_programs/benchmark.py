@@ -0,0 +1,346 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from board import Board, N, line_tables
+from rules import Rules
+import judge
+import interactive_judge
+import bot_interactive_judge
+
+# Benchmarks the three judges against deterministic stand-in bots, so judge
+# overhead can be told apart from bot think time. Needs nothing but Python.
+#
+#   instant   plays the first free cell in row-major order, immediately
+#   scripted  fills the whole board without anyone making five (a draw)
+#   slow      like instant, but sleeps --delay seconds before every move
+#
+# With --sizes the board core and the bot judge are also measured on larger
+# boards: building the line tables, the memory of a board, the cost of
+# validating, placing and checking one move, and whole scripted games.
+
+STUB = '''#!{python} -S
+import sys
+import time
+
+MODE = {mode!r}
+DELAY = {delay!r}
+N = {n}
+
+
+def main():
+    print("ready rules", flush=True)
+    taken = set()
+    line = sys.stdin.readline().strip()
+    if line.startswith("rules"):
+        line = sys.stdin.readline().strip()  # written for the board it is told
+    symbol = 'O' if line == "start" else 'X'
+    plan = [cell for cell in {plan!r} if cell[2] == symbol]
+
+    while line and line != "end":
+        if line != "start":
+            x, y = map(int, line.split())
+            taken.add((x, y))
+        if MODE == "scripted":
+            if not plan:
+                # Board is full; wait for "end"
+                line = sys.stdin.readline().strip()
+                continue
+            x, y, _ = plan.pop(0)
+        else:
+            x, y = next((i, j) for i in range(N) for j in range(N) if (i, j) not in taken)
+        taken.add((x, y))
+        time.sleep(DELAY)
+        print(x, y, flush=True)
+        line = sys.stdin.readline().strip()
+
+
+main()
+'''
+
+
+def draw_plan(n=N):
+    # Colour the board in 2x1 bricks: no five in a row for either side, and
+    # O gets exactly one cell more than X, so the cells can be played in turns
+    cells = [(x, y, 'OX'[((x // 2) + y) % 2]) for x in range(n) for y in range(n)]
+    o_cells = [cell for cell in cells if cell[2] == 'O']
+    x_cells = [cell for cell in cells if cell[2] == 'X']
+    plan = []
+    for i, o_cell in enumerate(o_cells):
+        plan.append(o_cell)
+        if i < len(x_cells):
+            plan.append(x_cells[i])
+    return plan
+
+
+def write_stubs(directory, delay):
+    plan = draw_plan()
+    stubs = {}
+    for mode, stub_delay in (("instant", 0.0), ("scripted", 0.0), ("slow", delay)):
+        path = os.path.join(directory, mode)
+        with open(path, 'w') as f:
+            f.write(STUB.format(python=sys.executable, mode=mode, delay=stub_delay, n=N, plan=plan))
+        os.chmod(path, 0o755)
+        stubs[mode] = path
+    return stubs
+
+
+def write_sized_stub(directory, n):
+    # A scripted bot drawing a game on an n x n board
+    path = os.path.join(directory, f"scripted-{n}")
+    with open(path, 'w') as f:
+        f.write(STUB.format(python=sys.executable, mode="scripted", delay=0.0, n=n, plan=draw_plan(n)))
+    os.chmod(path, 0o755)
+    return path
+
+
+def percentiles(samples):
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def at(p):
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+    return {"p50_ms": at(50) * 1000, "p90_ms": at(90) * 1000, "p99_ms": at(99) * 1000}
+
+
+def bench_spawn(path, runs):
+    # Time from fork/exec until the bot printed "ready"
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        bot = bot_interactive_judge.Bot(os.path.basename(path))
+        bot.process.stdout.readline()
+        samples.append(time.perf_counter() - started)
+        bot.send("end")
+        bot.process.wait()
+    return {"runs": runs, "mean_ms": statistics.mean(samples) * 1000, **percentiles(samples)}
+
+
+def bench_bot_judge(player_O, player_X, games, rules=None):
+    latencies = []
+    moves = 0
+    overhead = 0.0
+    bot_peak_rss_kb = 0
+    started = time.perf_counter()
+    for _ in range(games):
+        game_started = time.perf_counter()
+        game = bot_interactive_judge.Game(player_O, player_X, 'O', move_time=60, game_time=600, rules=rules)
+        think = 0.0
+        read_line = game.read_line
+
+        def timed_read_line(bot, timeout):
+            nonlocal think
+            move_started = time.perf_counter()
+            line = read_line(bot, timeout)
+            elapsed = time.perf_counter() - move_started
+            latencies.append(elapsed)
+            think += elapsed
+            return line
+
+        game.read_line = timed_read_line
+        result = game.play_game()
+        moves += len(result["moves"])
+        overhead += time.perf_counter() - game_started - think
+        # The judge reads every bot's VmHWM before it exits
+        for bot in result.get("metrics", {}).get("bots", {}).values():
+            bot_peak_rss_kb = max(bot_peak_rss_kb, bot.get("max_rss_kb", 0))
+    elapsed = time.perf_counter() - started
+    return {
+        "games": games,
+        "games_per_sec": games / elapsed,
+        "moves_per_game": moves / games,
+        "judge_overhead_per_move_ms": overhead / max(moves, 1) * 1000,
+        "move_latency": percentiles(latencies),
+        "bot_peak_rss_kb": bot_peak_rss_kb,
+    }
+
+
+def bench_interactive_judge(bot_path, scripted, games):
+    # The benchmark plays O; the bot answers as X
+    plan = [(x, y) for x, y, symbol in draw_plan() if symbol == 'O']
+    latencies = []
+    moves = 0
+    started = time.perf_counter()
+    for _ in range(games):
+        game = interactive_judge.InteractiveGame(bot_path, 'O')
+        try:
+            for i in range((N * N) // 2):
+                if scripted:
+                    x, y = plan[i]
+                else:
+                    x, y = next((x, y) for x in reversed(range(N)) for y in range(N)
+                                if game.board.is_free(x, y))
+                move_started = time.perf_counter()
+                response = game.make_move(x, y)
+                latencies.append(time.perf_counter() - move_started)
+                moves += 2
+                if response.get('winner') or response.get('error'):
+                    break
+        finally:
+            game.cleanup()
+    elapsed = time.perf_counter() - started
+    return {
+        "games": games,
+        "games_per_sec": games / elapsed,
+        "moves_per_game": moves / games,
+        "move_latency": percentiles(latencies),
+    }
+
+
+def bench_file_judge(directory, stub, games):
+    # judge.py always plays ./agent1 against ./agent2 and prints every board
+    for agent in ("agent1", "agent2"):
+        path = os.path.join(directory, agent)
+        if os.path.lexists(path):
+            os.remove(path)
+        os.symlink(stub, path)
+
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(games):
+            judge.Game().run_game()
+    elapsed = time.perf_counter() - started
+    return {"games": games, "games_per_sec": games / elapsed}
+
+
+def bench_board(n, games):
+    # The judges' board core on an n x n board. Every game fills the board
+    # along the draw plan, validating, placing and checking each move, so
+    # no move ends the game early.
+    line_tables.cache_clear()
+    tracemalloc.start()
+    started = time.perf_counter()
+    line_tables(n)
+    tables_ms = (time.perf_counter() - started) * 1000
+    tables_kb = tracemalloc.get_traced_memory()[0] / 1024
+    board = Board(n)
+    board_kb = (tracemalloc.get_traced_memory()[0] / 1024) - tables_kb
+    tracemalloc.stop()
+
+    plan = draw_plan(n)
+    samples = []
+    for _ in range(games):
+        board = Board(n)
+        started = time.perf_counter()
+        for x, y, symbol in plan:
+            if board.is_free(x, y):
+                board.place(x, y, symbol)
+                board.winning_cells(x, y, symbol)
+        samples.append((time.perf_counter() - started) / len(plan))
+    return {
+        "tables_ms": tables_ms,
+        "tables_kb": tables_kb,
+        "board_kb": board_kb,
+        "move_us": min(samples) * 1e6,
+    }
+
+
+def peak_rss(results):
+    # ru_maxrss is in kilobytes on Linux. Bots are measured by the bot judge
+    # (VmHWM, see bot_interactive_judge.Bot.read_memory): RUSAGE_CHILDREN
+    # would report the judge's own peak, carried over the fork and exec.
+    bot_judges = list(results["bot_judge"].values()) + [size["bot_judge"] for size in results["sizes"].values()]
+    return {
+        "judge_peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "bots_peak_rss_kb": max(judge["bot_peak_rss_kb"] for judge in bot_judges),
+    }
+
+
+def run(games, delay, spawn_runs, sizes=()):
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        stubs = write_stubs(directory, delay)
+        previous_dir = os.getcwd()
+        os.chdir(directory)
+        try:
+            # Bot names are resolved relative to the working directory
+            # (interactive_judge.py takes them as absolute paths here)
+            results["spawn"] = bench_spawn(stubs["instant"], spawn_runs)
+            results["bot_judge"] = {
+                mode: bench_bot_judge(mode, mode, games)
+                for mode in ("instant", "scripted", "slow")
+            }
+            results["interactive_judge"] = {
+                mode: bench_interactive_judge(stubs[mode], mode == "scripted", games)
+                for mode in ("instant", "scripted", "slow")
+            }
+            results["judge"] = {
+                mode: bench_file_judge(directory, stubs[mode], games)
+                for mode in ("instant", "scripted")
+            }
+            results["sizes"] = {}
+            for n in sizes:
+                stub = os.path.basename(write_sized_stub(directory, n))
+                results["sizes"][n] = {
+                    "board": bench_board(n, max(games, 20)),
+                    "bot_judge": bench_bot_judge(stub, stub, games, Rules(n)),
+                }
+        finally:
+            os.chdir(previous_dir)
+    results["memory"] = peak_rss(results)
+    return results
+
+
+def print_report(results):
+    spawn = results["spawn"]
+    print(f"Bot spawn until ready: mean {spawn['mean_ms']:.1f} ms, "
+          f"p50 {spawn['p50_ms']:.1f} ms, p99 {spawn['p99_ms']:.1f} ms")
+
+    for judge_name in ("bot_judge", "interactive_judge", "judge"):
+        print(f"\n{judge_name}:")
+        for mode, stats in results[judge_name].items():
+            line = f"  {mode:<9} {stats['games_per_sec']:8.2f} games/s"
+            if "moves_per_game" in stats:
+                line += f"  {stats['moves_per_game']:6.1f} moves/game"
+            if "judge_overhead_per_move_ms" in stats:
+                line += f"  overhead {stats['judge_overhead_per_move_ms']:.3f} ms/move"
+            latency = stats.get("move_latency")
+            if latency:
+                line += (f"  move p50 {latency['p50_ms']:.2f} ms"
+                         f" p90 {latency['p90_ms']:.2f} ms p99 {latency['p99_ms']:.2f} ms")
+            print(line)
+
+    if results["sizes"]:
+        print("\nboard sizes:")
+        for n, stats in results["sizes"].items():
+            board, game = stats["board"], stats["bot_judge"]
+            print(f"  {n:>3}x{n:<3} tables {board['tables_ms']:7.1f} ms {board['tables_kb']:8.0f} kB"
+                  f"  board {board['board_kb']:5.1f} kB  move {board['move_us']:5.2f} us"
+                  f"  scripted game {game['moves_per_game']:6.1f} moves"
+                  f"  overhead {game['judge_overhead_per_move_ms']:.3f} ms/move")
+
+    memory = results["memory"]
+    print(f"\nPeak RSS: judge {memory['judge_peak_rss_kb']} kB, "
+          f"largest bot {memory['bots_peak_rss_kb']} kB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the gomoku judges")
+    parser.add_argument("--games", type=int, default=3, help="games per judge and bot kind")
+    parser.add_argument("--delay", type=float, default=0.005,
+                        help="seconds the slow bot waits before each move")
+    parser.add_argument("--spawn-runs", type=int, default=20,
+                        help="bot launches used to measure spawn cost")
+    parser.add_argument("--sizes", default="15,19,25,31",
+                        help="comma-separated board sizes to measure the board core and bot judge on")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+
+    # The judges log every move to stderr
+    with contextlib.redirect_stderr(io.StringIO()):
+        results = run(args.games, args.delay, args.spawn_runs, sizes)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_report(results)
@@ -0,0 +1,126 @@
+from functools import lru_cache
+
+N = 15
+
+DIRECTIONS = [(0, 1), (1, 0), (1, 1), (1, -1)]  # horizontal, vertical, diagonal \, diagonal /
+SYMBOLS = (None, 'O', 'X')  # cell contents by their byte in Board.cells
+CODES = {'O': 1, 'X': 2}
+
+
+@lru_cache(maxsize=None)
+def line_tables(n):
+    # The five-cell lines of an n x n board: the cells of every line (cell
+    # (x, y) is x * n + y, and a line's number is its index), the index in
+    # DIRECTIONS of every line's direction, and for every cell the numbers
+    # of the at most 20 lines through it. Computed once per board size.
+    lines = []
+    directions = bytearray()
+    through = [[] for _ in range(n * n)]
+    for x in range(n):
+        for y in range(n):
+            for direction, (dx, dy) in enumerate(DIRECTIONS):
+                end_x, end_y = x + 4 * dx, y + 4 * dy
+                if not (0 <= end_x < n and 0 <= end_y < n):
+                    continue
+                line = len(lines)
+                cells = tuple((x + k * dx) * n + (y + k * dy) for k in range(5))
+                for cell in cells:
+                    through[cell].append(line)
+                lines.append(cells)
+                directions.append(direction)
+    # Keep directions in DIRECTIONS order so winning_cells reports the same
+    # line as a cell-by-cell scan would
+    return tuple(lines), bytes(directions), tuple(
+        tuple(sorted(entries, key=directions.__getitem__)) for entries in through
+    )
+
+
+def line_cells(n):
+    return line_tables(n)[0]
+
+
+def cell_lines(n):
+    return line_tables(n)[2]
+
+
+def line_count(n):
+    return len(line_cells(n))
+
+
+class Board:
+    # Game state kept as one byte per cell (0 empty, 1 O, 2 X) and, per
+    # player, the number of its stones on every five-cell line. A move only
+    # touches the lines through its cell, so placing a stone and looking for
+    # a win cost the same on any board size. With exact_five only a row of
+    # exactly five wins; six or more in a row do not count.
+    def __init__(self, n=N, exact_five=False):
+        self.n = n
+        self.exact_five = exact_five
+        _, self.directions, self.lines = line_tables(n)
+        self.cells = bytearray(n * n)
+        self.count = 0
+
+        # A line of five is still winnable for a player while the opponent
+        # has no stone on it; open_lines counts those lines per player. Under
+        # exact_five some of them may be spoilt by overlines, so is_dead can
+        # only call a position dead later, never wrongly.
+        lines = line_count(n)
+        self.stones = {'O': bytearray(lines), 'X': bytearray(lines)}
+        self.open_lines = {'O': lines, 'X': lines}
+
+    def in_bounds(self, x, y):
+        return 0 <= x < self.n and 0 <= y < self.n
+
+    def is_free(self, x, y):
+        return self.in_bounds(x, y) and not self.cells[x * self.n + y]
+
+    def get(self, x, y):
+        return SYMBOLS[self.cells[x * self.n + y]]
+
+    def place(self, x, y, symbol):
+        index = x * self.n + y
+        self.cells[index] = CODES[symbol]
+        self.count += 1
+
+        opponent = 'X' if symbol == 'O' else 'O'
+        stones = self.stones[symbol]
+        for line in self.lines[index]:
+            if not stones[line]:
+                self.open_lines[opponent] -= 1
+            stones[line] += 1
+
+    def is_full(self):
+        return self.count == self.n * self.n
+
+    def is_dead(self):
+        # Nobody can make five any more: the game can only end in a draw
+        return not self.open_lines['O'] and not self.open_lines['X']
+
+    def is_win(self, x, y, symbol):
+        return self.winning_cells(x, y, symbol) is not None
+
+    def winning_cells(self, x, y, symbol):
+        # The whole run of symbol through (x, y) that makes five or more in a
+        # row (exactly five with exact_five), starting with (x, y) itself, or
+        # None if the move did not win
+        stones = self.stones[symbol]
+        code = CODES[symbol]
+        for line in self.lines[x * self.n + y]:
+            if stones[line] != 5:
+                continue
+
+            dx, dy = DIRECTIONS[self.directions[line]]
+            cells = [(x, y)]
+            for sign in (1, -1):
+                i, j = x + sign * dx, y + sign * dy
+                while self.in_bounds(i, j) and self.cells[i * self.n + j] == code:
+                    cells.append((i, j))
+                    i += sign * dx
+                    j += sign * dy
+            if self.exact_five and len(cells) > 5:
+                continue  # an overline; the other full lines along it are too
+            return cells
+        return None
+
+    def rows(self, empty='.'):
+        return [[self.get(x, y) or empty for y in range(self.n)] for x in range(self.n)]
@@ -2,35 +2,273 @@ import subprocess
 import sys
 import json
 import time
+import os
+import argparse
+import selectors
+import signal
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+
+from movelog import MoveLogWriter
+from gamecache import GameCache
+from metrics import MetricsWriter
+from journal import Journal
+from rules import add_rules_arguments, rules_from_arguments, from_environment as rules_from_environment
+from sandbox import Limits, release, STDERR_TAIL, MEMORY_LIMIT_MB, PROCESS_LIMIT, FILE_SIZE_LIMIT_MB, CPU_QUOTA
+
+READY_TIMEOUT = 5.0     # seconds a bot has to print "ready"
+MOVE_TIME_LIMIT = 2.0   # seconds a bot may think about a single move
+GAME_TIME_LIMIT = 8.0   # seconds of thinking a bot may use over the whole game
+CPU_GRACE = 2.0         # CPU seconds beyond the game clock before RLIMIT_CPU hits
+
+
+class Bot:
+    # A bot process whose stdout is read through our own line buffer, so that
+    # reads can be multiplexed with select and never block the judge
+    def __init__(self, program, limits=None):
+        self.program = program
+        self.process = subprocess.Popen([f'./{program}'],
+                                        stdin=subprocess.PIPE,
+                                        stdout=subprocess.PIPE,
+                                        stderr=subprocess.PIPE,
+                                        bufsize=0)
+        self.limits = limits
+        self.cgroup = limits.apply(self.process.pid) if limits else None
+        self.stderr = b''
+        self.stderr_thread = threading.Thread(target=self.drain_stderr, daemon=True)
+        self.stderr_thread.start()
+        self.buffer = b''
+        self.closed = False
+        self.moves = 0
+        self.elapsed = 0.0
+        self.usage = None  # resource usage from wait4 once the bot exited
+        self.peak_rss_kb = None
+        self.peak_vm_kb = None
+        self.limit_hit = None  # resource the bot ran into, see sandbox.py
+        self.exit_code = None
+        self.capabilities = set()  # protocol extensions named in its ready line
+        self.games = 1             # games played by this process, see Session
+        self.cpu_base = 0.0        # CPU seconds used before the current game
+        self.rules = None          # rules line the bot was last told, see rules.py
+
+    def announce(self, line):
+        # Remember the protocol extensions a bot names after "ready"
+        words = line.split()
+        self.capabilities = set(words[1:]) if words and words[0] == "ready" else set()
+
+    def tell_rules(self, rules):
+        # Send the game's rules unless the bot knows them already; bots that
+        # were told nothing play the default rules
+        line = rules.line()
+        if line == self.rules or (self.rules is None and rules.is_default()):
+            return
+        if "rules" not in self.capabilities:
+            raise Exception(f"{self.program} does not support the rules \"{line}\"")
+        self.send(line)
+        self.rules = line
+
+    def new_game(self, piece):
+        # Start the next game of a series in this process
+        self.games += 1
+        self.moves = 0
+        self.elapsed = 0.0
+        self.buffer = b''
+        self.cpu_base = self.cpu_time() or 0.0
+        if self.limits:
+            self.limits.extend_cpu(self.process.pid, self.cpu_base)
+        self.send(f"newgame {piece}")
+
+    def cpu_time(self):
+        # CPU seconds the running bot has used so far
+        try:
+            with open(f"/proc/{self.process.pid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+        except (OSError, ValueError, IndexError):
+            return None
+
+    def drain_stderr(self):
+        # Pass the bot's stderr on to ours, keeping the tail for limit checks
+        for line in iter(self.process.stderr.readline, b''):
+            self.stderr = (self.stderr + line)[-STDERR_TAIL:]
+            sys.stderr.write(line.decode(errors='replace'))
+        self.process.stderr.close()
+
+    def fileno(self):
+        assert self.process.stdout != None
+        return self.process.stdout.fileno()
+
+    def fill(self):
+        data = os.read(self.fileno(), 4096)
+        if data:
+            self.buffer += data
+        else:
+            self.closed = True
+
+    def pop_line(self):
+        if b'\n' in self.buffer:
+            line, self.buffer = self.buffer.split(b'\n', 1)
+            return line.decode(errors='replace').strip()
+        if self.closed and self.buffer:
+            line, self.buffer = self.buffer, b''
+            return line.decode(errors='replace').strip()
+        return None
+
+    def send(self, line):
+        assert self.process.stdin != None
+        try:
+            self.process.stdin.write(f"{line}\n".encode())
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError):
+            pass
+
+    def read_memory(self):
+        # Peak RSS (VmHWM) and address space (VmPeak) of the running bot.
+        # ru_maxrss from wait4 cannot be used for memory: Linux carries the
+        # judge's own peak over the fork and exec.
+        try:
+            with open(f"/proc/{self.process.pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmHWM:"):
+                        self.peak_rss_kb = int(line.split()[1])
+                    elif line.startswith("VmPeak:"):
+                        self.peak_vm_kb = int(line.split()[1])
+        except (OSError, ValueError):
+            pass
+
+    def stop(self):
+        # Not Popen.terminate: it would reap a bot that already exited and
+        # lose its resource usage
+        self.send("end")
+        if self.exit_code is not None:
+            return  # reaped already, the pid may belong to someone else now
+        try:
+            os.kill(self.process.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+    def reap(self, timeout=1.0):
+        # Wait for the bot with wait4 rather than Popen.wait, which throws its
+        # resource usage away; kill it if it does not exit within timeout
+        pid = self.process.pid
+        deadline = time.monotonic() + timeout
+        try:
+            while True:
+                reaped, status, usage = os.wait4(pid, os.WNOHANG)
+                if reaped:
+                    break
+                if time.monotonic() > deadline:
+                    self.process.kill()
+                    reaped, status, usage = os.wait4(pid, 0)
+                    break
+                time.sleep(0.001)
+        except ChildProcessError:
+            return  # already reaped elsewhere
+        self.usage = usage
+        self.exit_code = os.waitstatus_to_exitcode(status)
+        self.process.returncode = self.exit_code
+        if self.limits:
+            self.stderr_thread.join(timeout=1)
+            cpu = usage.ru_utime + usage.ru_stime - self.cpu_base
+            self.limit_hit = self.limits.hit(self.exit_code, cpu, self.peak_vm_kb, self.cgroup,
+                                             self.stderr.decode(errors='replace'))
+        release(self.cgroup)
+
+    def metrics(self):
+        bot = {
+            "program": self.program,
+            "moves": self.moves,
+            "think_ms": round(self.elapsed * 1000, 3),
+            "exit_code": self.exit_code,
+        }
+        cpu = self.usage.ru_utime + self.usage.ru_stime if self.usage else self.cpu_time()
+        if cpu is not None:
+            bot["cpu_ms"] = round((cpu - self.cpu_base) * 1000, 3)
+        if self.games > 1:
+            bot["game_in_process"] = self.games
+        if self.peak_rss_kb is not None:
+            bot["max_rss_kb"] = self.peak_rss_kb
+        if self.limit_hit:
+            bot["limit_hit"] = self.limit_hit
+        return bot
+
+
+class Session:
+    # Bot processes kept between the games of a series, such as the games of
+    # one pairing. A bot whose ready line is "ready newgame" speaks the
+    # newgame extension: after a game that ended cleanly it is kept, and in
+    # its next game it is told "newgame O" or "newgame X" (then "start" or
+    # the first move, as usual) instead of being respawned. Other bots, and
+    # bots of games that ended in a timeout, limit or bad move, are stopped
+    # after each game as before.
+    def __init__(self):
+        self.idle = []  # bots ready for their next game
+
+    def take(self, program):
+        for bot in self.idle:
+            if bot.program == program:
+                self.idle.remove(bot)
+                return bot
+        return None
+
+    def keep(self, bot):
+        self.idle.append(bot)
+
+    def close(self):
+        for bot in self.idle:
+            bot.stop()
+            bot.reap()
+        self.idle = []
 
-N = 15
 
 class Game:
-    def __init__(self, player1, player2, player1_piece):
+    def __init__(self, player1, player2, player1_piece,
+                 move_time=MOVE_TIME_LIMIT, game_time=GAME_TIME_LIMIT, limits=None, session=None, rules=None):
         print(f"Starting game: {player1} vs {player2}", file=sys.stderr)
+        self.started = time.monotonic()
 
-        self.process1 = subprocess.Popen([f'./{player1}'],
-                                       stdin=subprocess.PIPE,
-                                       stdout=subprocess.PIPE,
-                                       text=True,
-                                       bufsize=1)
+        self.move_time = move_time
+        self.game_time = game_time
+        self.session = session
+        self.clean = False  # set once the game ended so that its bots can play on
+        self.rules = rules or rules_from_environment()
+        self.swapped = False  # set when X took over O's first stone
 
-        self.process2 = subprocess.Popen([f'./{player2}'],
-                                       stdin=subprocess.PIPE,
-                                       stdout=subprocess.PIPE,
-                                       text=True,
-                                       bufsize=1)
+        if limits is None:
+            limits = Limits(cpu_seconds=game_time + CPU_GRACE)
+        kept1 = session.take(player1) if session else None
+        kept2 = session.take(player2) if session else None
+        self.process1 = kept1 or Bot(player1, limits)
+        self.process2 = kept2 or Bot(player2, limits)
+
+        self.selector = selectors.DefaultSelector()
+        for bot in (self.process1, self.process2):
+            self.selector.register(bot, selectors.EVENT_READ)
 
         self.moves = []
-        self.board = [[' ' for _ in range(N)] for _ in range(N)]
+        self.think = []      # seconds each move took the bot
+        self.overhead = 0.0  # seconds the judge spent between moves
+        self.on_move = None  # called with every move as soon as it is played
+        self.board = self.rules.board()
 
-        # Wait for ready messages
-        assert self.process1.stdout != None
-        assert self.process2.stdout != None
-        ready1 = self.process1.stdout.readline().strip()
-        ready2 = self.process2.stdout.readline().strip()
+        # Wait for ready messages from freshly started bots
+        ready1 = self.read_line(self.process1, READY_TIMEOUT) if kept1 is None else "ready"
+        ready2 = self.read_line(self.process2, READY_TIMEOUT) if kept2 is None else "ready"
         print(f"Player 1 ready: {ready1}", file=sys.stderr)
         print(f"Player 2 ready: {ready2}", file=sys.stderr)
+        if ready1 is None or ready2 is None:
+            self.cleanup()
+            raise Exception("Bot didn't send ready message in time")
+        if kept1 is None:
+            self.process1.announce(ready1)
+        if kept2 is None:
+            self.process2.announce(ready2)
+        try:
+            for bot in (self.process1, self.process2):
+                bot.tell_rules(self.rules)
+        except Exception:
+            self.cleanup()
+            raise
 
         # Important change: Initialize processes based on who plays 'O'
         if player1_piece == 'O':
@@ -40,50 +278,92 @@ class Game:
             self.first_process = self.process2
             self.second_process = self.process1
 
-        # Always send 'start' to the process that plays 'O'
-        assert self.first_process.stdin != None
-        self.first_process.stdin.write("start\n")
-        self.first_process.stdin.flush()
+        # Kept bots start over with their piece for this game
+        kept = [bot for bot in (kept1, kept2) if bot]
+        for bot, piece in ((self.first_process, 'O'), (self.second_process, 'X')):
+            if bot in kept:
+                bot.new_game(piece)
+        self.startup = time.monotonic() - self.started
 
-        # Get first move from O player
-        assert self.first_process.stdout != None
-        first_move = self.first_process.stdout.readline().strip()
-        print(f"First move received: {first_move}", file=sys.stderr)
-
-        try:
-            x, y = map(int, first_move.split())
-            if 0 <= x < N and 0 <= y < N and self.board[x][y] == ' ':
-                self.board[x][y] = 'O'
-                self.moves.append({
-                    "x": x,
-                    "y": y,
-                    "symbol": 'O'
-                })
-                # Send this move to X player
-                assert self.second_process.stdin != None
-                self.second_process.stdin.write(f"{x} {y}\n")
-                self.second_process.stdin.flush()
-            else:
-                raise Exception(f"Invalid first move: {x},{y}")
-        except ValueError:
-            raise Exception(f"Invalid move format: {first_move}")
+        self.current_process = self.first_process
+        self.other_process = self.second_process
+        self.current_symbol = 'O'
 
-        self.current_process = self.second_process
-        self.other_process = self.first_process
-        self.current_symbol = 'X'
+    def read_line(self, bot, timeout):
+        # Wait for a full line from bot for at most timeout seconds, buffering
+        # anything the other bot prints meanwhile. None on timeout or EOF.
+        deadline = time.monotonic() + timeout
+        while True:
+            line = bot.pop_line()
+            if line is not None:
+                return line
+            if bot.closed:
+                return None
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            for key, _ in self.selector.select(remaining):
+                other = key.fileobj
+                other.fill()
+                if other.closed:
+                    self.selector.unregister(other)
 
     def play_game(self):
+        timeout = None
+        limit = None
+
+        # Always send 'start' to the process that plays 'O'
+        self.first_process.send("start")
+
+        turn_started = time.monotonic()
         while True:
-            # Get move from current process
-            assert self.current_process.stdout != None
-            move = self.current_process.stdout.readline().strip()
+            # Get move from current process, within its per-move and per-game clocks
+            bot = self.current_process
+            budget = min(self.move_time, self.game_time - bot.elapsed)
+            started = time.monotonic()
+            self.overhead += started - turn_started
+            move = self.read_line(bot, budget)
+            turn_started = time.monotonic()
+            bot.elapsed += turn_started - started
+            self.think.append(turn_started - started)
             print(f"Received move: {move}", file=sys.stderr)
 
+            if move is None and not bot.closed:
+                timeout = {
+                    "symbol": self.current_symbol,
+                    "limit": "move" if budget == self.move_time else "game",
+                    "moves": bot.moves,
+                    "elapsed": round(bot.elapsed, 3),
+                }
+                print(f"Player {self.current_symbol} ran out of time", file=sys.stderr)
+                break
+
+            if move is None:
+                # The bot closed its output; find out whether a limit killed it
+                bot.reap()
+                if bot.limit_hit:
+                    limit = {"symbol": self.current_symbol, "resource": bot.limit_hit, "moves": bot.moves}
+                    print(f"Player {self.current_symbol} hit its {bot.limit_hit} limit", file=sys.stderr)
+                    break
+            else:
+                bot.read_memory()
+
+            if move == "swap" and self.rules.swap and len(self.moves) == 1 and not self.swapped:
+                # X takes over O's stone; the bot that opened now plays X
+                print("Player X swapped colours", file=sys.stderr)
+                self.swapped = True
+                self.think.pop()
+                self.first_process, self.second_process = self.second_process, self.first_process
+                self.other_process.send("swap")
+                self.current_process, self.other_process = self.other_process, self.current_process
+                continue
+
             try:
-                x, y = map(int, move.split())
-                if 0 <= x < N and 0 <= y < N and self.board[x][y] == ' ':
+                x, y = map(int, (move or '').split())
+                if self.board.is_free(x, y):
                     # Valid move
-                    self.board[x][y] = self.current_symbol
+                    bot.moves += 1
+                    self.board.place(x, y, self.current_symbol)
                     move_data = {
                         "x": x,
                         "y": y,
@@ -92,14 +372,22 @@ class Game:
                     self.moves.append(move_data)
 
                     # Check for win
-                    if self.check_win(x, y, self.current_symbol):
+                    won = self.check_win(x, y, self.current_symbol)
+                    if won:
                         self.moves[-1]["winner"] = self.current_symbol
+                    if self.on_move:
+                        self.on_move(move_data)
+                    if won:
+                        self.clean = True
+                        break
+
+                    # Stop when the board is full or nobody can make five any more
+                    if self.board.is_full() or self.board.is_dead():
+                        self.clean = True
                         break
 
                     # Send move to other process
-                    assert self.other_process.stdin != None
-                    self.other_process.stdin.write(f"{x} {y}\n")
-                    self.other_process.stdin.flush()
+                    self.other_process.send(f"{x} {y}")
 
                     # Switch players
                     self.current_process, self.other_process = self.other_process, self.current_process
@@ -118,70 +406,269 @@ class Game:
             "moves": self.moves,
             "winner": None  # This will be set if there was a winner
         }
+        if self.swapped:
+            result["swapped"] = True
 
         # Check if the last move was a winning move
-        if self.moves:
+        if timeout:
+            result["winner"] = 'O' if timeout["symbol"] == 'X' else 'X'
+            result["reason"] = "timeout"
+            result["timeout"] = timeout
+        elif limit:
+            result["winner"] = 'O' if limit["symbol"] == 'X' else 'X'
+            result["reason"] = "resource_limit"
+            result["limit"] = limit
+        elif self.moves:
             last_move = self.moves[-1]
             if "winner" in last_move:
                 result["winner"] = last_move["winner"]
                 if "winning_cells" in last_move:
                     result["winning_cells"] = last_move["winning_cells"]
-            elif len(self.moves) == N * N:
+            elif self.board.is_full():
                 result["winner"] = '_'
-        # Send complete game data
-        print(json.dumps(result))
-        # print(json.dumps({
-        #     "success": True,
-        #     "moves": self.moves
-        # }))
-
-        # Cleanup
-        for process in [self.process1, self.process2]:
-            try:
-                assert process.stdin != None
-                process.stdin.write("end\n")
-                process.stdin.flush()
-                process.terminate()
-                process.wait(timeout=1)
-            except:
-                pass
+            elif self.board.is_dead():
+                result["winner"] = '_'
+                result["reason"] = "dead_position"
+                result["adjudicated_at"] = len(self.moves)
+
+        self.cleanup()
+        result["metrics"] = self.metrics()
+        return result
+
+    def metrics(self):
+        # Think time of the moves actually played; a final timeout or bad
+        # move is only counted in the bot's total
+        return {
+            "think_ms": [round(t * 1000, 3) for t in self.think[:len(self.moves)]],
+            "judge_overhead_ms": round(self.overhead * 1000, 3),
+            "startup_ms": round(self.startup * 1000, 3),
+            "wall_ms": round((time.monotonic() - self.started) * 1000, 3),
+            "bots": {
+                'O': self.first_process.metrics(),
+                'X': self.second_process.metrics(),
+            },
+        }
+
+    def cleanup(self):
+        self.selector.close()
+        for bot in [self.process1, self.process2]:
+            bot.read_memory()
+            if self.session and self.clean and "newgame" in bot.capabilities and not bot.closed:
+                self.session.keep(bot)
+                continue
+            bot.stop()
+            bot.reap()
 
     def check_win(self, x, y, symbol):
-        directions = [[(0, 1)], [(1, 0)], [(1, 1)], [(1, -1)]]
-        for dir in directions:
-            dx, dy = dir[0]
-            count = 1
-            cells = [(x, y)]
-
-            # Check in positive direction
-            i, j = x + dx, y + dy
-            while 0 <= i < N and 0 <= j < N and self.board[i][j] == symbol:
-                count += 1
-                cells.append((i, j))
-                i += dx
-                j += dy
-
-            # Check in negative direction
-            i, j = x - dx, y - dy
-            while 0 <= i < N and 0 <= j < N and self.board[i][j] == symbol:
-                count += 1
-                cells.append((i, j))
-                i -= dx
-                j -= dy
-
-            if count >= 5:
-                self.moves[-1]["winning_cells"] = cells
-                return True
+        cells = self.board.winning_cells(x, y, symbol)
+        if cells:
+            self.moves[-1]["winning_cells"] = cells
+            return True
         return False
 
+def run_match(player_O, player_X, move_time=MOVE_TIME_LIMIT, game_time=GAME_TIME_LIMIT, cache=None,
+              limits=None, session=None, rules=None):
+    # Play a single game with player_O as O; errors are reported in the result.
+    # cache is the path of a game cache file, see gamecache.py; session keeps
+    # bot processes for the next game of a series; rules default to the
+    # environment's, see rules.py
+    try:
+        rules = rules or rules_from_environment()
+        new_game = lambda: Game(player_O, player_X, 'O', move_time, game_time, limits, session, rules)
+        if cache:
+            return GameCache.open(cache).play(player_O, player_X, new_game, variant=rules.key())
+        return new_game().play_game()
+    except Exception as e:
+        return {"error": str(e)}
+
+
+def series(pairings, workers):
+    # Group the games of each pair of bots into series played one after
+    # another, so that bots speaking the newgame extension stay up for all
+    # of them. Pairs are split when there are fewer of them than workers.
+    pairs = {}
+    for pairing in pairings:
+        pairs.setdefault(frozenset(pairing[1:]), []).append(pairing)
+    split = -(-workers // max(1, len(pairs)))
+    return [games[i::split] for games in pairs.values() for i in range(min(split, len(games)))]
+
+
+def run_series(games, report, move_time=MOVE_TIME_LIMIT, game_time=GAME_TIME_LIMIT, cache=None,
+               limits=None, rules=None):
+    session = Session()
+    try:
+        for match_id, player_O, player_X in games:
+            result = run_match(player_O, player_X, move_time, game_time, cache, limits, session, rules)
+            report(match_id, player_O, player_X, result)
+    finally:
+        session.close()
+
+
+def run_batch(workers, use_processes=False,
+              move_time=MOVE_TIME_LIMIT, game_time=GAME_TIME_LIMIT, log=None, cache=None,
+              metrics=None, limits=None, journal=None, rules=None):
+    # Each stdin line is a JSON pairing: {"id": ..., "player_O": ..., "player_X": ...}
+    # One JSON result line is written per game, in completion order, and
+    # appended to the packed move log if one is given. With a journal, games
+    # it already holds are reported from there instead of being played.
+    pairings = []
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            pairing = json.loads(line)
+            pairings.append((pairing.get("id"), pairing["player_O"], pairing["player_X"]))
+        except (json.JSONDecodeError, KeyError, AttributeError):
+            print(json.dumps({"error": f"Invalid pairing: {line}"}), flush=True)
+
+    journal = Journal(journal) if journal else None
+    if journal:
+        for match_id, _, _ in pairings:
+            if match_id in journal.done:
+                print(json.dumps(journal.done[match_id]), flush=True)
+        pairings = [pairing for pairing in pairings if pairing[0] not in journal.done]
+
+    print(f"Running {len(pairings)} games on {workers} workers", file=sys.stderr)
+
+    rules = rules or rules_from_environment()
+    output_lock = threading.Lock()
+    writer = MoveLogWriter(log, rules) if log else None
+    metrics_writer = MetricsWriter(*metrics) if metrics else None
+
+    def report(match_id, player_O, player_X, result):
+        result.update({"id": match_id, "player_O": player_O, "player_X": player_X})
+        with output_lock:
+            if journal:
+                journal.write(result)
+            print(json.dumps(result), flush=True)
+            if writer and "moves" in result:
+                writer.write(result)
+            if metrics_writer:
+                metrics_writer.write(result, id=match_id, player_O=player_O, player_X=player_X)
+
+    if use_processes:
+        # Bot processes cannot be kept across pool processes: one game per task
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(run_match, player_O, player_X, move_time, game_time, cache, limits, None, rules):
+                    (match_id, player_O, player_X)
+                for match_id, player_O, player_X in pairings
+            }
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {"error": str(e)}
+                report(*futures[future], result)
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for future in [executor.submit(run_series, games, report, move_time, game_time, cache, limits, rules)
+                           for games in series(pairings, workers)]:
+                future.result()
+
+    if writer:
+        writer.close()
+    if journal:
+        journal.close()
+
+
+def add_limit_arguments(parser):
+    group = parser.add_argument_group("bot resource limits (0 disables one)")
+    group.add_argument("--memory-limit", type=int, default=MEMORY_LIMIT_MB, metavar="MB",
+                       help="address space of each bot")
+    group.add_argument("--cpu-limit", type=float, metavar="SECONDS",
+                       help=f"CPU time of each bot (default: game time + {CPU_GRACE:g})")
+    group.add_argument("--process-limit", type=int, default=PROCESS_LIMIT, metavar="N",
+                       help="RLIMIT_NPROC of each bot; counts all processes of this user")
+    group.add_argument("--file-size-limit", type=int, default=FILE_SIZE_LIMIT_MB, metavar="MB",
+                       help="largest file a bot may write")
+    group.add_argument("--cgroup", metavar="DIR",
+                       help="delegated cgroup v2 directory to create per-bot cgroups in")
+    group.add_argument("--cpu-quota", type=float, default=CPU_QUOTA, metavar="CPUS",
+                       help="CPUs each bot may use (needs --cgroup)")
+
+
+def limits_from_arguments(args):
+    cpu = args.cpu_limit if args.cpu_limit is not None else args.game_time + CPU_GRACE
+    return Limits(args.memory_limit, cpu, args.process_limit, args.file_size_limit,
+                  args.cgroup, args.cpu_quota)
+
+
 if __name__ == "__main__":
-    if len(sys.argv) != 4:
+    parser = argparse.ArgumentParser(description="Bot vs bot gomoku judge")
+    parser.add_argument("player1", nargs="?")
+    parser.add_argument("player2", nargs="?")
+    parser.add_argument("player1_piece", nargs="?")
+    parser.add_argument("--batch", action="store_true",
+                        help="read pairings from stdin and stream one result per line")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="number of games played concurrently in batch mode")
+    parser.add_argument("--processes", action="store_true",
+                        help="use a process pool instead of threads in batch mode")
+    parser.add_argument("--move-time", type=float, default=MOVE_TIME_LIMIT,
+                        help="seconds a bot may think about a single move")
+    parser.add_argument("--game-time", type=float, default=GAME_TIME_LIMIT,
+                        help="seconds of thinking a bot may use over the whole game")
+    parser.add_argument("--log", metavar="FILE",
+                        help="append every finished game to this packed move log")
+    parser.add_argument("--cache", metavar="FILE",
+                        help="reuse results of deterministic pairings stored in this game cache")
+    parser.add_argument("--journal", metavar="FILE",
+                        help="batch mode: journal finished games here and skip those already in it")
+    parser.add_argument("--stream", action="store_true",
+                        help="print every move as a JSON line while the game is played")
+    parser.add_argument("--metrics", metavar="FILE",
+                        help="record per-game metrics in this file")
+    parser.add_argument("--metrics-format", choices=["ndjson", "prom"],
+                        help="format of the metrics file (default: prom for *.prom, else ndjson)")
+    add_limit_arguments(parser)
+    add_rules_arguments(parser)
+    args = parser.parse_args()
+    metrics = (args.metrics, args.metrics_format) if args.metrics else None
+    limits = limits_from_arguments(args)
+    rules = rules_from_arguments(args)
+
+    if args.batch:
+        run_batch(max(1, args.workers), args.processes, args.move_time, args.game_time, args.log, args.cache, metrics, limits,
+                  args.journal, rules)
+        sys.exit(0)
+
+    if not (args.player1 and args.player2 and args.player1_piece):
         print(json.dumps({"error": "Two player programs required"}))
         sys.exit(1)
 
+    # With --stream every move is a line {"event": "move", "x", "y", "symbol", ...}
+    # and the result follows as {"event": "result", ...}
+    def emit_move(move):
+        print(json.dumps({"event": "move", **move}), flush=True)
+
+    def new_game(*players):
+        game = Game(*players, args.move_time, args.game_time, limits, rules=rules)
+        if args.stream:
+            game.on_move = emit_move
+        return game
+
     try:
-        game = Game(sys.argv[1], sys.argv[2], sys.argv[3])
-        game.play_game()
+        if args.cache:
+            if args.player1_piece == 'O':
+                player_O, player_X = args.player1, args.player2
+            else:
+                player_O, player_X = args.player2, args.player1
+            result = GameCache.open(args.cache).play(
+                player_O, player_X, lambda: new_game(player_O, player_X, 'O'), variant=rules.key())
+            if args.stream and result.get("cached"):
+                for move in result["moves"]:
+                    emit_move(move)
+        else:
+            result = new_game(args.player1, args.player2, args.player1_piece).play_game()
+        print(json.dumps({"event": "result", **result} if args.stream else result), flush=True)
+        if args.log:
+            with MoveLogWriter(args.log, rules) as writer:
+                writer.write(result)
+        if metrics:
+            MetricsWriter(*metrics).write(result, player1=args.player1, player2=args.player2)
     except Exception as e:
-        print(json.dumps({"error": str(e)}))
+        error = {"error": str(e)}
+        print(json.dumps({"event": "result", **error} if args.stream else error))
         sys.exit(1)
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+import argparse
+import heapq
+import os
+import random
+import sys
+import time
+
+from board import N, cell_lines, line_cells
+
+# Reference opponent speaking the usual bot protocol (ready / start / "x y" /
+# end), with the "newgame" extension: it announces "ready newgame" and after
+# "newgame O" or "newgame X" starts over for the next game of a series
+# without being respawned. It also takes the "rules" line of rules.py: other
+# board sizes are played in full, the swap opening is never asked for but
+# answered, and under exact-five it still counts overlines as wins in its
+# search. Iterative-deepening negamax with alpha-beta, a Zobrist-hashed
+# transposition table and threat-based move generation: a move that makes
+# five is played at once, a four of the opponent must be blocked, and
+# otherwise only the most promising cells near the stones are searched.
+#
+# Positions are scored over all five-cell lines: a line holding stones of
+# only one player is worth LINE_VALUES[stones] to that player. The line
+# counts, the score and each empty cell's value for both players are kept
+# up to date on every move, so nothing is rescanned during the search.
+#
+# The strength is picked with --level, or from the program name when the
+# engine is installed under another name: boss-easy plays the easy level.
+# With --book (or ENGINE_BOOK) pointing at a positions.py index, the first
+# BOOK_PLIES moves come from the stored games where possible: the reply with
+# the best score among those played at least BOOK_MIN_GAMES times.
+
+LEVELS = {
+    # depth: deepest iteration, time: seconds per move, width: moves searched per node
+    "easy": {"depth": 1, "time": 0.1, "width": 6},
+    "medium": {"depth": 3, "time": 0.3, "width": 8},
+    "hard": {"depth": 8, "time": 1.0, "width": 10},
+}
+DEFAULT_LEVEL = "hard"
+GAME_BUDGET = 6.0       # seconds of thinking over a whole game, below the judge's limit
+TT_SIZE = 1 << 18       # transposition table slots
+LINE_VALUES = [0, 1, 10, 100, 1000, 100000]
+WIN = 10 ** 7
+BOOK_PLIES = 10         # moves of a game looked up in the opening book
+BOOK_MIN_GAMES = 3      # games a book move needs before it is trusted
+
+EMPTY, O, X = 0, 1, 2
+GAINS = [LINE_VALUES[i + 1] - LINE_VALUES[i] for i in range(5)] + [0]
+FIVE = GAINS[4]  # a cell worth this much completes a line
+
+
+def build_neighbours(n, radius=2):
+    return [
+        [(x + dx) * n + y + dy
+         for dx in range(-radius, radius + 1) for dy in range(-radius, radius + 1)
+         if (dx or dy) and 0 <= x + dx < n and 0 <= y + dy < n]
+        for x in range(n) for y in range(n)
+    ]
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class Engine:
+    def __init__(self, n=N, depth=3, move_time=0.3, width=8, game_budget=GAME_BUDGET):
+        self.n = n
+        self.max_depth = depth
+        self.move_time = move_time
+        self.width = width
+        self.game_budget = game_budget
+
+        self.lines, self.cell_lines = line_cells(n), cell_lines(n)
+        self.neighbours = build_neighbours(n)
+        rng = random.Random(2024)
+        self.zobrist = [None] + [[rng.getrandbits(64) for _ in range(n * n)] for _ in (O, X)]
+        self.reset()
+
+    def reset(self):
+        # Empty board, table and clock for a new game
+        n = self.n
+        self.budget = self.game_budget
+        self.cells = [EMPTY] * (n * n)
+        self.counts = [None, [0] * len(self.lines), [0] * len(self.lines)]
+        self.values = [None, [0] * (n * n), [0] * (n * n)]  # gain of playing a cell, per player
+        for cell, line_ids in enumerate(self.cell_lines):
+            self.values[O][cell] = self.values[X][cell] = GAINS[0] * len(line_ids)
+        self.near = [0] * (n * n)  # stones within two cells
+        self.score = 0             # from O's point of view
+        self.hash = 0
+        self.stones = 0
+
+        self.table = [None] * TT_SIZE
+        self.nodes = 0
+        self.deadline = 0.0
+        self.root_move = None
+
+    def update(self, cell, color, step):
+        # Add (step 1) or remove (step -1) a stone of color on cell. Returns
+        # True when the stone completes five.
+        counts_O, counts_X = self.counts[O], self.counts[X]
+        values_O, values_X = self.values[O], self.values[X]
+        own = self.counts[color]
+        five = False
+        for line_id in self.cell_lines[cell]:
+            o, x = counts_O[line_id], counts_X[line_id]
+            old_score = LINE_VALUES[o] if not x else (-LINE_VALUES[x] if not o else 0)
+            old_O = GAINS[o] if not x else 0
+            old_X = GAINS[x] if not o else 0
+
+            own[line_id] += step
+            if own[line_id] == 5:
+                five = True
+            o, x = counts_O[line_id], counts_X[line_id]
+
+            self.score += (LINE_VALUES[o] if not x else (-LINE_VALUES[x] if not o else 0)) - old_score
+            delta_O = (GAINS[o] if not x else 0) - old_O
+            delta_X = (GAINS[x] if not o else 0) - old_X
+            if delta_O or delta_X:
+                for other in self.lines[line_id]:
+                    values_O[other] += delta_O
+                    values_X[other] += delta_X
+
+        for other in self.neighbours[cell]:
+            self.near[other] += step
+        self.hash ^= self.zobrist[color][cell]
+        self.stones += step
+        return five
+
+    def place(self, cell, color):
+        self.cells[cell] = color
+        return self.update(cell, color, 1)
+
+    def undo(self, cell):
+        color = self.cells[cell]
+        self.update(cell, color, -1)
+        self.cells[cell] = EMPTY
+
+    def candidates(self, color, first=None):
+        if not self.stones:
+            return [(self.n // 2) * self.n + self.n // 2]
+        mine, theirs = self.values[color], self.values[3 - color]
+        cells = self.cells
+        free = [cell for cell, near in enumerate(self.near) if near and not cells[cell]]
+
+        wins = [cell for cell in free if mine[cell] >= FIVE]
+        if wins:
+            return wins[:1]
+        blocks = [cell for cell in free if theirs[cell] >= FIVE]
+        if blocks:
+            return blocks
+
+        moves = heapq.nlargest(self.width, free, key=lambda cell: mine[cell] + theirs[cell])
+        if first is not None and not cells[first]:
+            if first in moves:
+                moves.remove(first)
+            moves.insert(0, first)
+        return moves
+
+    def forced(self, color):
+        # True when a move makes five or has to stop the opponent's five
+        return any(self.values[player][cell] >= FIVE
+                   for player in (color, 3 - color)
+                   for cell, near in enumerate(self.near) if near and not self.cells[cell])
+
+    def negamax(self, depth, alpha, beta, color, ply):
+        self.nodes += 1
+        if self.nodes & 255 == 0 and time.monotonic() > self.deadline:
+            raise SearchTimeout
+
+        if depth == 0:
+            return self.score if color == O else -self.score
+
+        slot = self.hash & (TT_SIZE - 1)
+        entry = self.table[slot]
+        first = None
+        if entry and entry[0] == self.hash:
+            _, entry_depth, value, bound, first = entry
+            if entry_depth >= depth and ply:
+                if bound == 0 or (bound < 0 and value <= alpha) or (bound > 0 and value >= beta):
+                    return value
+
+        moves = self.candidates(color, first)
+        if not moves:
+            return 0  # board full
+
+        original_alpha = alpha
+        best, best_move = -WIN - 1, moves[0]
+        for cell in moves:
+            try:
+                if self.place(cell, color):
+                    value = WIN - ply
+                else:
+                    value = -self.negamax(depth - 1, -beta, -alpha, 3 - color, ply + 1)
+            finally:
+                self.undo(cell)  # also when the search runs out of time
+            if value > best:
+                best, best_move = value, cell
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                break
+
+        if not ply:
+            self.root_move = best_move
+        bound = -1 if best <= original_alpha else (1 if best >= beta else 0)
+        self.table[slot] = (self.hash, depth, best, bound, best_move)
+        return best
+
+    def think(self, color):
+        # Best move for color by iterative deepening within the move budget
+        started = time.monotonic()
+        limit = max(0.02, min(self.move_time, self.budget / 15))
+        self.deadline = started + limit
+        self.nodes = 0
+
+        moves = self.candidates(color)
+        best = moves[0]
+        if len(moves) > 1:
+            for depth in range(1, self.max_depth + 1):
+                try:
+                    value = self.negamax(depth, -WIN - 1, WIN + 1, color, 0)
+                except SearchTimeout:
+                    break
+                best = self.root_move
+                if abs(value) >= WIN - 100:
+                    break  # forced win or loss found
+
+        self.budget -= time.monotonic() - started
+        return best
+
+
+def level_from_name(program):
+    suffix = os.path.basename(program).rsplit('-', 1)[-1]
+    return suffix if suffix in LEVELS else DEFAULT_LEVEL
+
+
+def book_move(book, history):
+    # The best scoring well-known reply to the moves so far, or None
+    if book is None or len(history) >= BOOK_PLIES:
+        return None
+    known = [entry for entry in book.book(history) if entry["games"] >= BOOK_MIN_GAMES]
+    if not known:
+        return None
+    best = max(known, key=lambda entry: ((entry["wins"] + entry["draws"] / 2) / entry["games"], entry["games"]))
+    return best["x"] * N + best["y"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Alpha-beta gomoku bot")
+    parser.add_argument("--level", choices=LEVELS, default=level_from_name(sys.argv[0]))
+    parser.add_argument("--depth", type=int, help="override the level's search depth")
+    parser.add_argument("--time", type=float, help="override the level's seconds per move")
+    parser.add_argument("--width", type=int, help="override the level's moves searched per node")
+    parser.add_argument("--book", default=os.environ.get("ENGINE_BOOK"),
+                        help="positions.py index to take opening moves from")
+    args = parser.parse_args()
+
+    level = LEVELS[args.level]
+
+    def new_engine(n=N):
+        return Engine(n, depth=args.depth or level["depth"],
+                      move_time=args.time or level["time"],
+                      width=args.width or level["width"])
+
+    engine = new_engine()
+    book = None
+    if args.book and os.path.exists(args.book):
+        from positions import PositionIndex
+        book = PositionIndex(args.book)
+    opening_book = book
+
+    print("ready newgame rules", flush=True)
+    color = None
+    history = []  # (x, y) of all moves so far, for the book
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        if line == "end":
+            break
+        if line.startswith("rules"):
+            # The book only holds games of the default board
+            n = int(line.split()[1])
+            engine = new_engine(n)
+            opening_book = book if n == N else None
+            continue
+        if line.startswith("newgame"):
+            engine.reset()
+            color = O if line.split()[-1] == "O" else X
+            history = []
+            continue
+        if line == "start":
+            color = O
+        elif line == "swap":
+            # The opponent took our first stone; we go on with X
+            color = 3 - color
+        else:
+            x, y = map(int, line.split())
+            if color is None:
+                color = X
+            engine.place(x * engine.n + y, 3 - color)
+            history.append((x, y))
+
+        cell = None if engine.forced(color) else book_move(opening_book, history)
+        if cell is None or engine.cells[cell] != EMPTY:
+            cell = engine.think(color)
+        engine.place(cell, color)
+        history.append(divmod(cell, engine.n))
+        print(cell // engine.n, cell % engine.n, flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+GAME_CACHE_MAX = 5000  # pairings remembered at most, least recently used go first
+CONFIRMATIONS = 2      # repeats of the stored game needed before it is served
+SEED_GAP = 1.0         # seconds between the stored game and a repeat that
+                       # counts, so bots seeded with time(NULL) see a new seed
+
+# Results of bot-vs-bot games keyed by the content hashes of the two
+# binaries (and the rules, when they are not the default), so a recompiled
+# bot never hits a stale entry. A pairing goes through three states:
+#   candidate      played, result stored; every later game of the pairing
+#                  is still played and compared with it move by move
+#   deterministic  CONFIRMATIONS games, at least SEED_GAP after the stored
+#                  one, repeated it exactly (every move and the outcome);
+#                  from now on the stored result is returned without
+#                  running bots
+#   random         some game differed from the stored one; always played
+#                  for real
+# Games that timed out or hit a limit neither confirm nor refute a pairing.
+# The cache is an SQLite file, so it is shared by the batch judge's workers
+# and by separate judge runs.
+
+
+_hashes = {}  # (path, inode, mtime, size) -> sha256 of the file
+_caches = {}  # (pid, path) -> GameCache
+
+
+def binary_hash(program):
+    stat = os.stat(f'./{program}')
+    key = (program, stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    if key not in _hashes:
+        digest = hashlib.sha256()
+        with open(f'./{program}', 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 16), b''):
+                digest.update(chunk)
+        _hashes[key] = digest.hexdigest()
+    return _hashes[key]
+
+
+def same_game(stored, result):
+    # Whole move sequence and outcome
+    def played(game):
+        return ([(move["x"], move["y"]) for move in game.get("moves", [])],
+                game.get("winner"), game.get("reason"), bool(game.get("swapped")))
+    return played(stored) == played(result)
+
+
+def cacheable(result):
+    # Timeouts and resource limits depend on machine load, errors on the environment
+    return (result.get("success") and not result.get("error")
+            and result.get("reason") not in ("timeout", "resource_limit"))
+
+
+class GameCache:
+    def __init__(self, path, max_entries=GAME_CACHE_MAX):
+        self.path = path
+        self.max_entries = max_entries
+        self.locks = {}
+        self.locks_lock = threading.Lock()
+        with closing(self.connect()) as db, db:
+            db.execute("""CREATE TABLE IF NOT EXISTS games (
+                key TEXT PRIMARY KEY,
+                state TEXT NOT NULL,
+                result TEXT NOT NULL,
+                used REAL NOT NULL,
+                recorded REAL NOT NULL,
+                confirmed INTEGER NOT NULL DEFAULT 0
+            )""")
+            # Caches created before full-game checks lack the repeat count;
+            # the pairings they called deterministic are checked again
+            columns = {row[1] for row in db.execute("PRAGMA table_info(games)")}
+            if "confirmed" not in columns:
+                db.execute("ALTER TABLE games ADD COLUMN confirmed INTEGER NOT NULL DEFAULT 0")
+                db.execute("UPDATE games SET state = 'candidate' WHERE state = 'deterministic'")
+
+    @classmethod
+    def open(cls, path):
+        # One cache object per process and file, so pool workers share locks
+        key = (os.getpid(), path)
+        if key not in _caches:
+            _caches[key] = cls(path)
+        return _caches[key]
+
+    def connect(self):
+        db = sqlite3.connect(self.path, timeout=30)
+        db.execute("PRAGMA journal_mode=WAL")
+        return db
+
+    def lock(self, key):
+        with self.locks_lock:
+            return self.locks.setdefault(key, threading.Lock())
+
+    def get(self, key):
+        with closing(self.connect()) as db, db:
+            row = db.execute("SELECT state, result, recorded, confirmed FROM games WHERE key = ?",
+                             (key,)).fetchone()
+            if row:
+                db.execute("UPDATE games SET used = ? WHERE key = ?", (time.time(), key))
+        if row is None:
+            return None, None, None, 0
+        return row[0], json.loads(row[1]), row[2], row[3]
+
+    def put(self, key, state, result):
+        with closing(self.connect()) as db, db:
+            now = time.time()
+            db.execute("INSERT OR REPLACE INTO games (key, state, result, used, recorded) VALUES (?, ?, ?, ?, ?)",
+                       (key, state, json.dumps(result), now, now))
+            db.execute("""DELETE FROM games WHERE key NOT IN (
+                SELECT key FROM games ORDER BY used DESC LIMIT ?)""", (self.max_entries,))
+
+    def update(self, key, state, confirmed):
+        with closing(self.connect()) as db, db:
+            db.execute("UPDATE games SET state = ?, confirmed = ? WHERE key = ?", (state, confirmed, key))
+
+    def check(self, key, result):
+        # Compare another finished game of a candidate pairing with the
+        # stored one
+        state, stored, recorded, confirmed = self.get(key)
+        if state != "candidate" or not cacheable(result):
+            return
+        if not same_game(stored, result):
+            self.put(key, "random", {})
+        elif time.time() - recorded >= SEED_GAP:
+            confirmed += 1
+            self.update(key, "deterministic" if confirmed >= CONFIRMATIONS else "candidate", confirmed)
+
+    def play(self, player_O, player_X, new_game, variant=""):
+        # new_game() returns a fresh Game with player_O as O; variant names
+        # rules other than the default (rules.Rules.key), whose games are
+        # cached apart
+        key = f"{binary_hash(player_O)}:{binary_hash(player_X)}"
+        if variant:
+            key += f":{variant}"
+
+        # Identical pairings wait for each other, so the first game decides
+        # for the rest of the batch
+        with self.lock(key):
+            state, stored, _, _ = self.get(key)
+
+            if state == "deterministic":
+                return {**stored, "cached": True}
+
+            if state is None:
+                result = new_game().play_game()
+                if cacheable(result):
+                    # Metrics describe this run only
+                    self.put(key, "candidate", {k: v for k, v in result.items() if k != "metrics"})
+                return result
+
+        result = new_game().play_game()
+        if state == "candidate":
+            with self.lock(key):
+                self.check(key, result)
+        return result
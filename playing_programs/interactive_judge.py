@@ -5,18 +5,19 @@ import os
 import time
 import stat
 
-N = 15
+import sandbox
+import rules
+import metrics
 
 class InteractiveGame:
     def __init__(self, bot_program, player_piece='O'):
-        self.board = [[' ' for _ in range(N)] for _ in range(N)]
-        self.player_piece = player_piece
-        self.bot_piece = 'X' if player_piece == 'O' else 'O'
+        # The web client shows only the exact-five rule of rules.py.
+        self.rules = rules.from_environment().interactive()
+        self.board = self.rules.board()
 
         current_dir = os.path.dirname(os.path.abspath(__file__))
         bot_path = os.path.join(current_dir, bot_program)
         print(f"Full bot path: {bot_path}", file=sys.stderr)
-        print(f"Player plays as: {player_piece}", file=sys.stderr)
 
         if not os.path.exists(bot_path):
             raise FileNotFoundError(f"Bot program not found at: {bot_path}")
@@ -33,8 +34,8 @@ class InteractiveGame:
                 print(f"Could not make bot executable: {e}", file=sys.stderr)
                 raise
 
-        # Small delay to ensure file system operations are complete
-        time.sleep(0.1)
+            # Small delay to ensure file system operations are complete
+            time.sleep(0.1)
 
         try:
             self.bot_process = subprocess.Popen(
@@ -48,6 +49,10 @@ class InteractiveGame:
         except Exception as e:
             print(f"Failed to start bot process: {e}", file=sys.stderr)
             raise
+        self.limits = sandbox.from_environment()
+        self.cgroup = self.limits.apply(self.bot_process.pid)
+        # With JUDGE_METRICS set the game is recorded there by cleanup()
+        self.metrics = metrics.from_environment()
 
         # Wait for ready message with timeout
         try:
@@ -59,7 +64,7 @@ class InteractiveGame:
                 ready = self.bot_process.stdout.readline().strip()
                 print(f"Bot says: {ready}", file=sys.stderr)
 
-                if not ready or ready != "ready":
+                if not ready or ready.split()[0] != "ready":
                     # Check if process crashed
                     if self.bot_process.poll() is not None:
                         stderr_output = self.bot_process.stderr.read()
@@ -80,6 +85,17 @@ class InteractiveGame:
                 stderr_output = self.bot_process.stderr.read()
                 raise RuntimeError(f"Failed to get ready message: {e}. Stderr: {stderr_output}")
 
+        if not self.rules.is_default():
+            if "rules" not in ready.split()[1:]:
+                raise RuntimeError(f'Bot does not support the rules "{self.rules.line()}"')
+            self.bot_process.stdin.write(self.rules.line() + "\n")
+            self.bot_process.stdin.flush()
+
+        self.player_piece = player_piece
+        self.bot_piece = 'X' if player_piece == 'O' else 'O'
+        self.record = metrics.InteractiveRecord(bot_program, self.bot_piece)
+        print(f"Player plays as: {player_piece}", file=sys.stderr)
+
         # Handle first move if bot plays as O
         if self.bot_piece == 'O':
             print(f"Bot plays first as O", file=sys.stderr)
@@ -88,26 +104,32 @@ class InteractiveGame:
                 self.bot_process.stdin.flush()
 
                 # Get bot's first move with timeout
+                started = time.monotonic()
                 bot_move = self.bot_process.stdout.readline().strip()
+                think = time.monotonic() - started
                 print(f"Bot's first move: {bot_move}", file=sys.stderr)
 
                 if not bot_move:
                     raise RuntimeError("Bot didn't provide first move")
 
                 bot_x, bot_y = map(int, bot_move.split())
-                if 0 <= bot_x < N and 0 <= bot_y < N:
-                    self.board[bot_x][bot_y] = 'O'
+                if self.board.is_free(bot_x, bot_y):
+                    self.board.place(bot_x, bot_y, 'O')
+                    self.record.move(think, time.monotonic() - started - think)
                     print(json.dumps({'x': bot_x, 'y': bot_y, 'initial': True}))
                     sys.stdout.flush()
                 else:
+                    self.record.fail("bad_move")
                     print(json.dumps({'error': 'Invalid bot first move coordinates'}))
                     sys.stdout.flush()
 
             except ValueError as e:
+                self.record.fail("bad_move")
                 print(f"Error parsing bot's first move: {str(e)}", file=sys.stderr)
                 print(json.dumps({'error': 'Invalid bot first move format'}))
                 sys.stdout.flush()
             except Exception as e:
+                self.record.fail("crash")
                 print(f"Error processing bot's first move: {str(e)}", file=sys.stderr)
                 stderr_output = self.bot_process.stderr.read()
                 print(f"Bot stderr: {stderr_output}", file=sys.stderr)
@@ -115,50 +137,22 @@ class InteractiveGame:
                 sys.stdout.flush()
 
     def check_win(self, x, y, symbol):
-        directions = [
-            [(0, 1)],  # horizontal
-            [(1, 0)],  # vertical
-            [(1, 1)],  # diagonal \
-            [(1, -1)]  # diagonal /
-        ]
-
-        for dir in directions:
-            dx, dy = dir[0]
-            winning_cells = [(x, y)]  # Include the current move
-            count = 1
-
-            # Check in positive direction
-            i, j = x + dx, y + dy
-            while 0 <= i < N and 0 <= j < N and self.board[i][j] == symbol:
-                winning_cells.append((i, j))
-                count += 1
-                i += dx
-                j += dy
-
-            # Check in negative direction
-            i, j = x - dx, y - dy
-            while 0 <= i < N and 0 <= j < N and self.board[i][j] == symbol:
-                winning_cells.append((i, j))
-                count += 1
-                i -= dx
-                j -= dy
-
-            if count >= 5:
-                return winning_cells
-        return None
+        return self.board.winning_cells(x, y, symbol)
 
     def make_move(self, x, y):
+        turn_started = time.monotonic()
         try:
             # Validate the move
-            if not (0 <= x < N and 0 <= y < N) or self.board[x][y] != ' ':
+            if not self.board.is_free(x, y):
                 return {'error': 'Invalid move'}
 
             # Update board with player's move
-            self.board[x][y] = self.player_piece
+            self.board.place(x, y, self.player_piece)
 
             # Check if player won
             winning_cells = self.check_win(x, y, self.player_piece)
             if winning_cells:
+                self.record.winner = self.player_piece
                 return {
                     'x': -1,
                     'y': -1,
@@ -171,7 +165,9 @@ class InteractiveGame:
                 self.bot_process.stdin.write(f"{x} {y}\n")
                 self.bot_process.stdin.flush()
             except BrokenPipeError:
+                self.record.fail("crash")
                 return {'error': 'Bot process crashed'}
+            bot_started = time.monotonic()
 
             # Get bot's response with retries and timeout
             MAX_ATTEMPTS = 3
@@ -180,21 +176,31 @@ class InteractiveGame:
                     # Check if bot process is still alive
                     if self.bot_process.poll() is not None:
                         stderr_output = self.bot_process.stderr.read()
-                        return {'error': f'Bot process died. Stderr: {stderr_output}'}
+                        response = {'error': f'Bot process died. Stderr: {stderr_output}'}
+                        limit = self.limits.hit(self.bot_process.returncode, cgroup=self.cgroup,
+                                                stderr=stderr_output)
+                        if limit:
+                            response['limit'] = limit
+                        self.record.fail("resource_limit" if limit else "crash")
+                        return response
 
                     bot_move = self.bot_process.stdout.readline().strip()
                     if not bot_move:
                         if attempt == MAX_ATTEMPTS - 1:
+                            self.record.fail("crash")
                             return {'error': 'Bot failed to respond'}
                         time.sleep(0.1)  # Brief delay before retry
                         continue
 
                     bot_x, bot_y = map(int, bot_move.split())
-                    if 0 <= bot_x < N and 0 <= bot_y < N and self.board[bot_x][bot_y] == ' ':
-                        self.board[bot_x][bot_y] = self.bot_piece
+                    if self.board.is_free(bot_x, bot_y):
+                        self.board.place(bot_x, bot_y, self.bot_piece)
+                        think = time.monotonic() - bot_started
+                        self.record.move(think, time.monotonic() - turn_started - think)
 
                         winning_cells = self.check_win(bot_x, bot_y, self.bot_piece)
                         if winning_cells:
+                            self.record.winner = self.bot_piece
                             return {
                                 'x': bot_x,
                                 'y': bot_y,
@@ -204,18 +210,21 @@ class InteractiveGame:
                         return {'x': bot_x, 'y': bot_y, 'winner': None}
                     else:
                         if attempt == MAX_ATTEMPTS - 1:
+                            self.record.fail("bad_move")
                             return {'error': f'Bot made invalid move: {bot_x}, {bot_y}'}
                         time.sleep(0.1)
                         continue
 
                 except ValueError:
                     if attempt == MAX_ATTEMPTS - 1:
+                        self.record.fail("bad_move")
                         stderr_output = self.bot_process.stderr.read()
                         return {'error': f'Bot sent invalid move format: "{bot_move}". Stderr: {stderr_output}'}
                     time.sleep(0.1)
                     continue
                 except Exception as e:
                     if attempt == MAX_ATTEMPTS - 1:
+                        self.record.fail("crash")
                         stderr_output = self.bot_process.stderr.read()
                         return {'error': f'Error reading bot move: {str(e)}. Stderr: {stderr_output}'}
                     time.sleep(0.1)
@@ -228,6 +237,7 @@ class InteractiveGame:
             return {'error': 'Internal game error'}
 
     def cleanup(self):
+        max_rss_kb = metrics.peak_rss_kb(self.bot_process.pid)
         try:
             if self.bot_process.poll() is None:  # Process is still running
                 self.bot_process.stdin.write("end\n")
@@ -252,6 +262,10 @@ class InteractiveGame:
                 self.bot_process.kill()
             except:
                 pass
+        sandbox.release(self.cgroup)
+        if self.metrics:
+            self.metrics.write(self.record.result(max_rss_kb), bot=self.record.program,
+                               player_piece=self.player_piece)
 
 if __name__ == "__main__":
     if len(sys.argv) < 3:
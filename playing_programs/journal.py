@@ -0,0 +1,45 @@
+import json
+import os
+
+# Write-ahead journal of finished games for resumable batches. Every result
+# is appended as one JSON line and fsynced before it is printed, so whatever
+# the server may have seen is on disk. A batch started again with the same
+# journal re-reports the journaled results of the pairings it is given and
+# only plays the rest. Failed games (results with an "error") are not
+# journaled, so a resumed batch plays them again.
+
+
+class Journal:
+    def __init__(self, path):
+        self.path = path
+        self.done = {}  # pairing id -> journaled result
+        if os.path.exists(path):
+            self.load()
+        self.file = open(path, 'a')
+
+    def load(self):
+        with open(self.path, 'rb+') as f:
+            data = f.read()
+            # A crash can leave half a line at the end; cut it off so the
+            # next record starts on a line of its own
+            end = data.rfind(b'\n') + 1
+            if end < len(data):
+                f.truncate(end)
+        for line in data[:end].splitlines():
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if "id" in result and "error" not in result:
+                self.done[result["id"]] = result
+
+    def write(self, result):
+        if "error" in result:
+            return
+        self.file.write(json.dumps(result) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.done[result.get("id")] = result
+
+    def close(self):
+        self.file.close()
@@ -2,11 +2,12 @@ import subprocess
 import random
 import json
 
-N = 15
+import rules
 
 class Game:
     def __init__(self):
-        self.board = [['.' for _ in range(N)] for _ in range(N)]
+        self.rules = rules.from_environment()
+        self.board = self.rules.board()
         self.process1 = subprocess.Popen(['./agent1'],
                                        stdin=subprocess.PIPE,
                                        stdout=subprocess.PIPE,
@@ -27,6 +28,14 @@ class Game:
         print(f"Process 1: {ready1}")
         print(f"Process 2: {ready2}")
 
+        # Rules other than the default are announced to both agents
+        if not self.rules.is_default():
+            for process, ready in ((self.process1, ready1), (self.process2, ready2)):
+                assert "rules" in ready.split()[1:], f"Agent does not support the rules \"{self.rules.line()}\""
+                assert process.stdin != None
+                process.stdin.write(f"{self.rules.line()}\n")
+                process.stdin.flush()
+
         # Randomly decide who plays first
         self.curr = random.choice([self.process1, self.process2])
         if self.curr == self.process1:
@@ -39,38 +48,11 @@ class Game:
         print("Game initialized")
 
     def check_win(self, x, y, symbol):
-        directions = [
-            [(0, 1)],  # horizontal
-            [(1, 0)],  # vertical
-            [(1, 1)],  # diagonal \
-            [(1, -1)]  # diagonal /
-        ]
-
-        for dir in directions:
-            dx, dy = dir[0]
-            count = 1  # count the piece we just placed
-
-            # Check in positive direction
-            i, j = x + dx, y + dy
-            while 0 <= i < N and 0 <= j < N and self.board[i][j] == symbol:
-                count += 1
-                i += dx
-                j += dy
-
-            # Check in negative direction
-            i, j = x - dx, y - dy
-            while 0 <= i < N and 0 <= j < N and self.board[i][j] == symbol:
-                count += 1
-                i -= dx
-                j -= dy
-
-            if count >= 5:
-                return True
-        return False
+        return self.board.is_win(x, y, symbol)
 
     def print_board(self):
         print("\nCurrent board state:")
-        for row in self.board:
+        for row in self.board.rows('.'):
             print(' '.join(row))
         print()
 
@@ -83,16 +65,27 @@ class Game:
             self.curr.stdin.flush()
 
             moves_count = 0
-            while moves_count < N**2:
+            swapped = False
+            while not self.board.is_full():
                 print(f"\nWaiting for player {self.curr_symbol}'s move...")
                 assert self.curr.stdout != None
                 move = self.curr.stdout.readline().strip()
                 print(f"Received move: {move}")
 
+                if move == "swap" and self.rules.swap and moves_count == 1 and not swapped:
+                    # X takes over O's stone; the agent that opened plays X
+                    print("Player X swapped colours")
+                    swapped = True
+                    assert self.next.stdin != None
+                    self.next.stdin.write("swap\n")
+                    self.next.stdin.flush()
+                    self.curr, self.next = self.next, self.curr
+                    continue
+
                 try:
                     x, y = map(int, move.split())
-                    if 0 <= x < N and 0 <= y < N and self.board[x][y] == '.':
-                        self.board[x][y] = self.curr_symbol
+                    if self.board.is_free(x, y):
+                        self.board.place(x, y, self.curr_symbol)
                         print(f"Player {self.curr_symbol} placed at: {x}, {y}")
                         self.print_board()
                         moves_list.append([x, y])
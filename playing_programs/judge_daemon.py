@@ -0,0 +1,452 @@
+import asyncio
+import json
+import os
+import stat
+import sys
+import time
+
+import sandbox
+import rules
+import metrics
+
+READY_TIMEOUT = 5.0    # seconds a bot has to print "ready"
+MOVE_TIMEOUT = 5.0     # seconds a bot has to answer a move
+POOL_SPARES = 2        # ready bot processes kept per warm opponent
+POOL_IDLE = 10 * 60    # seconds after which unused warm opponents are cooled
+POOL_MAX_BOTS = 20     # warm opponents kept at most, least recently used go first
+STDERR_TAIL = 2048     # bytes of bot stderr kept for error messages
+
+# One process hosting many interactive games. Commands are JSON lines on stdin:
+#   {"cmd": "start", "id": ..., "bot": ..., "piece": "O" | "X"}
+#   {"cmd": "move", "id": ..., "x": ..., "y": ..., "seq": n}
+#   {"cmd": "end", "id": ...}
+#   {"cmd": "warm", "bot": ..., "pin": true | false}
+#   {"cmd": "cool", "bot": ...}
+#   {"cmd": "stats", "id": ...}
+# An end that arrives while its game is still starting is held back until the
+# start has been answered, then the game is ended.
+# Every reply is a JSON line carrying the id of the command it answers, with
+# the same fields interactive_judge.py prints. The optional seq of a move is
+# the player's move number (1, 2, ...); its reply echoes it, and a move with
+# an unexpected number is refused without touching the board. Games follow
+# the rules of rules.from_environment() that the web client can show. With
+# JUDGE_METRICS set, every game is recorded there when it ends, as
+# metrics.InteractiveRecord describes.
+
+
+class Bot:
+    def __init__(self, name, process, limits):
+        self.name = name
+        self.process = process
+        self.limits = limits
+        self.cgroup = limits.apply(process.pid)
+        self.stderr = b''
+        self.stderr_task = asyncio.create_task(self.drain_stderr())
+        self.capabilities = set()  # protocol extensions named in its ready line
+
+    @classmethod
+    async def launch(cls, name):
+        current_dir = os.path.dirname(os.path.abspath(__file__))
+        bot_path = os.path.join(current_dir, name)
+
+        if not os.path.exists(bot_path):
+            raise FileNotFoundError(f"Bot program not found at: {bot_path}")
+
+        if not os.access(bot_path, os.X_OK):
+            os.chmod(bot_path, os.stat(bot_path).st_mode | stat.S_IEXEC)
+
+        process = await asyncio.create_subprocess_exec(
+            bot_path,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        bot = cls(name, process, sandbox.from_environment())
+
+        ready = await bot.read_line(READY_TIMEOUT)
+        # Bots may name protocol extensions after "ready"
+        if ready is None or ready.split()[:1] != ["ready"]:
+            await bot.close()
+            if ready is None:
+                raise TimeoutError(f"Bot didn't respond within {READY_TIMEOUT} seconds. Stderr: {bot.stderr_text()}")
+            raise RuntimeError(f"Bot didn't send ready message, got: '{ready}'")
+        bot.capabilities = set(ready.split()[1:])
+        return bot
+
+    async def drain_stderr(self):
+        # Keep reading so a chatty bot never blocks on a full stderr pipe
+        while True:
+            data = await self.process.stderr.read(4096)
+            if not data:
+                break
+            self.stderr = (self.stderr + data)[-STDERR_TAIL:]
+
+    def stderr_text(self):
+        return self.stderr.decode(errors='replace')
+
+    async def limit_hit(self):
+        # The resource limit a dead bot ran into, or None
+        try:
+            await asyncio.wait_for(self.process.wait(), 1)
+        except asyncio.TimeoutError:
+            return None
+        return self.limits.hit(self.process.returncode, cgroup=self.cgroup, stderr=self.stderr_text())
+
+    def alive(self):
+        return self.process.returncode is None
+
+    async def send(self, line):
+        self.process.stdin.write(f"{line}\n".encode())
+        await self.process.stdin.drain()
+
+    async def read_line(self, timeout):
+        # None on timeout or when the bot closed its stdout
+        try:
+            line = await asyncio.wait_for(self.process.stdout.readline(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        if not line:
+            return None
+        return line.decode(errors='replace').strip()
+
+    async def close(self):
+        try:
+            if self.alive():
+                await self.send("end")
+            self.process.terminate()
+            await asyncio.wait_for(self.process.wait(), 2)
+        except (ProcessLookupError, BrokenPipeError, ConnectionResetError):
+            pass
+        except asyncio.TimeoutError:
+            self.process.kill()
+            await self.process.wait()
+        self.stderr_task.cancel()
+        sandbox.release(self.cgroup)
+
+
+class BotPool:
+    # Ready bot processes for popular opponents, handed out one per game
+    def __init__(self, spares=POOL_SPARES, idle=POOL_IDLE, max_bots=POOL_MAX_BOTS):
+        self.spares_per_bot = spares
+        self.idle = idle
+        self.max_bots = max_bots
+        self.spares = {}     # bot name -> list of ready Bot
+        self.filling = {}    # bot name -> number of launches in flight
+        self.last_used = {}  # bot name -> monotonic time of last use, oldest first
+        self.pinned = set()  # bots that stay warm however long they are unused
+        self.hits = 0
+        self.misses = 0
+        self.reaped = 0
+
+    def warm(self, name, pin=False):
+        if pin:
+            self.pinned.add(name)
+        self.last_used.pop(name, None)
+        self.last_used[name] = time.monotonic()
+        self.spares.setdefault(name, [])
+        self.fill(name)
+
+        unpinned = [bot for bot in self.last_used if bot not in self.pinned]
+        for oldest in unpinned[:max(0, len(unpinned) - self.max_bots)]:
+            asyncio.create_task(self.cool(oldest))
+
+    def fill(self, name):
+        missing = self.spares_per_bot - len(self.spares[name]) - self.filling.get(name, 0)
+        for _ in range(missing):
+            self.filling[name] = self.filling.get(name, 0) + 1
+            asyncio.create_task(self.add_spare(name))
+
+    async def add_spare(self, name):
+        try:
+            bot = await Bot.launch(name)
+        except Exception as e:
+            print(f"Could not warm {name}: {e}", file=sys.stderr)
+            return
+        finally:
+            self.filling[name] -= 1
+
+        if name in self.spares:
+            self.spares[name].append(bot)
+        else:
+            # Cooled while launching
+            await bot.close()
+
+    async def cool(self, name):
+        spares = self.spares.pop(name, [])
+        self.last_used.pop(name, None)
+        self.pinned.discard(name)
+        for bot in spares:
+            self.reaped += 1
+            await bot.close()
+
+    async def acquire(self, name):
+        spares = self.spares.get(name)
+        while spares:
+            bot = spares.pop(0)
+            if bot.alive():
+                self.hits += 1
+                self.warm(name)
+                return bot
+            self.reaped += 1
+
+        self.misses += 1
+        if name in self.spares:
+            self.warm(name)
+        return await Bot.launch(name)
+
+    async def reap(self):
+        now = time.monotonic()
+        for name, last_used in list(self.last_used.items()):
+            if name not in self.pinned and now - last_used > self.idle:
+                await self.cool(name)
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "reaped": self.reaped,
+            "spares": {name: len(bots) for name, bots in self.spares.items()},
+        }
+
+
+class Session:
+    # Async counterpart of interactive_judge.InteractiveGame
+    def __init__(self, bot, player_piece, game_rules):
+        self.bot = bot
+        self.rules = game_rules
+        self.board = game_rules.board()
+        self.player_piece = player_piece
+        self.bot_piece = 'X' if player_piece == 'O' else 'O'
+        self.lock = asyncio.Lock()
+        self.moves = 0  # player moves accepted so far
+        self.record = metrics.InteractiveRecord(bot.name, self.bot_piece)
+
+    async def start(self):
+        # The bot's opening move when it plays O, otherwise None
+        if not self.rules.is_default():
+            if "rules" not in self.bot.capabilities:
+                self.record.fail("rules")
+                return {'error': f'Bot does not support the rules "{self.rules.line()}"'}
+            await self.bot.send(self.rules.line())
+
+        if self.bot_piece != 'O':
+            return None
+
+        await self.bot.send("start")
+        started = time.monotonic()
+        bot_move = await self.bot.read_line(MOVE_TIMEOUT)
+        think = time.monotonic() - started
+        if not bot_move:
+            self.record.fail("crash" if self.bot.process.stdout.at_eof() else "timeout")
+            return {'error': 'Bot failed to make first move'}
+
+        try:
+            bot_x, bot_y = map(int, bot_move.split())
+        except ValueError:
+            self.record.fail("bad_move")
+            return {'error': 'Invalid bot first move format'}
+
+        if not self.board.is_free(bot_x, bot_y):
+            self.record.fail("bad_move")
+            return {'error': 'Invalid bot first move coordinates'}
+
+        self.board.place(bot_x, bot_y, 'O')
+        self.record.move(think, time.monotonic() - started - think)
+        return {'x': bot_x, 'y': bot_y, 'initial': True}
+
+    async def make_move(self, x, y):
+        turn_started = time.monotonic()
+        if not self.board.is_free(x, y):
+            return {'error': 'Invalid move'}
+
+        self.board.place(x, y, self.player_piece)
+
+        winning_cells = self.board.winning_cells(x, y, self.player_piece)
+        if winning_cells:
+            self.record.winner = self.player_piece
+            return {
+                'x': -1,
+                'y': -1,
+                'winner': self.player_piece,
+                'winning_cells': winning_cells
+            }
+
+        try:
+            await self.bot.send(f"{x} {y}")
+        except (BrokenPipeError, ConnectionResetError):
+            self.record.fail("crash")
+            return {'error': 'Bot process crashed'}
+
+        bot_started = time.monotonic()
+        bot_move = await self.bot.read_line(MOVE_TIMEOUT)
+        think = time.monotonic() - bot_started
+        if bot_move is None:
+            if not self.bot.alive() or self.bot.process.stdout.at_eof():
+                response = {'error': f'Bot process died. Stderr: {self.bot.stderr_text()}'}
+                limit = await self.bot.limit_hit()
+                if limit:
+                    response['limit'] = limit
+                self.record.fail("resource_limit" if limit else "crash")
+                return response
+            self.record.fail("timeout")
+            return {'error': 'Bot failed to respond'}
+
+        try:
+            bot_x, bot_y = map(int, bot_move.split())
+        except ValueError:
+            self.record.fail("bad_move")
+            return {'error': f'Bot sent invalid move format: "{bot_move}". Stderr: {self.bot.stderr_text()}'}
+
+        if not self.board.is_free(bot_x, bot_y):
+            self.record.fail("bad_move")
+            return {'error': f'Bot made invalid move: {bot_x}, {bot_y}'}
+
+        self.board.place(bot_x, bot_y, self.bot_piece)
+        self.record.move(think, time.monotonic() - turn_started - think)
+
+        winning_cells = self.board.winning_cells(bot_x, bot_y, self.bot_piece)
+        if winning_cells:
+            self.record.winner = self.bot_piece
+            return {
+                'x': bot_x,
+                'y': bot_y,
+                'winner': self.bot_piece,
+                'winning_cells': winning_cells
+            }
+        return {'x': bot_x, 'y': bot_y, 'winner': None}
+
+
+class Daemon:
+    def __init__(self):
+        self.sessions = {}
+        self.starting = set()  # ids of games whose start is in flight
+        self.ending = set()    # ids of those ended meanwhile
+        self.pool = BotPool()
+        self.rules = rules.from_environment().interactive()
+        self.metrics = metrics.from_environment()
+
+    def reply(self, game_id, response, seq=None):
+        if seq is not None:
+            response = {**response, 'seq': seq}
+        sys.stdout.write(json.dumps({'id': game_id, **response}) + "\n")
+        sys.stdout.flush()
+
+    async def handle(self, command):
+        cmd = command.get('cmd')
+        game_id = command.get('id')
+
+        if cmd == 'start':
+            self.starting.add(game_id)
+            try:
+                await self.start(game_id, command)
+            finally:
+                self.starting.discard(game_id)
+                if game_id in self.ending:
+                    self.ending.discard(game_id)
+                    await self.end(game_id)
+
+        elif cmd == 'move':
+            seq = command.get('seq')
+            session = self.sessions.get(game_id)
+            if session is None:
+                self.reply(game_id, {'error': 'Game not found'}, seq)
+                return
+            async with session.lock:
+                if seq is not None and seq != session.moves + 1:
+                    response = {'error': f'Expected move {session.moves + 1}, got {seq}'}
+                else:
+                    response = await session.make_move(command['x'], command['y'])
+                    if 'error' not in response:
+                        session.moves += 1
+            self.reply(game_id, response, seq)
+            if response.get('winner'):
+                await self.end(game_id)
+
+        elif cmd == 'end':
+            if game_id in self.starting:
+                self.ending.add(game_id)
+            else:
+                await self.end(game_id)
+
+        elif cmd == 'warm':
+            self.pool.warm(command['bot'], command.get('pin', False))
+
+        elif cmd == 'cool':
+            await self.pool.cool(command['bot'])
+
+        elif cmd == 'stats':
+            self.reply(game_id, {**self.pool.stats(), 'sessions': len(self.sessions)})
+
+        else:
+            self.reply(game_id, {'error': f"Unknown command: {cmd}"})
+
+    async def start(self, game_id, command):
+        try:
+            bot = await self.pool.acquire(command['bot'])
+        except Exception as e:
+            self.reply(game_id, {'error': f"Failed to initialize game: {str(e)}"})
+            return
+        session = Session(bot, command.get('piece', 'O'), self.rules)
+        self.sessions[game_id] = session
+        async with session.lock:
+            response = await session.start()
+        self.reply(game_id, response or {'started': True})
+
+    async def end(self, game_id):
+        session = self.sessions.pop(game_id, None)
+        if session:
+            max_rss_kb = metrics.peak_rss_kb(session.bot.process.pid)
+            await session.bot.close()
+            if self.metrics:
+                # The file is locked while it is rewritten; keep other games moving
+                await asyncio.to_thread(self.metrics.write, session.record.result(max_rss_kb),
+                                        id=game_id, bot=session.bot.name, player_piece=session.player_piece)
+
+    async def run_command(self, line):
+        try:
+            command = json.loads(line)
+        except json.JSONDecodeError:
+            self.reply(None, {'error': 'Invalid input format'})
+            return
+        try:
+            await self.handle(command)
+        except Exception as e:
+            print(f"Error handling {line}: {e}", file=sys.stderr)
+            self.reply(command.get('id'), {'error': f"Error processing command: {str(e)}"})
+
+    async def reap_forever(self):
+        while True:
+            await asyncio.sleep(60)
+            await self.pool.reap()
+
+    async def serve(self):
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader()
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+
+        reaper = asyncio.create_task(self.reap_forever())
+        tasks = set()
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            line = line.decode().strip()
+            if not line:
+                continue
+            task = asyncio.create_task(self.run_command(line))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        # stdin closed: the server is gone, shut every game down
+        reaper.cancel()
+        for game_id in list(self.sessions):
+            await self.end(game_id)
+        for name in list(self.pool.spares):
+            await self.pool.cool(name)
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(Daemon().serve())
+    except KeyboardInterrupt:
+        print("Judge daemon interrupted", file=sys.stderr)
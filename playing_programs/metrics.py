@@ -0,0 +1,238 @@
+import fcntl
+import json
+import os
+import re
+import threading
+import time
+
+THINK_BUCKETS = [0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0]  # seconds
+BOT_METRICS = (  # name, help, type, key of the per-bot totals
+    ("judge_bot_games_total", "Games played per bot.", "counter", "games"),
+    ("judge_bot_think_seconds_total", "Wall-clock thinking per bot.", "counter", "think"),
+    ("judge_bot_cpu_seconds_total", "CPU time per bot process, from wait4.", "counter", "cpu"),
+    ("judge_bot_max_rss_bytes", "Largest peak RSS of a bot process, from /proc VmHWM.", "gauge", "max_rss_kb"),
+)
+SAMPLE = re.compile(r'^(\w+)(?:\{\w+="((?:[^"\\]|\\.)*)"\})? (\S+)$')
+
+# Opt-in metrics file for the bot judge. Every finished game's "metrics"
+# object is either appended as one NDJSON line, or folded into totals that
+# are rewritten as a Prometheus text file (for node_exporter's textfile
+# collector) after each game. The totals are read back from the file before
+# every rewrite, under a lock file, so they keep counting across judge runs:
+# batches and the single games the server starts one process each for.
+# Files ending in .prom get the Prometheus format unless one is given.
+#
+# Interactive games (interactive_judge.py, judge_daemon.py) record into the
+# file named by JUDGE_METRICS through InteractiveRecord: the bot's moves and
+# think time, and how the game ended (game_outcome) - five in a row, a
+# timeout, a crash or bad move of the bot, or a player who left.
+
+
+def metrics_format(path, fmt=None):
+    return fmt or ('prom' if path.endswith('.prom') else 'ndjson')
+
+
+def game_outcome(result):
+    # How a game ended: its reason (timeout, resource_limit, ...) when it has
+    # one, else five, draw or unfinished
+    if result.get("reason"):
+        return result["reason"]
+    winner = result.get("winner")
+    return "five" if winner in ('O', 'X') else "draw" if winner == '_' else "unfinished"
+
+
+def from_environment():
+    # The writer for JUDGE_METRICS, in the format of JUDGE_METRICS_FORMAT
+    # (ndjson or prom, as --metrics-format), or None
+    path = os.environ.get("JUDGE_METRICS")
+    return MetricsWriter(path, os.environ.get("JUDGE_METRICS_FORMAT") or None) if path else None
+
+
+def peak_rss_kb(pid):
+    # VmHWM of a running process, or None once it is gone
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def escape(label):
+    return label.replace('\\', '\\\\').replace('"', '\\"')
+
+
+class MetricsWriter:
+    def __init__(self, path, fmt=None):
+        self.path = path
+        self.format = metrics_format(path, fmt)
+        self.lock = threading.Lock()
+        self.games = 0
+        self.moves = 0
+        self.overhead = 0.0
+        self.buckets = [0] * (len(THINK_BUCKETS) + 1)
+        self.think_sum = 0.0
+        self.results = {}  # game_outcome() -> games
+        self.bots = {}  # program -> {"games", "think", "cpu", "max_rss_kb"}
+
+    def write(self, result, **labels):
+        metrics = result.get("metrics")
+        if not metrics:
+            return
+        with self.lock:
+            if self.format == 'ndjson':
+                with open(self.path, 'a') as f:
+                    f.write(json.dumps({**labels, "winner": result.get("winner"), "result": game_outcome(result),
+                                        **metrics}) + "\n")
+            else:
+                with open(f"{self.path}.lock", 'w') as lock:
+                    fcntl.flock(lock, fcntl.LOCK_EX)
+                    self.load()
+                    self.add(metrics, game_outcome(result))
+                    self.dump()
+
+    def load(self):
+        # The totals in the file, as written by the last judge to finish a game
+        self.games = self.moves = 0
+        self.overhead = self.think_sum = 0.0
+        self.buckets = [0] * (len(THINK_BUCKETS) + 1)
+        self.results = {}
+        self.bots = {}
+        try:
+            with open(self.path) as f:
+                lines = f.read().splitlines()
+        except FileNotFoundError:
+            return
+
+        bot_keys = {name: key for name, _, _, key in BOT_METRICS}
+        cumulative = []
+        for line in lines:
+            sample = SAMPLE.match(line)
+            if not sample:
+                continue
+            name, label, value = sample.groups()
+            value = float(value)
+            if name == "judge_games_total":
+                self.games = int(value)
+            elif name == "judge_moves_total":
+                self.moves = int(value)
+            elif name == "judge_overhead_seconds_total":
+                self.overhead = value
+            elif name == "judge_move_think_seconds_bucket":
+                cumulative.append(int(value))
+            elif name == "judge_move_think_seconds_sum":
+                self.think_sum = value
+            elif name == "judge_game_results_total" and label is not None:
+                self.results[re.sub(r'\\(.)', r'\1', label)] = int(value)
+            elif name in bot_keys and label is not None:
+                program = re.sub(r'\\(.)', r'\1', label)
+                totals = self.bots.setdefault(program, {"games": 0, "think": 0.0, "cpu": 0.0, "max_rss_kb": 0})
+                key = bot_keys[name]
+                totals[key] = int(value) // 1024 if key == "max_rss_kb" else int(value) if key == "games" else value
+        if len(cumulative) == len(self.buckets):
+            self.buckets = [count - previous for count, previous in zip(cumulative, [0] + cumulative[:-1])]
+
+    def add(self, metrics, outcome):
+        self.games += 1
+        self.results[outcome] = self.results.get(outcome, 0) + 1
+        self.moves += len(metrics["think_ms"])
+        self.overhead += metrics["judge_overhead_ms"] / 1000
+        for think_ms in metrics["think_ms"]:
+            think = think_ms / 1000
+            self.think_sum += think
+            bucket = next((i for i, bound in enumerate(THINK_BUCKETS) if think <= bound), len(THINK_BUCKETS))
+            self.buckets[bucket] += 1
+
+        for bot in metrics["bots"].values():
+            totals = self.bots.setdefault(bot["program"], {"games": 0, "think": 0.0, "cpu": 0.0, "max_rss_kb": 0})
+            totals["games"] += 1
+            totals["think"] += bot["think_ms"] / 1000
+            totals["cpu"] += bot.get("cpu_ms", 0) / 1000
+            totals["max_rss_kb"] = max(totals["max_rss_kb"], bot.get("max_rss_kb", 0))
+
+    def dump(self):
+        lines = [
+            "# HELP judge_games_total Games finished by the judge.",
+            "# TYPE judge_games_total counter",
+            f"judge_games_total {self.games}",
+            "# HELP judge_game_results_total Games by how they ended.",
+            "# TYPE judge_game_results_total counter",
+        ]
+        lines += [f'judge_game_results_total{{result="{escape(outcome)}"}} {count}'
+                  for outcome, count in sorted(self.results.items())]
+        lines += [
+            "# HELP judge_moves_total Moves played.",
+            "# TYPE judge_moves_total counter",
+            f"judge_moves_total {self.moves}",
+            "# HELP judge_overhead_seconds_total Judge time spent between bot moves.",
+            "# TYPE judge_overhead_seconds_total counter",
+            f"judge_overhead_seconds_total {self.overhead:.6f}",
+            "# HELP judge_move_think_seconds Time bots took per move.",
+            "# TYPE judge_move_think_seconds histogram",
+        ]
+        cumulative = 0
+        for bound, count in zip(THINK_BUCKETS + ["+Inf"], self.buckets):
+            cumulative += count
+            lines.append(f'judge_move_think_seconds_bucket{{le="{bound}"}} {cumulative}')
+        lines += [
+            f"judge_move_think_seconds_sum {self.think_sum:.6f}",
+            f"judge_move_think_seconds_count {self.moves}",
+        ]
+        for name, help_text, kind, key in BOT_METRICS:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            for program, totals in sorted(self.bots.items()):
+                value = totals[key] * 1024 if key == "max_rss_kb" else totals[key]
+                label = escape(program)
+                lines.append(f'{name}{{bot="{label}"}} {value:.6f}' if isinstance(value, float)
+                             else f'{name}{{bot="{label}"}} {value}')
+
+        # Replace the file in one step so a scrape never sees half of it
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, self.path)
+
+
+class InteractiveRecord:
+    # Metrics of one interactive game, in the shape the bot judge reports
+    # them, so MetricsWriter counts them alike. Only the bot's moves are
+    # timed; the player thinks in the browser.
+    def __init__(self, program, bot_piece):
+        self.program = program
+        self.bot_piece = bot_piece
+        self.started = time.monotonic()
+        self.think = []      # seconds each bot move took
+        self.overhead = 0.0  # seconds the judge spent on the player's moves and the bot's replies
+        self.winner = None
+        self.reason = None   # set by fail(); a game ended without one was abandoned
+
+    def move(self, think, overhead=0.0):
+        self.think.append(think)
+        self.overhead += overhead
+
+    def fail(self, reason):
+        # The bot ended the game: timeout, resource_limit, crash or bad_move
+        if self.reason is None and self.winner is None:
+            self.reason = reason
+
+    def result(self, max_rss_kb=None):
+        bot = {
+            "program": self.program,
+            "moves": len(self.think),
+            "think_ms": round(sum(self.think) * 1000, 3),
+        }
+        if max_rss_kb is not None:
+            bot["max_rss_kb"] = max_rss_kb
+        reason = self.reason or (None if self.winner else "abandoned")
+        return {
+            "winner": self.winner,
+            **({"reason": reason} if reason else {}),
+            "metrics": {
+                "think_ms": [round(t * 1000, 3) for t in self.think],
+                "judge_overhead_ms": round(self.overhead * 1000, 3),
+                "wall_ms": round((time.monotonic() - self.started) * 1000, 3),
+                "bots": {self.bot_piece: bot},
+            },
+        }
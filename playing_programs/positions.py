@@ -0,0 +1,327 @@
+import argparse
+import json
+import os
+import random
+import sqlite3
+import time
+from contextlib import closing
+
+from board import Board, N
+from movelog import read_games
+
+INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".positions.sqlite")
+DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "codingomoku.db")
+ZOBRIST_SEED = 20250611  # fixed: stored hashes must mean the same in every run
+LOOKUP_LIMIT = 100       # games listed per lookup by default
+
+# Index of the positions reached in all stored games. Every game is replayed
+# once on a judge Board; after each move the position gets a Zobrist hash in
+# all 8 symmetries of the board (rotations and reflections), updated with one
+# XOR per symmetry, and the smallest of them is the position's canonical
+# hash. The index is an SQLite file with
+#   positions  canonical hash -> (source, game id, ply)
+#   replies    canonical hash + next move (in the canonical orientation) ->
+#              games, wins, draws, losses of the player who made it
+#   games      every indexed game, so no game is counted twice, and every
+#              game that failed to replay (failed = 1), so it is not retried
+# Both lookup tables are clustered on the hash (WITHOUT ROWID), so a lookup
+# is one B-tree seek. Sources are the server's game_history and
+# tournament_matches tables, and packed move logs ("log:<path>"); update
+# indexes only games the index does not hold yet, so it can run after
+# every batch of results. replies doubles as an opening book, see engine.py.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS positions (
+    hash INTEGER NOT NULL,
+    source TEXT NOT NULL,
+    game INTEGER NOT NULL,
+    ply INTEGER NOT NULL,
+    PRIMARY KEY (hash, source, game, ply)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS replies (
+    hash INTEGER NOT NULL,
+    cell INTEGER NOT NULL,
+    games INTEGER NOT NULL,
+    wins INTEGER NOT NULL,
+    draws INTEGER NOT NULL,
+    losses INTEGER NOT NULL,
+    PRIMARY KEY (hash, cell)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS games (
+    source TEXT NOT NULL,
+    game INTEGER NOT NULL,
+    winner TEXT,
+    plies INTEGER NOT NULL,
+    failed INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (source, game)
+);
+"""
+
+
+def symmetries(n):
+    # The 8 symmetries of the board as tables cell -> transformed cell
+    transforms = (
+        lambda x, y: (x, y),
+        lambda x, y: (y, n - 1 - x),
+        lambda x, y: (n - 1 - x, n - 1 - y),
+        lambda x, y: (n - 1 - y, x),
+        lambda x, y: (x, n - 1 - y),
+        lambda x, y: (n - 1 - x, y),
+        lambda x, y: (y, x),
+        lambda x, y: (n - 1 - y, n - 1 - x),
+    )
+    tables = []
+    for transform in transforms:
+        table = [0] * (n * n)
+        for x in range(n):
+            for y in range(n):
+                i, j = transform(x, y)
+                table[x * n + y] = i * n + j
+        tables.append(table)
+    return tables
+
+
+def signed(value):
+    # SQLite integers are signed 64-bit
+    return value - (1 << 64) if value >> 63 else value
+
+
+class Zobrist:
+    def __init__(self, n=N):
+        self.n = n
+        rng = random.Random(ZOBRIST_SEED)
+        self.keys = {symbol: [rng.getrandbits(64) for _ in range(n * n)] for symbol in ('O', 'X')}
+        self.symmetries = symmetries(n)
+        self.inverses = []
+        for table in self.symmetries:
+            inverse = [0] * (n * n)
+            for cell, image in enumerate(table):
+                inverse[image] = cell
+            self.inverses.append(inverse)
+
+    def positions(self, moves):
+        # (ply, canonical hash, symmetry giving it) after each (x, y, symbol)
+        hashes = [0] * len(self.symmetries)
+        for ply, (x, y, symbol) in enumerate(moves, 1):
+            cell = x * self.n + y
+            keys = self.keys[symbol]
+            hashes = [h ^ keys[table[cell]] for h, table in zip(hashes, self.symmetries)]
+            canonical = min(hashes)
+            yield ply, signed(canonical), hashes.index(canonical)
+
+    def position(self, moves):
+        # (canonical hash, symmetry) of the position after moves; None for none
+        last = None
+        for last in self.positions(moves):
+            pass
+        return last[1:] if last else None
+
+
+def replay(moves, n=N):
+    # Stored moves ({"x", "y", "symbol"} dicts or [x, y] pairs, O first) as
+    # (x, y, symbol) triples; None for a game that is not legal on the board
+    board = Board(n)
+    replayed = []
+    for ply, move in enumerate(moves):
+        if isinstance(move, dict):
+            x, y = move.get("x"), move.get("y")
+            symbol = move.get("symbol") or ('O' if ply % 2 == 0 else 'X')
+        else:
+            x, y = move[0], move[1]
+            symbol = 'O' if ply % 2 == 0 else 'X'
+        if not isinstance(x, int) or not isinstance(y, int) or symbol not in ('O', 'X') \
+                or not board.is_free(x, y):
+            return None
+        board.place(x, y, symbol)
+        replayed.append((x, y, symbol))
+    return replayed
+
+
+def match_players(player1, player2, piece, winner):
+    # (player_O, player_X, winner symbol) of a tournament_matches row, whose
+    # winner column holds a player name, or "both" for a draw
+    player_O, player_X = (player2, player1) if piece == 'X' else (player1, player2)
+    symbol = '_' if winner == "both" else 'O' if winner == player_O \
+        else 'X' if winner == player_X else None
+    return player_O, player_X, symbol
+
+
+def parse_moves(text):
+    # "7 7, 7 8, ..." as [(x, y), ...]
+    return [tuple(map(int, move.split())) for move in text.split(",") if move.strip()]
+
+
+class PositionIndex:
+    def __init__(self, path=INDEX_PATH, n=N):
+        self.path = path
+        self.n = n
+        self.zobrist = Zobrist(n)
+        self.connection = sqlite3.connect(path, timeout=30)
+        self.connection.executescript(SCHEMA)
+        columns = {row[1] for row in self.connection.execute("PRAGMA table_info(games)")}
+        if "failed" not in columns:
+            self.connection.execute("ALTER TABLE games ADD COLUMN failed INTEGER NOT NULL DEFAULT 0")
+
+    def close(self):
+        self.connection.close()
+
+    def add_game(self, source, game, moves, winner):
+        # Index one game given as replayed (x, y, symbol) moves; winner is
+        # 'O', 'X', '_' for a draw, or None. False if it was indexed already.
+        cursor = self.connection.execute(
+            "INSERT OR IGNORE INTO games (source, game, winner, plies) VALUES (?, ?, ?, ?)",
+            (source, game, winner, len(moves)))
+        if cursor.rowcount == 0:
+            return False
+
+        positions = list(self.zobrist.positions(moves))
+        self.connection.executemany(
+            "INSERT OR IGNORE INTO positions (hash, source, game, ply) VALUES (?, ?, ?, ?)",
+            [(position, source, game, ply) for ply, position, _ in positions])
+
+        replies = []
+        for (ply, position, symmetry), (x, y, symbol) in zip(positions, moves[1:]):
+            cell = self.zobrist.symmetries[symmetry][x * self.n + y]
+            replies.append((position, cell, int(winner == symbol), int(winner == '_'),
+                            int(winner in ('O', 'X') and winner != symbol)))
+        self.connection.executemany(
+            """INSERT INTO replies (hash, cell, games, wins, draws, losses) VALUES (?, ?, 1, ?, ?, ?)
+               ON CONFLICT (hash, cell) DO UPDATE SET
+                   games = games + 1,
+                   wins = wins + excluded.wins,
+                   draws = draws + excluded.draws,
+                   losses = losses + excluded.losses""",
+            replies)
+        return True
+
+    def add_failed(self, source, game):
+        # Remember a game that cannot be replayed, so updates skip it
+        self.connection.execute(
+            "INSERT OR IGNORE INTO games (source, game, winner, plies, failed) VALUES (?, ?, NULL, 0, 1)",
+            (source, game))
+        return False
+
+    def add_result(self, source, game, result):
+        # A judge result or a stored row's decoded moves
+        raw_moves = result.get("moves") or []
+        moves = replay(raw_moves, self.n)
+        if not moves:
+            return self.add_failed(source, game)
+        winner = result.get("winner")
+        if winner not in ('O', 'X', '_'):
+            last = raw_moves[-1]
+            winner = last.get("winner") if isinstance(last, dict) else None
+        return self.add_game(source, game, moves, winner)
+
+    def update(self, database=DB_PATH):
+        # Index the server's finished games that are not in the index yet
+        added = 0
+        with closing(sqlite3.connect(f"file:{os.path.abspath(database)}?mode=ro", uri=True, timeout=30)) as db:
+            history = db.execute("SELECT id, winner, moves FROM game_history WHERE moves IS NOT NULL")
+            for game, winner, moves in history:
+                if not self.known("game_history", game):
+                    added += self.add_stored("game_history", game, moves, winner)
+
+            matches = db.execute(
+                """SELECT id, player1, player2, player1_piece, winner, moves FROM tournament_matches
+                   WHERE status = 'completed' AND moves IS NOT NULL""")
+            for game, player1, player2, piece, winner, moves in matches:
+                if self.known("tournament_matches", game):
+                    continue
+                _, _, symbol = match_players(player1, player2, piece, winner)
+                added += self.add_stored("tournament_matches", game, moves, symbol)
+        self.connection.commit()
+        return added
+
+    def add_stored(self, source, game, moves, winner):
+        try:
+            moves = json.loads(moves)
+        except (TypeError, json.JSONDecodeError):
+            return self.add_failed(source, game)
+        if not isinstance(moves, list):
+            return self.add_failed(source, game)
+        return self.add_result(source, game, {"moves": moves, "winner": winner})
+
+    def add_log(self, path):
+        # Index the games of a packed move log appended since the last call
+        source = f"log:{os.path.abspath(path)}"
+        (indexed,) = self.connection.execute(
+            "SELECT COUNT(*) FROM games WHERE source = ?", (source,)).fetchone()
+        added = 0
+        for game, result in enumerate(read_games(path)):
+            if game >= indexed:
+                added += self.add_result(source, game, result)
+        self.connection.commit()
+        return added
+
+    def known(self, source, game):
+        return self.connection.execute(
+            "SELECT 1 FROM games WHERE source = ? AND game = ?", (source, game)).fetchone() is not None
+
+    def games(self, moves, limit=LOOKUP_LIMIT):
+        # Games that reached the position after moves ([(x, y), ...], O
+        # first), in any orientation: [(source, game id, ply)]
+        position = self.zobrist.position(self.with_symbols(moves))
+        if position is None:
+            return []
+        return self.connection.execute(
+            "SELECT source, game, ply FROM positions WHERE hash = ? LIMIT ?", (position[0], limit)).fetchall()
+
+    def book(self, moves):
+        # Moves played from the position after moves, most played first, in
+        # the orientation of the given moves; wins/draws/losses are those of
+        # the player making the move
+        position = self.zobrist.position(self.with_symbols(moves))
+        if position is None:
+            return []
+        hash_, symmetry = position
+        inverse = self.zobrist.inverses[symmetry]
+        rows = self.connection.execute(
+            "SELECT cell, games, wins, draws, losses FROM replies WHERE hash = ? ORDER BY games DESC",
+            (hash_,)).fetchall()
+        return [
+            {"x": inverse[cell] // self.n, "y": inverse[cell] % self.n,
+             "games": games, "wins": wins, "draws": draws, "losses": losses}
+            for cell, games, wins, draws, losses in rows
+        ]
+
+    @staticmethod
+    def with_symbols(moves):
+        return [(x, y, 'O' if ply % 2 == 0 else 'X') for ply, (x, y) in enumerate(moves)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Zobrist position index over stored games")
+    parser.add_argument("--index", default=INDEX_PATH, help="index file")
+    commands = parser.add_subparsers(dest="command", required=True)
+    update = commands.add_parser("update", help="index new games of the server database and move logs")
+    update.add_argument("--db", default=DB_PATH, help="server database")
+    update.add_argument("--log", action="append", default=[], metavar="FILE",
+                        help="also index this packed move log (repeatable)")
+    update.add_argument("--no-db", action="store_true", help="only index the given move logs")
+    lookup = commands.add_parser("lookup", help="list the games that reached a position")
+    lookup.add_argument("moves", help='moves from the empty board, O first: "7 7, 7 8, ..."')
+    lookup.add_argument("--limit", type=int, default=LOOKUP_LIMIT)
+    book = commands.add_parser("book", help="show how a position was answered")
+    book.add_argument("moves", help='moves from the empty board, O first: "7 7, 7 8, ..."')
+    args = parser.parse_args()
+
+    index = PositionIndex(args.index)
+    try:
+        if args.command == "update":
+            started = time.monotonic()
+            added = 0 if args.no_db else index.update(args.db)
+            for log in args.log:
+                added += index.add_log(log)
+            print(json.dumps({"added": added, "seconds": round(time.monotonic() - started, 3)}))
+        elif args.command == "lookup":
+            started = time.perf_counter()
+            games = index.games(parse_moves(args.moves), args.limit)
+            print(json.dumps({
+                "games": [{"source": source, "id": game, "ply": ply} for source, game, ply in games],
+                "lookup_ms": round((time.perf_counter() - started) * 1000, 3),
+            }))
+        else:
+            print(json.dumps(index.book(parse_moves(args.moves))))
+    finally:
+        index.close()
@@ -0,0 +1,225 @@
+import argparse
+import json
+import math
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from rules import seat_winner
+
+# Elo and Glicko-2 ratings updated game by game from the judge's result
+# stream (the JSON lines bot_interactive_judge.py --batch prints), plus
+# Swiss-style pairing on the current ratings.
+
+ELO_START = 1500.0
+ELO_K = 32.0
+
+GLICKO_START = 1500.0
+GLICKO_RD = 350.0
+GLICKO_VOLATILITY = 0.06
+GLICKO_TAU = 0.5
+GLICKO_SCALE = 173.7178
+
+
+def game_scores(result):
+    # (score of player_O, score of player_X), or None when the game had no
+    # result; after a swap opening player_O played the X stones
+    winner = seat_winner(result)
+    if winner == 'O':
+        return 1.0, 0.0
+    if winner == 'X':
+        return 0.0, 1.0
+    if winner == '_':
+        return 0.5, 0.5
+    return None
+
+
+class Elo:
+    def __init__(self, k=ELO_K, start=ELO_START):
+        self.k = k
+        self.start = start
+        self.ratings = {}
+        self.games = {}
+
+    def rating(self, player):
+        return self.ratings.get(player, self.start)
+
+    def update(self, player_O, player_X, score_O):
+        rating_O, rating_X = self.rating(player_O), self.rating(player_X)
+        expected_O = 1 / (1 + 10 ** ((rating_X - rating_O) / 400))
+        self.ratings[player_O] = rating_O + self.k * (score_O - expected_O)
+        self.ratings[player_X] = rating_X - self.k * (score_O - expected_O)
+        for player in (player_O, player_X):
+            self.games[player] = self.games.get(player, 0) + 1
+
+    def table(self):
+        return [
+            {"player": player, "rating": round(self.rating(player), 1), "games": self.games[player]}
+            for player in sorted(self.games, key=self.rating, reverse=True)
+        ]
+
+
+class Glicko2:
+    # Every game is treated as its own rating period, so ratings move after
+    # each result instead of after a whole round
+    def __init__(self, tau=GLICKO_TAU):
+        self.tau = tau
+        self.players = {}  # player -> [mu, phi, sigma] on the Glicko-2 scale
+        self.games = {}
+
+    def state(self, player):
+        if player not in self.players:
+            self.players[player] = [0.0, GLICKO_RD / GLICKO_SCALE, GLICKO_VOLATILITY]
+        return self.players[player]
+
+    def rating(self, player):
+        return self.state(player)[0] * GLICKO_SCALE + GLICKO_START
+
+    def deviation(self, player):
+        return self.state(player)[1] * GLICKO_SCALE
+
+    def update(self, player_O, player_X, score_O):
+        state_O, state_X = list(self.state(player_O)), list(self.state(player_X))
+        self.players[player_O] = self._rate(state_O, [(state_X, score_O)])
+        self.players[player_X] = self._rate(state_X, [(state_O, 1 - score_O)])
+        for player in (player_O, player_X):
+            self.games[player] = self.games.get(player, 0) + 1
+
+    def _rate(self, player, results):
+        # The player's state after a rating period of (opponent state, score)
+        # results; update() rates every game as a period of its own
+        mu, phi, sigma = player
+
+        v_inverse = 0.0
+        improvement = 0.0
+        for (mu_j, phi_j, _), score in results:
+            g = 1 / math.sqrt(1 + 3 * phi_j ** 2 / math.pi ** 2)
+            expected = 1 / (1 + math.exp(-g * (mu - mu_j)))
+            v_inverse += g ** 2 * expected * (1 - expected)
+            improvement += g * (score - expected)
+        v = 1 / v_inverse
+        delta = v * improvement
+
+        # New volatility by the Illinois algorithm (step 5 of Glickman's paper)
+        a = math.log(sigma ** 2)
+
+        def f(x):
+            ex = math.exp(x)
+            return (ex * (delta ** 2 - phi ** 2 - v - ex) / (2 * (phi ** 2 + v + ex) ** 2)
+                    - (x - a) / self.tau ** 2)
+
+        A = a
+        if delta ** 2 > phi ** 2 + v:
+            B = math.log(delta ** 2 - phi ** 2 - v)
+        else:
+            k = 1
+            while f(a - k * self.tau) < 0:
+                k += 1
+            B = a - k * self.tau
+        f_A, f_B = f(A), f(B)
+        while abs(B - A) > 1e-6:
+            C = A + (A - B) * f_A / (f_B - f_A)
+            f_C = f(C)
+            if f_C * f_B <= 0:
+                A, f_A = B, f_B
+            else:
+                f_A /= 2
+            B, f_B = C, f_C
+        sigma = math.exp(A / 2)
+
+        phi_star = math.sqrt(phi ** 2 + sigma ** 2)
+        phi = 1 / math.sqrt(1 / phi_star ** 2 + 1 / v)
+        mu = mu + phi ** 2 * improvement
+        return [mu, phi, sigma]
+
+    def table(self):
+        return [
+            {
+                "player": player,
+                "rating": round(self.rating(player), 1),
+                "deviation": round(self.deviation(player), 1),
+                "games": self.games[player],
+            }
+            for player in sorted(self.games, key=self.rating, reverse=True)
+        ]
+
+
+SYSTEMS = {"elo": Elo, "glicko2": Glicko2}
+
+
+def rate_stream(lines, system):
+    # Feed judge result lines into the rating system, skipping errors and
+    # games without a result
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            result = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        scores = game_scores(result)
+        if scores and result.get("player_O") and result.get("player_X"):
+            system.update(result["player_O"], result["player_X"], scores[0])
+    return system
+
+
+def swiss_pairings(players, system, played, o_games):
+    # Pair players with neighbours in the current ranking, avoiding rematches
+    # where possible. The player with fewer games as O gets O. With an odd
+    # number of players the lowest-ranked unpaired one sits the round out.
+    ranked = sorted(players, key=system.rating, reverse=True)
+    pairings = []
+    while len(ranked) > 1:
+        player = ranked.pop(0)
+        opponent = next((other for other in ranked if frozenset((player, other)) not in played), ranked[0])
+        ranked.remove(opponent)
+        played.add(frozenset((player, opponent)))
+        if o_games.get(player, 0) <= o_games.get(opponent, 0):
+            pairings.append((player, opponent))
+        else:
+            pairings.append((opponent, player))
+        o_games[pairings[-1][0]] = o_games.get(pairings[-1][0], 0) + 1
+    return pairings
+
+
+def run_swiss(players, rounds, system, workers):
+    # Play a Swiss tournament through the bot judge, one round at a time, and
+    # print every game result as the batch judge would
+    from bot_interactive_judge import run_match
+
+    played = set()
+    o_games = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for round_number in range(1, rounds + 1):
+            pairings = swiss_pairings(players, system, played, o_games)
+            print(f"Round {round_number}: {pairings}", file=sys.stderr)
+            results = executor.map(lambda pairing: run_match(*pairing), pairings)
+            for (player_O, player_X), result in zip(pairings, results):
+                result.update({"player_O": player_O, "player_X": player_X, "round": round_number})
+                print(json.dumps(result), flush=True)
+                scores = game_scores(result)
+                if scores:
+                    system.update(player_O, player_X, scores[0])
+    return system
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rate bots from judge results")
+    parser.add_argument("--system", choices=SYSTEMS, default="glicko2")
+    parser.add_argument("--swiss", type=int, metavar="ROUNDS",
+                        help="play this many Swiss rounds between --players instead of reading results from stdin")
+    parser.add_argument("--players", nargs="+", default=[])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    system = SYSTEMS[args.system]()
+    if args.swiss:
+        if len(args.players) < 2:
+            print(json.dumps({"error": "At least two players required"}))
+            sys.exit(1)
+        run_swiss(args.players, args.swiss, system, args.workers)
+    else:
+        rate_stream(sys.stdin, system)
+
+    print(json.dumps({"ratings": system.table()}))
@@ -0,0 +1,91 @@
+import os
+
+from board import Board, N
+
+FREESTYLE = "freestyle"  # five or more in a row wins
+EXACT = "exact"          # only exactly five in a row wins, six or more do not
+VARIANTS = (FREESTYLE, EXACT)
+MIN_SIZE = 5
+MAX_SIZE = 255           # largest board the packed move log can store
+
+# Game rules shared by the judges: the board size, which rows of five win,
+# and the optional swap opening. They are taken from JUDGE_BOARD_SIZE,
+# JUDGE_RULE (freestyle or exact) and JUDGE_SWAP=1 unless a judge is given
+# others on its command line.
+#
+# Bots are told rules other than the default (15x15 freestyle, no swap) by
+# a "rules <size> <freestyle|exact> [swap]" line right after their ready
+# line, before "start" or the first move. Only bots that list "rules" among
+# the extensions in their ready line can be told ("ready rules"); a game
+# under other rules with a bot that does not is not played.
+#
+# With the swap opening the bot playing X may answer O's first move with
+# "swap" instead of a move. The bots then trade colours: the bot that opened
+# is told "swap" and plays X from then on, starting with X's first move.
+# Moves and the winner keep naming stone colours, and the result says
+# "swapped": true; seat_winner() gives the winner as the seat the pairing
+# had put it in.
+#
+# The interactive judges draw on the web client's fixed 15x15 board, which
+# has no way to offer a swap, so they only follow JUDGE_RULE.
+
+
+class Rules:
+    def __init__(self, size=N, variant=FREESTYLE, swap=False):
+        if not MIN_SIZE <= size <= MAX_SIZE:
+            raise ValueError(f"Board size must be between {MIN_SIZE} and {MAX_SIZE}, not {size}")
+        if variant not in VARIANTS:
+            raise ValueError(f"Unknown rule {variant!r}, expected one of {', '.join(VARIANTS)}")
+        self.size = size
+        self.variant = variant
+        self.swap = swap
+
+    def board(self):
+        return Board(self.size, exact_five=self.variant == EXACT)
+
+    def is_default(self):
+        return self.size == N and self.variant == FREESTYLE and not self.swap
+
+    def line(self):
+        # The line telling a bot these rules
+        return " ".join(["rules", str(self.size), self.variant] + (["swap"] if self.swap else []))
+
+    def key(self):
+        # Tells game cache entries of other rules apart; empty for the
+        # default rules, so entries recorded before rules existed stay valid
+        return "" if self.is_default() else self.line().replace(" ", ":")
+
+    def interactive(self):
+        # The part of the rules the web client can show
+        return Rules(variant=self.variant)
+
+
+def from_environment():
+    return Rules(int(os.environ.get("JUDGE_BOARD_SIZE") or N),
+                 os.environ.get("JUDGE_RULE") or FREESTYLE,
+                 os.environ.get("JUDGE_SWAP") == "1")
+
+
+def seat_winner(result):
+    # The result's winner ('O', 'X', '_' or None) as the seat the pairing gave
+    # it: after a swap the bot seated as O played the X stones
+    winner = result.get("winner")
+    if result.get("swapped") and winner in ('O', 'X'):
+        return 'X' if winner == 'O' else 'O'
+    return winner
+
+
+def add_rules_arguments(parser):
+    group = parser.add_argument_group("game rules (defaults from JUDGE_BOARD_SIZE, JUDGE_RULE, JUDGE_SWAP)")
+    group.add_argument("--board-size", type=int, metavar="N",
+                       help=f"play on an N x N board (default: {N})")
+    group.add_argument("--rule", choices=VARIANTS,
+                       help="freestyle: five or more in a row wins; exact: only exactly five (default: freestyle)")
+    group.add_argument("--swap", action="store_true", default=None,
+                       help="let X take over O's first stone by answering it with \"swap\"")
+
+
+def rules_from_arguments(args):
+    rules = from_environment()
+    return Rules(args.board_size or rules.size, args.rule or rules.variant,
+                 rules.swap if args.swap is None else args.swap)
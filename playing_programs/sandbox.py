@@ -0,0 +1,135 @@
+import os
+import resource
+import signal
+import sys
+
+MEMORY_LIMIT_MB = 512     # address space of a bot (RLIMIT_AS)
+CPU_LIMIT = 60            # seconds of CPU time over a bot's lifetime (RLIMIT_CPU)
+PROCESS_LIMIT = 256       # RLIMIT_NPROC; counts every process of the judge's user
+FILE_SIZE_LIMIT_MB = 16   # largest file a bot may write (RLIMIT_FSIZE)
+CPU_QUOTA = 1.0           # CPUs a bot may use, enforced only with a cgroup
+CGROUP_PERIOD = 100000    # microseconds, cpu.max period
+MEMORY_NEAR = 0.9         # share of the memory limit that counts as running into it
+STDERR_TAIL = 2048        # bytes of bot stderr kept to recognise allocation failures
+OUT_OF_MEMORY = ("bad_alloc", "MemoryError", "Cannot allocate memory", "out of memory")
+
+# Resource limits for bot processes. They are set with prlimit right after
+# the bot is spawned (preexec_fn is unsafe in the threaded batch judge), so
+# they are in place before the bot gets its first move. With a delegated
+# cgroup v2 directory (--cgroup, or JUDGE_CGROUP for the interactive judges)
+# each bot also gets its own child cgroup with a CPU quota and a hard memory
+# limit, which is also how a memory kill is told apart from a crash.
+# Without one, a bot that dies after reporting an allocation failure on
+# stderr, or close to the limit, is taken to have run out of memory.
+#
+# Limits.hit() names the resource a dead bot ran into: "cpu", "memory",
+# "file_size", or None when it just crashed.
+
+
+class Limits:
+    def __init__(self, memory_mb=MEMORY_LIMIT_MB, cpu_seconds=CPU_LIMIT,
+                 processes=PROCESS_LIMIT, file_size_mb=FILE_SIZE_LIMIT_MB,
+                 cgroup=None, cpu_quota=CPU_QUOTA):
+        # A limit of None (or 0) is not applied
+        self.memory_mb = memory_mb
+        self.cpu_seconds = cpu_seconds
+        self.processes = processes
+        self.file_size_mb = file_size_mb
+        self.cgroup = cgroup
+        self.cpu_quota = cpu_quota
+
+    def rlimits(self):
+        limits = []
+        if self.memory_mb:
+            limits.append((resource.RLIMIT_AS, self.memory_mb << 20, self.memory_mb << 20))
+        if self.cpu_seconds:
+            # SIGXCPU at the soft limit, SIGKILL a second later
+            cpu = int(self.cpu_seconds + 0.999)
+            limits.append((resource.RLIMIT_CPU, cpu, cpu + 1))
+        if self.processes:
+            limits.append((resource.RLIMIT_NPROC, self.processes, self.processes))
+        if self.file_size_mb:
+            limits.append((resource.RLIMIT_FSIZE, self.file_size_mb << 20, self.file_size_mb << 20))
+        return limits
+
+    def apply(self, pid):
+        # Limit a freshly spawned bot; returns its cgroup directory, if any
+        for limit, soft, hard in self.rlimits():
+            try:
+                resource.prlimit(pid, limit, (soft, hard))
+            except (OSError, ValueError) as e:
+                print(f"Could not set limit {limit} on bot {pid}: {e}", file=sys.stderr)
+        return self.enter_cgroup(pid) if self.cgroup else None
+
+    def extend_cpu(self, pid, used):
+        # A bot playing on in the next game of a series gets the full CPU
+        # allowance again on top of the used seconds
+        if not self.cpu_seconds:
+            return
+        cpu = int(used + self.cpu_seconds + 0.999)
+        try:
+            resource.prlimit(pid, resource.RLIMIT_CPU, (cpu, cpu + 1))
+        except (OSError, ValueError) as e:
+            print(f"Could not extend CPU limit of bot {pid}: {e}", file=sys.stderr)
+
+    def enter_cgroup(self, pid):
+        path = os.path.join(self.cgroup, f"bot-{pid}")
+        try:
+            os.mkdir(path)
+            if self.cpu_quota:
+                with open(os.path.join(path, "cpu.max"), "w") as f:
+                    f.write(f"{int(self.cpu_quota * CGROUP_PERIOD)} {CGROUP_PERIOD}")
+            if self.memory_mb:
+                with open(os.path.join(path, "memory.max"), "w") as f:
+                    f.write(str(self.memory_mb << 20))
+            with open(os.path.join(path, "cgroup.procs"), "w") as f:
+                f.write(str(pid))
+        except OSError as e:
+            print(f"Could not put bot {pid} into cgroup {path}: {e}", file=sys.stderr)
+            release(path)
+            return None
+        return path
+
+    def hit(self, exit_code, cpu_seconds=None, peak_vm_kb=None, cgroup=None, stderr=''):
+        # exit_code as subprocess reports it: negative for a signal
+        if exit_code is None or exit_code == 0:
+            return None
+        if exit_code == -signal.SIGXCPU:
+            return "cpu"
+        if exit_code == -signal.SIGKILL and self.cpu_seconds and cpu_seconds is not None \
+                and cpu_seconds >= int(self.cpu_seconds + 0.999):
+            return "cpu"
+        if exit_code == -signal.SIGXFSZ:
+            return "file_size"
+        if cgroup and oom_kills(cgroup):
+            return "memory"
+        if self.memory_mb and (any(marker in stderr for marker in OUT_OF_MEMORY)
+                               or (peak_vm_kb and peak_vm_kb >= MEMORY_NEAR * (self.memory_mb << 10))):
+            return "memory"
+        return None
+
+
+def oom_kills(cgroup):
+    try:
+        with open(os.path.join(cgroup, "memory.events")) as f:
+            for line in f:
+                name, value = line.split()
+                if name == "oom_kill" and int(value):
+                    return True
+    except (OSError, ValueError):
+        pass
+    return False
+
+
+def release(cgroup):
+    # Remove a bot's cgroup once the bot has been reaped
+    if cgroup:
+        try:
+            os.rmdir(cgroup)
+        except OSError:
+            pass
+
+
+def from_environment(cpu_seconds=CPU_LIMIT):
+    # Limits for the interactive judges, which take no limit options
+    return Limits(cpu_seconds=cpu_seconds, cgroup=os.environ.get("JUDGE_CGROUP") or None)
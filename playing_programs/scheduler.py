@@ -0,0 +1,156 @@
+import argparse
+import json
+import math
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from bot_interactive_judge import (run_match, add_limit_arguments, limits_from_arguments, Session,
+                                   MOVE_TIME_LIMIT, GAME_TIME_LIMIT)
+from metrics import MetricsWriter
+from journal import Journal
+from rules import add_rules_arguments, rules_from_arguments, seat_winner
+
+# Early-stopping front end for bot_interactive_judge.py --batch. It reads the
+# same pairing lines, groups the games of each pair of bots and plays them
+# alternating colours. After every game a sequential probability ratio test
+# checks whether one bot clearly dominates (wins with probability P_DOMINANT
+# rather than 1/2); once it does, the pair's remaining games are not played:
+# they are reported unplayed, with "skipped": "sprt", no winner and no moves,
+# and score nothing (the server ranks standings by points per game). Close
+# pairings always play their full schedule, so the games go where the
+# outcome is in doubt.
+
+P_DOMINANT = 0.9
+ALPHA = 0.05  # chance of stopping a pairing that is really even
+BETA = 0.05   # chance of playing on although one bot dominates
+
+
+def sprt_leader(wins, p=P_DOMINANT, alpha=ALPHA, beta=BETA):
+    # wins maps each of the two bots to its number of won games (draws do not
+    # count). Returns the bot proven dominant, or None to keep playing.
+    upper = math.log((1 - beta) / alpha)
+    (first, first_wins), (second, second_wins) = wins.items()
+    for leader, won, lost in ((first, first_wins, second_wins), (second, second_wins, first_wins)):
+        llr = won * math.log(p / 0.5) + lost * math.log((1 - p) / 0.5)
+        if llr >= upper:
+            return leader
+    return None
+
+
+def interleave(games):
+    # Alternate the pair's games between its two colour assignments
+    by_first = {}
+    for game in games:
+        by_first.setdefault(game["player_O"], []).append(game)
+    queues = list(by_first.values())
+    ordered = []
+    while any(queues):
+        for queue in queues:
+            if queue:
+                ordered.append(queue.pop(0))
+    return ordered
+
+
+def play_pair(games, emit, move_time, game_time, cache=None, limits=None, journal=None, rules=None):
+    # Games found in the journal are replayed from it, so a resumed pairing
+    # continues its test where it stopped. The pairing's games share one
+    # session, see bot_interactive_judge.Session.
+    games = interleave(games)
+    players = {games[0]["player_O"], games[0]["player_X"]}
+    wins = {player: 0 for player in players}
+    leader = None
+    session = Session()
+    try:
+        for game in games:
+            game_id = game.get("id")
+            if journal and game_id is not None and game_id in journal.done:
+                result = journal.done[game_id]
+                winner = seat_winner(result)
+                if winner in ('O', 'X'):
+                    wins[game["player_" + winner]] += 1
+                if len(wins) == 2:
+                    leader = sprt_leader(wins)
+                emit(result, journaled=True)
+                continue
+            if leader is None:
+                result = run_match(game["player_O"], game["player_X"], move_time, game_time, cache, limits, session,
+                                   rules)
+                winner = seat_winner(result)
+                if winner in ('O', 'X'):
+                    wins[game["player_" + winner]] += 1
+                if len(wins) == 2:
+                    leader = sprt_leader(wins)
+            else:
+                result = {"success": True, "moves": [], "winner": None, "skipped": "sprt"}
+            emit({**result, "id": game_id, "player_O": game["player_O"], "player_X": game["player_X"]})
+    finally:
+        session.close()
+
+
+def run(workers, move_time=MOVE_TIME_LIMIT, game_time=GAME_TIME_LIMIT, cache=None, metrics=None,
+        limits=None, journal=None, rules=None):
+    pairs = {}
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            game = json.loads(line)
+            key = frozenset((game["player_O"], game["player_X"]))
+        except (json.JSONDecodeError, KeyError, TypeError):
+            print(json.dumps({"error": f"Invalid pairing: {line}"}), flush=True)
+            continue
+        pairs.setdefault(key, []).append(game)
+
+    print(f"Scheduling {sum(map(len, pairs.values()))} games in {len(pairs)} pairings", file=sys.stderr)
+
+    output_lock = threading.Lock()
+    played = [0, 0]  # games played, games skipped
+    metrics_writer = MetricsWriter(*metrics) if metrics else None
+    journal = Journal(journal) if journal else None
+
+    def emit(result, journaled=False):
+        with output_lock:
+            if journaled:
+                print(json.dumps(result), flush=True)
+                return
+            played[1 if result.get("skipped") else 0] += 1
+            if journal:
+                journal.write(result)
+            print(json.dumps(result), flush=True)
+            if metrics_writer:
+                metrics_writer.write(result, id=result["id"], player_O=result["player_O"], player_X=result["player_X"])
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for future in [executor.submit(play_pair, games, emit, move_time, game_time, cache, limits, journal, rules)
+                       for games in pairs.values()]:
+            future.result()
+
+    if journal:
+        journal.close()
+    print(f"Played {played[0]} games, skipped {played[1]}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Early-stopping tournament scheduler")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="number of pairings played concurrently")
+    parser.add_argument("--move-time", type=float, default=MOVE_TIME_LIMIT)
+    parser.add_argument("--game-time", type=float, default=GAME_TIME_LIMIT)
+    parser.add_argument("--cache", metavar="FILE",
+                        help="reuse results of deterministic pairings stored in this game cache")
+    parser.add_argument("--metrics", metavar="FILE",
+                        help="record per-game metrics in this file")
+    parser.add_argument("--metrics-format", choices=["ndjson", "prom"],
+                        help="format of the metrics file (default: prom for *.prom, else ndjson)")
+    parser.add_argument("--journal", metavar="FILE",
+                        help="journal finished games here and skip those already in it")
+    add_limit_arguments(parser)
+    add_rules_arguments(parser)
+    args = parser.parse_args()
+    metrics = (args.metrics, args.metrics_format) if args.metrics else None
+
+    run(max(1, args.workers), args.move_time, args.game_time, args.cache, metrics,
+        limits_from_arguments(args), args.journal, rules_from_arguments(args))
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The judges import each other as top-level modules of playing_programs/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
@@ -0,0 +1,144 @@
+import pytest
+
+from board import Board, N, line_cells, cell_lines, line_count
+
+
+def play(board, cells, symbol):
+    for x, y in cells:
+        board.place(x, y, symbol)
+
+
+def run(start, direction, length=5):
+    (x, y), (dx, dy) = start, direction
+    return [(x + k * dx, y + k * dy) for k in range(length)]
+
+
+EDGE_RUNS = [
+    pytest.param((0, N - 5), (0, 1), id="horizontal-top-right"),
+    pytest.param((N - 1, 0), (0, 1), id="horizontal-bottom-left"),
+    pytest.param((N - 5, 0), (1, 0), id="vertical-bottom-left"),
+    pytest.param((0, N - 1), (1, 0), id="vertical-top-right"),
+    pytest.param((N - 5, N - 5), (1, 1), id="diagonal-to-bottom-right-corner"),
+    pytest.param((0, 0), (1, 1), id="diagonal-from-top-left-corner"),
+    pytest.param((0, N - 1), (1, -1), id="antidiagonal-from-top-right-corner"),
+    pytest.param((N - 5, 4), (1, -1), id="antidiagonal-to-bottom-left-corner"),
+]
+
+
+@pytest.mark.parametrize("start, direction", EDGE_RUNS)
+@pytest.mark.parametrize("last", [0, 2, 4])
+def test_five_at_the_edge_wins_whichever_stone_is_placed_last(start, direction, last):
+    board = Board()
+    cells = run(start, direction)
+    play(board, cells[:last] + cells[last + 1:], 'X')
+    assert not board.is_win(*cells[0], 'X')
+
+    board.place(*cells[last], 'X')
+    winning = board.winning_cells(*cells[last], 'X')
+    assert winning[0] == cells[last]
+    assert sorted(winning) == sorted(cells)
+    assert not board.is_win(*cells[last], 'O')
+
+
+@pytest.mark.parametrize("start, direction", EDGE_RUNS)
+def test_four_and_a_blocked_end_do_not_win(start, direction):
+    board = Board()
+    cells = run(start, direction)
+    play(board, cells[:4], 'O')
+    board.place(*cells[4], 'X')
+    assert not any(board.is_win(x, y, 'O') for x, y in cells[:4])
+    assert not board.is_win(*cells[4], 'X')
+
+
+def test_runs_do_not_wrap_around_rows():
+    board = Board()
+    play(board, [(0, N - 2), (0, N - 1), (1, 0), (1, 1), (1, 2)], 'O')
+    assert not board.is_win(1, 2, 'O')
+
+
+def test_freestyle_overline_wins_with_the_whole_run():
+    board = Board()
+    cells = run((7, 2), (0, 1), 6)
+    play(board, cells, 'O')
+    assert sorted(board.winning_cells(*cells[3], 'O')) == cells
+
+
+@pytest.mark.parametrize("n", [5, 9, 19])
+def test_other_board_sizes(n):
+    board = Board(n)
+    cells = run((n - 1, n - 5), (0, 1))
+    play(board, cells, 'O')
+    assert board.is_win(*cells[-1], 'O')
+    assert not board.is_free(n - 1, n - 1)
+    assert not board.is_free(n, 0)
+    assert board.is_free(0, 0)
+
+
+@pytest.mark.parametrize("n", [5, 6, 15])
+def test_line_tables_match_a_direct_count(n):
+    # Every run of five in the four directions, counted cell by cell
+    expected = set()
+    for x in range(n):
+        for y in range(n):
+            for dx, dy in [(0, 1), (1, 0), (1, 1), (1, -1)]:
+                cells = run((x, y), (dx, dy))
+                if all(0 <= i < n and 0 <= j < n for i, j in cells):
+                    expected.add(tuple(i * n + j for i, j in cells))
+    assert set(line_cells(n)) == expected
+    assert line_count(n) == len(expected)
+    for cell, lines in enumerate(cell_lines(n)):
+        assert sorted(lines) == sorted(k for k, line in enumerate(line_cells(n)) if cell in line)
+
+
+def test_full_and_dead_board():
+    board = Board(5)
+    # Columns of OOXXO / XXOOX patterns: nobody has five anywhere
+    for x in range(5):
+        for y in range(5):
+            board.place(x, y, 'OX'[(x // 2 + y) % 2])
+    assert board.is_full()
+    assert board.is_dead()
+    assert not any(board.is_win(x, y, board.get(x, y)) for x in range(5) for y in range(5))
+
+
+@pytest.mark.parametrize("start, direction", EDGE_RUNS)
+def test_exact_five_wins_at_the_edge(start, direction):
+    board = Board(exact_five=True)
+    cells = run(start, direction)
+    play(board, cells, 'O')
+    assert sorted(board.winning_cells(*cells[2], 'O')) == sorted(cells)
+
+
+@pytest.mark.parametrize("length", [6, 7])
+@pytest.mark.parametrize("direction", [(0, 1), (1, 0), (1, 1), (1, -1)])
+def test_exact_five_overlines_do_not_win(direction, length):
+    board = Board(exact_five=True)
+    cells = run((7 - 3 * direction[0], 7 - 3 * direction[1]), direction, length)
+    play(board, cells, 'X')
+    assert not any(board.is_win(x, y, 'X') for x, y in cells)
+
+
+def test_exact_five_overline_made_by_joining_runs():
+    # XXXX.X: filling the gap makes six, which does not win
+    board = Board(exact_five=True)
+    cells = run((3, 3), (0, 1), 6)
+    play(board, cells[:4] + cells[5:], 'X')
+    board.place(*cells[4], 'X')
+    assert not board.is_win(*cells[4], 'X')
+
+
+def test_exact_five_next_to_an_opponent_stone_wins():
+    board = Board(exact_five=True)
+    cells = run((7, 0), (0, 1), 6)
+    play(board, cells[:5], 'O')
+    board.place(*cells[5], 'X')
+    assert board.is_win(*cells[4], 'O')
+
+
+def test_exact_five_through_an_overline_in_another_direction():
+    # The last stone makes six horizontally but exactly five vertically
+    board = Board(exact_five=True)
+    play(board, [(7, y) for y in (2, 3, 4, 6, 7)], 'O')
+    play(board, [(x, 5) for x in (3, 4, 5, 6)], 'O')
+    board.place(7, 5, 'O')
+    assert sorted(board.winning_cells(7, 5, 'O')) == [(x, 5) for x in range(3, 8)]
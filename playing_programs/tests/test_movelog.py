@@ -0,0 +1,107 @@
+import pytest
+
+from movelog import encode_game, decode_game, read_games, MoveLogWriter, HEADERS, MAGIC
+from rules import Rules, seat_winner
+
+
+def judge_result(moves, winner=None, winning_cells=None, **extra):
+    # A result shaped like the bot judge's: moves as dicts, the winning line
+    # on the result and on the last move
+    moves = [{"x": x, "y": y, "symbol": 'OX'[i % 2]} for i, (x, y) in enumerate(moves)]
+    result = {"success": True, "moves": moves, "winner": winner, **extra}
+    if winning_cells:
+        result["winning_cells"] = winning_cells
+        moves[-1]["winner"] = winner
+        moves[-1]["winning_cells"] = winning_cells
+    return result
+
+
+def won_game(n):
+    # O fills the last row from the right, X answers on the row above
+    moves = []
+    for k in range(5):
+        moves.append((n - 1, n - 1 - k))
+        if k < 4:
+            moves.append((n - 2, k))
+    winning_cells = [(n - 1, n - 1 - k) for k in (4, 3, 2, 1, 0)]
+    return judge_result(moves, 'O', winning_cells)
+
+
+@pytest.mark.parametrize("n", [5, 15, 16, 17, 101])
+def test_round_trip(n):
+    result = won_game(n)
+    data = encode_game(result, Rules(n))
+    decoded, offset = decode_game(data)
+    assert offset == len(data)
+    # Games on other boards are told apart by their rules
+    assert decoded == (result if n == 15 else {**result, "rules": f"rules {n} freestyle"})
+
+
+@pytest.mark.parametrize("n, width", [(15, 1), (16, 1), (17, 2), (255, 2)])
+def test_cells_take_two_bytes_on_boards_over_16x16(n, width):
+    result = judge_result([(n - 1, n - 1)])
+    data = encode_game(result, Rules(n))
+    assert len(data) == HEADERS[2].size + width
+    assert decode_game(data)[0]["moves"][0] == {"x": n - 1, "y": n - 1, "symbol": 'O'}
+
+
+@pytest.mark.parametrize("winner", [None, '_', 'X'])
+def test_results_without_a_winning_line(winner):
+    result = judge_result([(7, 7), (7, 8), (8, 8)], winner)
+    assert decode_game(encode_game(result))[0] == result
+
+
+def test_reasons():
+    timeout = judge_result([(7, 7), (0, 0)], 'O', reason='timeout')
+    assert decode_game(encode_game(timeout))[0] == timeout
+
+    dead = judge_result([(7, 7), (0, 0)], '_', reason='dead_position')
+    assert decode_game(encode_game(dead))[0] == {**dead, "adjudicated_at": 2}
+
+
+def test_moves_as_pairs():
+    result = {"moves": [[7, 7], [8, 8]], "winner": None}
+    assert [(m["x"], m["y"]) for m in decode_game(encode_game(result))[0]["moves"]] == [(7, 7), (8, 8)]
+
+
+def test_version_1_records_still_decode():
+    data = HEADERS[1].pack(MAGIC, 1, 15, b'X', 0, 2, 0) + bytes([7 * 15 + 7, 8 * 15 + 8])
+    assert decode_game(data) == (judge_result([(7, 7), (8, 8)], 'X'), len(data))
+
+
+def test_rejects_other_data():
+    with pytest.raises(ValueError):
+        decode_game(b'XX' + bytes(HEADERS[2].size))
+
+
+def test_log_file_read_in_small_chunks(tmp_path):
+    path = tmp_path / "games.log"
+    games = [won_game(15), judge_result([(7, 7)]), judge_result([(1, 1), (2, 2)], '_')]
+    with MoveLogWriter(path) as writer:
+        for game in games:
+            writer.write(game)
+    assert writer.count == len(games)
+    assert list(read_games(path, chunk_size=3)) == games
+
+
+def test_truncated_log(tmp_path):
+    path = tmp_path / "games.log"
+    path.write_bytes(encode_game(won_game(15))[:-1])
+    with pytest.raises(ValueError):
+        list(read_games(path))
+
+
+@pytest.mark.parametrize("rules", [Rules(15, "exact"), Rules(15, swap=True), Rules(19, "exact", swap=True)])
+@pytest.mark.parametrize("swapped", [False, True])
+def test_rules_and_swaps_round_trip(rules, swapped):
+    result = won_game(rules.size)
+    if swapped:
+        result["swapped"] = True
+    decoded, _ = decode_game(encode_game(result, rules))
+    assert decoded == {**result, "rules": rules.line()}
+
+
+def test_swapped_game_keeps_its_seat_winner():
+    result = judge_result([(7, 7), (7, 8)], 'X', swapped=True)
+    decoded, _ = decode_game(encode_game(result, Rules(swap=True)))
+    assert seat_winner(decoded) == seat_winner(result) == 'O'
@@ -0,0 +1,88 @@
+import json
+
+import pytest
+
+from ratings import Elo, Glicko2, GLICKO_SCALE, GLICKO_START, game_scores, rate_stream, swiss_pairings
+
+
+def test_elo_even_game():
+    elo = Elo()
+    elo.update("a", "b", 1.0)
+    assert elo.rating("a") == pytest.approx(1516.0)
+    assert elo.rating("b") == pytest.approx(1484.0)
+    assert elo.games == {"a": 1, "b": 1}
+
+
+def test_elo_upset():
+    # Expected score of a 1500 player against 1700 is 1 / (1 + 10^0.5) = 0.2403
+    elo = Elo()
+    elo.ratings = {"low": 1500.0, "high": 1700.0}
+    elo.update("low", "high", 1.0)
+    assert elo.rating("low") == pytest.approx(1524.31, abs=0.01)
+    assert elo.rating("high") == pytest.approx(1675.69, abs=0.01)
+
+    elo.update("low", "high", 0.5)
+    assert elo.rating("low") + elo.rating("high") == pytest.approx(3200.0)
+
+
+def glicko_state(rating, deviation, volatility=0.06):
+    return [(rating - GLICKO_START) / GLICKO_SCALE, deviation / GLICKO_SCALE, volatility]
+
+
+def test_glicko2_matches_glickmans_example():
+    # The worked example of Glickman's "Example of the Glicko-2 system":
+    # 1500/200 beats 1400/30 and loses to 1550/100 and 1700/300, tau 0.5
+    mu, phi, sigma = Glicko2(tau=0.5)._rate(glicko_state(1500, 200), [
+        (glicko_state(1400, 30), 1.0),
+        (glicko_state(1550, 100), 0.0),
+        (glicko_state(1700, 300), 0.0),
+    ])
+    assert mu * GLICKO_SCALE + GLICKO_START == pytest.approx(1464.06, abs=0.01)
+    assert phi * GLICKO_SCALE == pytest.approx(151.52, abs=0.01)
+    assert sigma == pytest.approx(0.05999, abs=1e-5)
+
+
+def test_glicko2_game_by_game():
+    glicko = Glicko2()
+    glicko.update("a", "b", 1.0)
+    # Two fresh players: symmetric moves, deviations shrink from 350
+    assert glicko.rating("a") - GLICKO_START == pytest.approx(GLICKO_START - glicko.rating("b"))
+    assert glicko.rating("a") > GLICKO_START
+    assert glicko.deviation("a") == pytest.approx(glicko.deviation("b"))
+    assert glicko.deviation("a") < 350
+    assert [row["player"] for row in glicko.table()] == ["a", "b"]
+
+
+@pytest.mark.parametrize("result, scores", [
+    ({"winner": 'O'}, (1.0, 0.0)),
+    ({"winner": 'X'}, (0.0, 1.0)),
+    ({"winner": '_'}, (0.5, 0.5)),
+    ({"winner": None}, None),
+    ({"error": "Bot crashed"}, None),
+    ({"winner": 'X', "swapped": True}, (1.0, 0.0)),
+])
+def test_game_scores(result, scores):
+    assert game_scores(result) == scores
+
+
+def test_rate_stream_skips_games_without_a_result():
+    lines = [
+        json.dumps({"player_O": "a", "player_X": "b", "winner": 'O'}),
+        "not json",
+        "",
+        json.dumps({"player_O": "a", "player_X": "b", "error": "timeout"}),
+        json.dumps({"player_O": "b", "player_X": "a", "winner": None, "skipped": "sprt"}),
+    ]
+    elo = rate_stream(lines, Elo())
+    assert elo.games == {"a": 1, "b": 1}
+    assert elo.rating("a") == pytest.approx(1516.0)
+
+
+def test_swiss_pairings_avoid_rematches_and_balance_colours():
+    elo = Elo()
+    elo.ratings = {"a": 1600.0, "b": 1550.0, "c": 1500.0, "d": 1450.0, "e": 1400.0}
+    played = {frozenset(("a", "b"))}
+    o_games = {"a": 1}
+    pairings = swiss_pairings(list(elo.ratings), elo, played, o_games)
+    assert pairings == [("c", "a"), ("b", "d")]  # e sits the round out
+    assert frozenset(("a", "c")) in played
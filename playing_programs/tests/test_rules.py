@@ -0,0 +1,69 @@
+import argparse
+
+import pytest
+
+from board import N
+from rules import (Rules, FREESTYLE, EXACT, MAX_SIZE, from_environment, seat_winner,
+                   add_rules_arguments, rules_from_arguments)
+
+
+@pytest.mark.parametrize("result, winner", [
+    ({"winner": 'O'}, 'O'),
+    ({"winner": 'X'}, 'X'),
+    ({"winner": 'O', "swapped": True}, 'X'),
+    ({"winner": 'X', "swapped": True}, 'O'),
+    ({"winner": '_', "swapped": True}, '_'),
+    ({"winner": None, "swapped": True}, None),
+    ({"error": "Bot crashed"}, None),
+])
+def test_seat_winner(result, winner):
+    assert seat_winner(result) == winner
+
+
+def test_default_rules():
+    rules = Rules()
+    assert rules.is_default()
+    assert rules.key() == ""
+    assert rules.line() == f"rules {N} freestyle"
+    assert not rules.board().exact_five
+
+
+def test_other_rules():
+    rules = Rules(19, EXACT, swap=True)
+    assert not rules.is_default()
+    assert rules.line() == "rules 19 exact swap"
+    assert rules.key() == "rules:19:exact:swap"
+    board = rules.board()
+    assert board.n == 19 and board.exact_five
+    # The web client only follows the variant
+    assert rules.interactive().line() == f"rules {N} exact"
+
+
+@pytest.mark.parametrize("size, variant", [(4, FREESTYLE), (MAX_SIZE + 1, FREESTYLE), (N, "renju")])
+def test_invalid_rules(size, variant):
+    with pytest.raises(ValueError):
+        Rules(size, variant)
+
+
+def test_from_environment(monkeypatch):
+    monkeypatch.delenv("JUDGE_BOARD_SIZE", raising=False)
+    monkeypatch.delenv("JUDGE_RULE", raising=False)
+    monkeypatch.delenv("JUDGE_SWAP", raising=False)
+    assert from_environment().is_default()
+
+    monkeypatch.setenv("JUDGE_BOARD_SIZE", "21")
+    monkeypatch.setenv("JUDGE_RULE", EXACT)
+    monkeypatch.setenv("JUDGE_SWAP", "1")
+    assert from_environment().line() == "rules 21 exact swap"
+
+
+def test_arguments_override_the_environment(monkeypatch):
+    monkeypatch.setenv("JUDGE_BOARD_SIZE", "21")
+    monkeypatch.setenv("JUDGE_SWAP", "1")
+    monkeypatch.delenv("JUDGE_RULE", raising=False)
+    parser = argparse.ArgumentParser()
+    add_rules_arguments(parser)
+
+    assert rules_from_arguments(parser.parse_args([])).line() == "rules 21 freestyle swap"
+    assert rules_from_arguments(parser.parse_args(["--board-size", "9", "--rule", EXACT])).line() \
+        == "rules 9 exact swap"
@@ -0,0 +1,256 @@
+import argparse
+import json
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+
+from bot_interactive_judge import (run_match, add_limit_arguments, limits_from_arguments,
+                                   MOVE_TIME_LIMIT, GAME_TIME_LIMIT)
+from metrics import MetricsWriter
+from rules import add_rules_arguments, rules_from_arguments
+
+DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "codingomoku.db")
+LEASE_TIME = 30.0     # seconds a claimed match stays with its worker without renewal
+POLL_INTERVAL = 1.0   # seconds an idle worker waits before looking for work again
+BUSY_TIMEOUT = 30.0   # seconds to wait for another writer's lock
+WIN_POINTS = 3
+DRAW_POINTS = 1
+
+# Standalone tournament worker. Workers share the server's database as their
+# job queue: each one claims a pending tournament_matches row in an
+# IMMEDIATE transaction, which marks it in_progress with the worker's name
+# and a lease, plays it with the bot judge, and writes the result back
+# together with the players' scores and the tournament's progress. While a
+# game runs the lease is renewed; a match whose lease ran out (its worker
+# died) is claimed again by the next worker, and a worker that lost its
+# lease drops its result. Any number of workers can run on one machine, or
+# on several that share the database file over a filesystem with working
+# POSIX locks. The server leaves tournaments to them with TOURNAMENT_QUEUE=1.
+#
+# Every finished match is printed as a JSON line, like the batch judge does.
+
+
+class MatchQueue:
+    def __init__(self, path, name, lease=LEASE_TIME):
+        self.path = path
+        self.name = name
+        self.lease = lease
+        self.connection = self.connect()
+        self.ensure_schema()
+
+    def connect(self):
+        # Autocommit mode; transactions are opened explicitly
+        connection = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        connection.execute("PRAGMA journal_mode = WAL")
+        return connection
+
+    def ensure_schema(self):
+        # Databases created before workers existed lack the lease columns
+        columns = {row["name"] for row in self.connection.execute("PRAGMA table_info(tournament_matches)")}
+        for column, kind in (("worker", "TEXT"), ("lease_until", "REAL")):
+            if column not in columns:
+                try:
+                    self.connection.execute(f"ALTER TABLE tournament_matches ADD COLUMN {column} {kind}")
+                except sqlite3.OperationalError:
+                    pass  # added by another worker meanwhile
+
+    def claim(self, tournament_id=None):
+        # Lease the oldest pending (or abandoned) match of a running tournament
+        now = time.time()
+        query = """
+            SELECT m.* FROM tournament_matches m
+            JOIN tournaments t ON t.id = m.tournament_id
+            WHERE t.status = 'in_progress'
+              AND (m.status = 'pending' OR (m.status = 'in_progress' AND m.lease_until < ?))
+        """
+        params = [now]
+        if tournament_id is not None:
+            query += " AND m.tournament_id = ?"
+            params.append(tournament_id)
+        query += " ORDER BY m.id LIMIT 1"
+
+        cursor = self.connection.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            match = cursor.execute(query, params).fetchone()
+            if match:
+                cursor.execute(
+                    "UPDATE tournament_matches SET status = 'in_progress', worker = ?, lease_until = ? WHERE id = ?",
+                    (self.name, now + self.lease, match["id"]))
+            cursor.execute("COMMIT")
+        except BaseException:
+            cursor.execute("ROLLBACK")
+            raise
+        return dict(match) if match else None
+
+    def renew(self, connection, match_id):
+        # Extend our lease; False once another worker has taken the match over
+        cursor = connection.execute(
+            "UPDATE tournament_matches SET lease_until = ? WHERE id = ? AND worker = ? AND status = 'in_progress'",
+            (time.time() + self.lease, match_id, self.name))
+        return cursor.rowcount > 0
+
+    def finish(self, match, result):
+        # Store a match result with its score changes in one transaction;
+        # False if the lease was lost and the result is dropped. After a swap
+        # opening player1_piece is turned into the colour player1 ended up with.
+        winner, status = match_outcome(match, result)
+        scores = {}
+        if winner == "both":
+            scores = {match["player1"]: (0, 0, 1, DRAW_POINTS), match["player2"]: (0, 0, 1, DRAW_POINTS)}
+        elif winner:
+            loser = match["player2"] if winner == match["player1"] else match["player1"]
+            scores = {winner: (1, 0, 0, WIN_POINTS), loser: (0, 1, 0, 0)}
+        moves = json.dumps(result.get("moves", [])) if status == "completed" else None
+
+        cursor = self.connection.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            cursor.execute(
+                """UPDATE tournament_matches
+                   SET winner = ?, moves = COALESCE(?, moves), status = ?,
+                       player1_piece = CASE WHEN ? THEN (CASE player1_piece WHEN 'X' THEN 'O' ELSE 'X' END)
+                                            ELSE player1_piece END,
+                       completed_at = CURRENT_TIMESTAMP, lease_until = NULL
+                   WHERE id = ? AND worker = ? AND status = 'in_progress'""",
+                (winner, moves, status, bool(result.get("swapped")), match["id"], self.name))
+            if cursor.rowcount == 0:
+                cursor.execute("ROLLBACK")
+                return False
+            for player, (wins, losses, draws, points) in scores.items():
+                cursor.execute(
+                    """UPDATE tournament_results
+                       SET wins = wins + ?, losses = losses + ?, draws = draws + ?, points = points + ?
+                       WHERE tournament_id = ? AND player = ?""",
+                    (wins, losses, draws, points, match["tournament_id"], player))
+            cursor.execute(
+                """UPDATE tournaments
+                   SET completed_matches = completed_matches + 1,
+                       status = CASE WHEN completed_matches + 1 >= total_matches THEN 'completed' ELSE status END,
+                       completed_at = CASE WHEN completed_matches + 1 >= total_matches
+                                           THEN CURRENT_TIMESTAMP ELSE completed_at END
+                   WHERE id = ?""",
+                (match["tournament_id"],))
+            cursor.execute("COMMIT")
+        except BaseException:
+            cursor.execute("ROLLBACK")
+            raise
+        return True
+
+
+def match_outcome(match, result):
+    # Winner name ("both" for a draw, None if none) and final match status,
+    # scored the same way as the server's own tournament runs
+    if "error" in result:
+        return None, "failed"
+    if result.get("winner") == "_":
+        return "both", "completed"
+    piece = match.get("player1_piece") or "O"
+    if result.get("swapped"):
+        piece = 'X' if piece == 'O' else 'O'
+    if result.get("winner") == piece:
+        return match["player1"], "completed"
+    if result.get("winner") in ("O", "X"):
+        return match["player2"], "completed"
+    return None, "completed"
+
+
+class LeaseKeeper(threading.Thread):
+    # Renews a match's lease in the background while its game is played
+    def __init__(self, queue, match_id):
+        super().__init__(daemon=True)
+        self.queue = queue
+        self.match_id = match_id
+        self.stopped = threading.Event()
+        self.lost = False
+
+    def run(self):
+        connection = self.queue.connect()
+        try:
+            while not self.stopped.wait(self.queue.lease / 3):
+                try:
+                    if not self.queue.renew(connection, self.match_id):
+                        self.lost = True
+                        return
+                except sqlite3.OperationalError as e:
+                    print(f"Could not renew lease of match {self.match_id}: {e}", file=sys.stderr)
+        finally:
+            connection.close()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def work(queue, tournament_id=None, exit_when_idle=False, move_time=MOVE_TIME_LIMIT,
+         game_time=GAME_TIME_LIMIT, cache=None, limits=None, metrics=None, rules=None):
+    metrics_writer = MetricsWriter(*metrics) if metrics else None
+    played = 0
+    while True:
+        match = queue.claim(tournament_id)
+        if match is None:
+            if exit_when_idle:
+                break
+            time.sleep(POLL_INTERVAL)
+            continue
+
+        if (match.get("player1_piece") or "O") == "O":
+            player_O, player_X = match["player1"], match["player2"]
+        else:
+            player_O, player_X = match["player2"], match["player1"]
+
+        keeper = LeaseKeeper(queue, match["id"])
+        keeper.start()
+        try:
+            result = run_match(player_O, player_X, move_time, game_time, cache, limits, rules=rules)
+        finally:
+            keeper.stop()
+        result.update({"id": match["id"], "player_O": player_O, "player_X": player_X})
+
+        if keeper.lost or not queue.finish(match, result):
+            print(f"Lost the lease of match {match['id']}, dropping its result", file=sys.stderr)
+            continue
+        played += 1
+        print(json.dumps({"worker": queue.name, **result}), flush=True)
+        if metrics_writer:
+            metrics_writer.write(result, id=match["id"], player_O=player_O, player_X=player_X)
+    print(f"Worker {queue.name} played {played} matches", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tournament worker pulling matches from the shared database")
+    parser.add_argument("--db", default=DB_PATH,
+                        help="database holding the tournament queue")
+    parser.add_argument("--tournament", type=int,
+                        help="only play matches of this tournament")
+    parser.add_argument("--name", default=f"{socket.gethostname()}:{os.getpid()}",
+                        help="worker name recorded on claimed matches (default: host:pid)")
+    parser.add_argument("--lease", type=float, default=LEASE_TIME,
+                        help="seconds before an unrenewed match is handed to another worker")
+    parser.add_argument("--exit-when-idle", action="store_true",
+                        help="stop once no match is left to claim instead of polling")
+    parser.add_argument("--move-time", type=float, default=MOVE_TIME_LIMIT,
+                        help="seconds a bot may think about a single move")
+    parser.add_argument("--game-time", type=float, default=GAME_TIME_LIMIT,
+                        help="seconds of thinking a bot may use over the whole game")
+    parser.add_argument("--cache", metavar="FILE",
+                        help="reuse results of deterministic pairings stored in this game cache")
+    parser.add_argument("--metrics", metavar="FILE",
+                        help="record per-game metrics in this file")
+    parser.add_argument("--metrics-format", choices=["ndjson", "prom"],
+                        help="format of the metrics file (default: prom for *.prom, else ndjson)")
+    add_limit_arguments(parser)
+    add_rules_arguments(parser)
+    args = parser.parse_args()
+
+    queue = MatchQueue(args.db, args.name, args.lease)
+    try:
+        work(queue, args.tournament, args.exit_when_idle, args.move_time, args.game_time, args.cache,
+             limits_from_arguments(args), (args.metrics, args.metrics_format) if args.metrics else None,
+             rules_from_arguments(args))
+    except KeyboardInterrupt:
+        pass
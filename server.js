@@ -2,14 +2,17 @@ const express = require("express");
 const multer = require("multer");
 const cors = require("cors");
 const path = require("path");
+const os = require("os");
 const fs = require("fs");
+const crypto = require("crypto");
 const { exec } = require("child_process");
 const { spawn } = require("child_process");
 const bcrypt = require("bcrypt");
 const https = require("https");
 const http = require("http");
+const { WebSocketServer } = require("ws");
 const activeGames = new Map();
-const { dbGet, dbRun, dbAll } = require("./db");
+const { dbGet, dbRun, dbAll, dbTransaction, dbInsertMany } = require("./db");
 const {
     createUser,
     findUserByUsername,
@@ -30,25 +33,67 @@ app.use(
 );
 
 const playingDir = path.join(__dirname, "playing_programs");
+// Results of deterministic bot pairings, see playing_programs/gamecache.py
+const gameCachePath = path.join(playingDir, ".game-cache.sqlite");
+// Position index over all stored games, see playing_programs/positions.py
+const positionIndexPath = path.join(playingDir, ".positions.sqlite");
+
+// Write-ahead journals of running tournaments, see playing_programs/journal.py
+const journalDir = path.join(playingDir, "journals");
+if (!fs.existsSync(journalDir)) {
+    fs.mkdirSync(journalDir, { recursive: true });
+}
+
+function tournamentJournal(tournamentId) {
+    return path.join(journalDir, `tournament-${tournamentId}.ndjson`);
+}
 
 const uploadDir = path.join(__dirname, "uploads");
 if (!fs.existsSync(uploadDir)) {
     fs.mkdirSync(uploadDir, { recursive: true });
 }
 
-function compileCode(filePath, outputPath) {
-    return new Promise((resolve, reject) => {
-        // Remove old binary if it exists to avoid conflicts
-        if (fs.existsSync(outputPath)) {
-            try {
-                fs.unlinkSync(outputPath);
-            } catch (e) {
-                console.log("Could not remove old binary:", e.message);
-            }
-        }
+// Compiled binaries are cached by a hash of the source and the compiler
+// flags, so unchanged code (server restarts, re-saves, default programs) is
+// never compiled twice. The bot itself is a hard link to the cached artifact,
+// which lets the judges keep launching ./<name>.
+const COMPILE_FLAGS = "-std=c++17";
+const compileCacheDir = path.join(playingDir, ".compile-cache");
+const COMPILE_CACHE_MAX = parseInt(process.env.COMPILE_CACHE_MAX, 10) || 200;
+const COMPILE_WORKERS =
+    parseInt(process.env.COMPILE_WORKERS, 10) || Math.max(1, os.cpus().length);
+
+const compileCache = {
+    running: 0,
+    waiting: [], // resolvers of jobs waiting for a free g++ slot
+    inFlight: new Map(), // cache key -> promise of the artifact path
+    hits: 0,
+    misses: 0,
+    evicted: 0,
+};
 
+if (!fs.existsSync(compileCacheDir)) {
+    fs.mkdirSync(compileCacheDir, { recursive: true });
+}
+
+async function withCompileSlot(job) {
+    if (compileCache.running >= COMPILE_WORKERS) {
+        await new Promise((resolve) => compileCache.waiting.push(resolve));
+    }
+    compileCache.running++;
+    try {
+        return await job();
+    } finally {
+        compileCache.running--;
+        const next = compileCache.waiting.shift();
+        if (next) next();
+    }
+}
+
+function runCompiler(filePath, outputPath) {
+    return new Promise((resolve, reject) => {
         exec(
-            `g++ ${filePath} -o ${outputPath} -std=c++17`,
+            `g++ ${filePath} -o ${outputPath} ${COMPILE_FLAGS}`,
             (error, stdout, stderr) => {
                 if (error) {
                     reject(error);
@@ -60,6 +105,94 @@ function compileCode(filePath, outputPath) {
     });
 }
 
+async function evictCompileCache() {
+    // Least recently used artifacts go first; hits refresh the mtime
+    const entries = [];
+    for (const name of await fs.promises.readdir(compileCacheDir)) {
+        if (name.endsWith(".tmp")) continue;
+        try {
+            const stat = await fs.promises.stat(path.join(compileCacheDir, name));
+            entries.push({ name, used: stat.mtimeMs });
+        } catch (e) {
+            // Removed concurrently
+        }
+    }
+    entries.sort((a, b) => a.used - b.used);
+    for (const entry of entries.slice(0, Math.max(0, entries.length - COMPILE_CACHE_MAX))) {
+        await fs.promises.unlink(path.join(compileCacheDir, entry.name)).catch(() => {});
+        compileCache.evicted++;
+    }
+}
+
+async function compiledArtifact(filePath) {
+    const source = await fs.promises.readFile(filePath);
+    const key = crypto
+        .createHash("sha256")
+        .update(COMPILE_FLAGS)
+        .update("\0")
+        .update(source)
+        .digest("hex");
+    const artifactPath = path.join(compileCacheDir, key);
+
+    if (compileCache.inFlight.has(key)) {
+        compileCache.hits++;
+        return compileCache.inFlight.get(key);
+    }
+
+    if (fs.existsSync(artifactPath)) {
+        compileCache.hits++;
+        const now = new Date();
+        await fs.promises.utimes(artifactPath, now, now).catch(() => {});
+        return artifactPath;
+    }
+
+    compileCache.misses++;
+    const build = withCompileSlot(async () => {
+        // Compile next to the cache entry and rename, so a half-written
+        // binary is never picked up
+        const tmpPath = `${artifactPath}.${process.pid}.tmp`;
+        try {
+            await runCompiler(filePath, tmpPath);
+            await fs.promises.chmod(tmpPath, 0o755);
+            await fs.promises.rename(tmpPath, artifactPath);
+        } catch (error) {
+            await fs.promises.unlink(tmpPath).catch(() => {});
+            throw error;
+        }
+        await evictCompileCache();
+        return artifactPath;
+    });
+    compileCache.inFlight.set(key, build);
+    try {
+        return await build;
+    } finally {
+        compileCache.inFlight.delete(key);
+    }
+}
+
+async function compileCode(filePath, outputPath) {
+    const artifactPath = await compiledArtifact(filePath);
+
+    const [artifact, current] = await Promise.all([
+        fs.promises.stat(artifactPath),
+        fs.promises.stat(outputPath).catch(() => null),
+    ]);
+    if (current && current.ino === artifact.ino && current.dev === artifact.dev) {
+        return outputPath; // already linked to this build
+    }
+
+    // Swap the bot in atomically; running games keep the old inode
+    const linkPath = `${outputPath}.${process.pid}.tmp`;
+    await fs.promises.unlink(linkPath).catch(() => {});
+    try {
+        await fs.promises.link(artifactPath, linkPath);
+    } catch (e) {
+        await fs.promises.copyFile(artifactPath, linkPath);
+    }
+    await fs.promises.rename(linkPath, outputPath);
+    return outputPath;
+}
+
 // Run game function
 function runGame() {
     return new Promise((resolve, reject) => {
@@ -371,6 +504,8 @@ app.post("/api/uploads", upload.single("file"), async (req, res) => {
             const result = await compileCode(req.file.path, userCompiledPath);
             console.log("Compilation result:", result);
 
+            rewarmBot(nickname);
+
             // Get the code from the file
             const code = fs.readFileSync(req.file.path, "utf8");
 
@@ -478,12 +613,13 @@ app.get("/api/check-nickname/:nickname", (req, res) => {
 // Add game history table
 app.post("/api/games/history", authenticate, async (req, res) => {
     try {
-        const { player1, player2, winner, moves } = req.body;
+        const { player1, player2, player1_piece, winner, moves } = req.body;
 
         await dbRun(
-            "INSERT INTO game_history (player1, player2, winner, moves) VALUES (?, ?, ?, ?)",
-            [player1, player2, winner, JSON.stringify(moves)],
+            "INSERT INTO game_history (player1, player2, player1_piece, winner, moves) VALUES (?, ?, ?, ?, ?)",
+            [player1, player2, player1_piece || null, winner, JSON.stringify(moves)],
         );
+        schedulePositionIndexUpdate();
 
         res.json({ success: true });
     } catch (error) {
@@ -512,8 +648,180 @@ app.get("/api/games/history", authenticate, async (req, res) => {
     }
 });
 
+// JUDGE DAEMON
+// All interactive games run inside one judge_daemon.py process. Its replies
+// are JSON lines tagged with the game id; they are queued per game until a
+// request picks them up. The daemon also keeps warm (already "ready") bot
+// processes for the built-in opponents and recently compiled bots.
+const JUDGE_DEFAULT_BOTS = ["admin", "random", "boss"];
+
+const judgeDaemon = {
+    process: null,
+    queues: new Map(), // id -> { messages: [], waiters: [] }
+    sockets: new Map(), // id -> WebSocket of a game played over /api/game-socket
+    nextId: 0,
+};
+
+function startJudgeDaemon() {
+    const daemon = spawn(
+        "python3",
+        [path.join(playingDir, "judge_daemon.py")],
+        {
+            cwd: playingDir,
+            stdio: ["pipe", "pipe", "pipe"],
+        },
+    );
+    judgeDaemon.process = daemon;
+
+    let pending = "";
+    daemon.stdout.on("data", (data) => {
+        pending += data.toString();
+        const lines = pending.split("\n");
+        pending = lines.pop();
+
+        for (const line of lines) {
+            if (!line.trim()) continue;
+            try {
+                deliverJudgeMessage(JSON.parse(line));
+            } catch (error) {
+                console.error("Invalid judge daemon output:", line);
+            }
+        }
+    });
+
+    daemon.stderr.on("data", (data) => {
+        console.log("Judge daemon debug:", data.toString());
+    });
+
+    daemon.stdin.on("error", (error) => {
+        console.error("Judge daemon stdin error:", error.message);
+    });
+
+    daemon.on("close", (code) => {
+        console.error("Judge daemon exited with code:", code);
+        judgeDaemon.process = null;
+
+        // Games hosted by the daemon are gone with it
+        for (const [id, queue] of judgeDaemon.queues) {
+            for (const waiter of queue.waiters) {
+                waiter({ id, error: "Judge daemon stopped" });
+            }
+        }
+        judgeDaemon.queues.clear();
+        for (const socket of judgeDaemon.sockets.values()) {
+            sendToSocket(socket, { error: "Judge daemon stopped" });
+            socket.close(1011);
+        }
+        judgeDaemon.sockets.clear();
+        activeGames.clear();
+
+        setTimeout(() => {
+            for (const bot of JUDGE_DEFAULT_BOTS) {
+                sendToJudge({ cmd: "warm", bot, pin: true });
+            }
+        }, 1000);
+    });
+}
+
+function sendToJudge(command) {
+    if (!judgeDaemon.process) {
+        startJudgeDaemon();
+    }
+    judgeDaemon.process.stdin.write(JSON.stringify(command) + "\n");
+}
+
+function judgeQueue(id) {
+    if (!judgeDaemon.queues.has(id)) {
+        judgeDaemon.queues.set(id, { messages: [], waiters: [] });
+    }
+    return judgeDaemon.queues.get(id);
+}
+
+function deliverJudgeMessage(message) {
+    const socket = judgeDaemon.sockets.get(message.id);
+    if (socket) {
+        const { id, ...response } = message;
+        sendToSocket(socket, response);
+        if (response.winner) {
+            socket.close(1000);
+        }
+        return;
+    }
+    if (!judgeDaemon.queues.has(message.id) && !activeGames.has(message.id)) {
+        // A late reply for a game that has already ended
+        return;
+    }
+
+    const queue = judgeQueue(message.id);
+    const waiter = queue.waiters.shift();
+    if (waiter) {
+        waiter(message);
+    } else {
+        queue.messages.push(message);
+    }
+}
+
+function nextJudgeMessage(id, timeoutMs) {
+    const queue = judgeQueue(id);
+    if (queue.messages.length > 0) {
+        return Promise.resolve(queue.messages.shift());
+    }
+
+    return new Promise((resolve, reject) => {
+        const waiter = (message) => {
+            clearTimeout(timeout);
+            resolve(message);
+        };
+        const timeout = setTimeout(() => {
+            queue.waiters.splice(queue.waiters.indexOf(waiter), 1);
+            reject(new Error("Judge timeout"));
+        }, timeoutMs);
+        queue.waiters.push(waiter);
+    });
+}
+
+function endJudgeGame(gameId) {
+    sendToJudge({ cmd: "end", id: gameId });
+    activeGames.delete(gameId);
+    judgeDaemon.queues.delete(gameId);
+}
+
+// Spare bot processes still run the old binary after a recompile
+function rewarmBot(nickname, pin = false) {
+    sendToJudge({ cmd: "cool", bot: nickname });
+    sendToJudge({ cmd: "warm", bot: nickname, pin });
+}
+
+startJudgeDaemon();
+
+app.get("/api/admin/bot-pool", authenticateAdmin, async (req, res) => {
+    const id = `stats-${++judgeDaemon.nextId}`;
+    try {
+        sendToJudge({ cmd: "stats", id });
+        const { id: _, ...stats } = await nextJudgeMessage(id, 2000);
+        res.json(stats);
+    } catch (error) {
+        console.error("Error fetching bot pool stats:", error);
+        res.status(500).json({ error: "Failed to fetch bot pool stats" });
+    } finally {
+        judgeDaemon.queues.delete(id);
+    }
+});
+
+app.get("/api/admin/compile-cache", authenticateAdmin, async (req, res) => {
+    const { running, waiting, inFlight, ...counts } = compileCache;
+    res.json({
+        ...counts,
+        running,
+        queued: waiting.length,
+        workers: COMPILE_WORKERS,
+        maxEntries: COMPILE_CACHE_MAX,
+    });
+});
+
 // Interactive game
 app.post("/api/start-interactive-game", async (req, res) => {
+    let gameId = null;
     try {
         const { nickname, selectedPiece } = req.body;
 
@@ -521,34 +829,35 @@ app.post("/api/start-interactive-game", async (req, res) => {
             return res.status(400).json({ error: "Nickname is required" });
         }
 
-        const gameProcess = spawn(
-            "python3",
-            [
-                path.join(playingDir, "interactive_judge.py"),
-                nickname,
-                selectedPiece,
-            ],
-            {
-                cwd: playingDir,
-                stdio: ["pipe", "pipe", "pipe"],
-            },
-        );
-
-        const gameId = Date.now().toString();
-        activeGames.set(gameId, gameProcess);
+        gameId = `${Date.now()}-${++judgeDaemon.nextId}`;
+        activeGames.set(gameId, { nickname, selectedPiece });
 
-        gameProcess.stderr.on("data", (data) => {
-            console.log("Interactive judge debug:", data.toString());
+        sendToJudge({
+            cmd: "start",
+            id: gameId,
+            bot: nickname,
+            piece: selectedPiece,
         });
 
-        gameProcess.stdout.on("data", (data) => {
-            console.log("Interactive judge output:", data.toString());
-        });
+        const started = await nextJudgeMessage(gameId, 10000);
+        if (started.error) {
+            console.error("Interactive game failed to start:", started.error);
+            endJudgeGame(gameId);
+            return res.status(500).json({ error: started.error });
+        }
+
+        // The bot's opening move waits for the player's first request
+        if (started.initial) {
+            judgeQueue(gameId).messages.unshift(started);
+        }
 
         res.json({ gameId, success: true });
     } catch (error) {
         console.error("Error starting game:", error);
         res.status(500).json({ error: "Failed to start game" });
+        if (gameId) {
+            endJudgeGame(gameId);
+        }
     }
 });
 
@@ -624,132 +933,170 @@ app.post("/api/start-interactive-game", async (req, res) => {
 //     }
 // });
 
-app.post("/api/make-move", (req, res) => {
+app.post("/api/make-move", async (req, res) => {
     const { gameId, x, y } = req.body;
-    const gameProcess = activeGames.get(gameId);
 
-    if (!gameProcess) {
+    if (!activeGames.has(gameId)) {
         return res.status(404).json({ error: "Game not found" });
     }
 
+    // Special case for getting initial move when player is X
+    const initial = x === -1 && y === -1;
+
     try {
-        // Special case for getting initial move when player is X
-        if (x === -1 && y === -1) {
-            console.log("Requesting initial move from bot");
-
-            let dataReceived = false;
-            let responseData = '';
-
-            // Set up timeout for initial move
-            const timeout = setTimeout(() => {
-                if (!dataReceived) {
-                    console.log("Initial move timeout - sending error response");
-                    res.status(500).json({ error: "Initial move timeout" });
-                    // Cleanup the stuck game
-                    gameProcess.kill();
-                    activeGames.delete(gameId);
-                }
-            }, 5000); // Increased timeout
+        if (!initial) {
+            sendToJudge({ cmd: "move", id: gameId, x, y });
+        }
 
-            // Listen for any existing data first
-            const onData = (data) => {
-                if (dataReceived) return; // Prevent multiple responses
+        const { id, ...response } = await nextJudgeMessage(gameId, 5000);
 
-                clearTimeout(timeout);
-                dataReceived = true;
+        if (initial && (response.x === undefined || response.y === undefined)) {
+            return res.status(500).json({ error: "Invalid initial move format" });
+        }
 
-                try {
-                    const dataStr = data.toString().trim();
-                    console.log("Received initial move data:", dataStr);
-
-                    // Handle case where multiple JSON objects might be in the data
-                    const lines = dataStr.split('\n').filter(line => line.trim());
-                    let response = null;
-
-                    for (const line of lines) {
-                        try {
-                            const parsed = JSON.parse(line);
-                            if (parsed.x !== undefined && parsed.y !== undefined) {
-                                response = parsed;
-                                break;
-                            }
-                        } catch (e) {
-                            continue;
-                        }
-                    }
+        res.json(response);
 
-                    if (response) {
-                        res.json(response);
-                    } else {
-                        res.status(500).json({ error: "Invalid initial move format" });
-                    }
-                } catch (error) {
-                    console.error("Error processing initial move:", error);
-                    res.status(500).json({ error: "Invalid response from game" });
-                }
+        if (response.winner) {
+            endJudgeGame(gameId);
+        }
+    } catch (error) {
+        console.log("Move timeout - sending error response");
+        res.status(500).json({
+            error: initial ? "Initial move timeout" : "Move timeout",
+        });
+        // Cleanup the stuck game
+        endJudgeGame(gameId);
+    }
+});
 
-                // Remove the listener after use
-                gameProcess.stdout.removeListener('data', onData);
-            };
+app.post("/api/end-game", (req, res) => {
+    const { gameId } = req.body;
 
-            gameProcess.stdout.on('data', onData);
+    if (activeGames.has(gameId)) {
+        endJudgeGame(gameId);
+    }
 
-            // Give it a moment for any buffered data to arrive
-            setTimeout(() => {
-                if (!dataReceived) {
-                    // If no data received yet, try to trigger it
-                    console.log("No initial data received, process might be waiting");
-                }
-            }, 100);
+    res.json({ success: true });
+});
 
-            return;
+// Interactive games over one WebSocket per game instead of a request per
+// move. Every message is one JSON object, in either direction:
+//   client: {"type": "start", "nickname": ..., "selectedPiece": "O" | "X"}
+//   server: {"gameId": ..., "started": true} or, when the bot opens,
+//           {"gameId": ..., "x", "y", "initial": true}
+//   client: {"type": "move", "seq": n, "x": ..., "y": ...}
+//   server: the judge's reply to move n, with the same "seq"
+// seq numbers the player's moves from 1. The judge daemon's replies are
+// written straight to the socket, so a move costs only the bot's thinking
+// time. Closing the socket ends the game; the server closes it once the game
+// has a winner.
+const gameSockets = new WebSocketServer({ noServer: true });
+
+function sendToSocket(socket, message) {
+    if (socket.readyState === socket.OPEN) {
+        socket.send(JSON.stringify(message));
+    }
+}
+
+gameSockets.on("connection", (socket) => {
+    let gameId = null;
+
+    socket.on("message", async (data) => {
+        let message;
+        try {
+            message = JSON.parse(data.toString());
+        } catch (error) {
+            return sendToSocket(socket, { error: "Invalid message" });
         }
 
-        // Regular move handling (unchanged)
-        gameProcess.stdin.write(JSON.stringify({ x, y }) + "\n");
+        if (message.type === "start") {
+            if (gameId) {
+                return sendToSocket(socket, { error: "Game already started" });
+            }
+            const { nickname, selectedPiece } = message;
+            if (!nickname) {
+                return sendToSocket(socket, { error: "Nickname is required" });
+            }
 
-        const timeout = setTimeout(() => {
-            console.log("Move timeout - sending error response");
-            res.status(500).json({ error: "Move timeout" });
-            gameProcess.kill();
-            activeGames.delete(gameId);
-        }, 5000);
+            gameId = `${Date.now()}-${++judgeDaemon.nextId}`;
+            const game = { nickname, selectedPiece, starting: true, closing: false };
+            activeGames.set(gameId, game);
+            sendToJudge({
+                cmd: "start",
+                id: gameId,
+                bot: nickname,
+                piece: selectedPiece,
+            });
 
-        gameProcess.stdout.once("data", (data) => {
-            clearTimeout(timeout);
             try {
-                const response = JSON.parse(data);
-                res.json(response);
-
-                if (response.winner) {
-                    gameProcess.stdin.write("exit\n");
-                    gameProcess.kill();
-                    activeGames.delete(gameId);
+                const { id, ...started } = await nextJudgeMessage(gameId, 10000);
+                judgeDaemon.queues.delete(gameId);
+                if (!activeGames.has(gameId)) {
+                    // The daemon stopped and the socket was closed with it
+                    return;
+                }
+                game.starting = false;
+                if (game.closing) {
+                    // Closed while the bot was starting; the daemon knows
+                    // the game now, so it can be ended
+                    return endJudgeGame(gameId);
                 }
+                if (started.error) {
+                    console.error("Interactive game failed to start:", started.error);
+                    sendToSocket(socket, started);
+                    return socket.close(1011);
+                }
+                judgeDaemon.sockets.set(gameId, socket);
+                sendToSocket(socket, { gameId, ...started });
             } catch (error) {
-                console.error("Error processing game response:", error);
-                res.status(500).json({ error: "Invalid response from game" });
+                endJudgeGame(gameId);
+                sendToSocket(socket, { error: "Failed to start game" });
+                socket.close(1011);
             }
-        });
-    } catch (error) {
-        console.error("Error in make-move:", error);
-        res.status(500).json({ error: "Failed to process move" });
-    }
-});
-
-app.post("/api/end-game", (req, res) => {
-    const { gameId } = req.body;
-    const gameProcess = activeGames.get(gameId);
-
-    if (gameProcess) {
-        gameProcess.stdin.write("exit\n");
-        gameProcess.kill();
-        activeGames.delete(gameId);
-    }
+        } else if (message.type === "move") {
+            if (!judgeDaemon.sockets.has(gameId)) {
+                return sendToSocket(socket, { seq: message.seq, error: "Game not found" });
+            }
+            sendToJudge({
+                cmd: "move",
+                id: gameId,
+                seq: message.seq,
+                x: message.x,
+                y: message.y,
+            });
+        } else {
+            sendToSocket(socket, { error: `Unknown message type: ${message.type}` });
+        }
+    });
 
-    res.json({ success: true });
+    socket.on("close", () => {
+        if (gameId) {
+            judgeDaemon.sockets.delete(gameId);
+            const game = activeGames.get(gameId);
+            if (game && game.starting) {
+                // Ended once the start reply arrives, see above
+                game.closing = true;
+            } else if (game) {
+                endJudgeGame(gameId);
+            }
+        }
+    });
 });
 
+function acceptGameSockets(server) {
+    server.on("upgrade", (req, socket, head) => {
+        const { pathname } = new URL(req.url, "http://localhost");
+        if (pathname !== "/api/game-socket") {
+            socket.destroy();
+            return;
+        }
+        gameSockets.handleUpgrade(req, socket, head, (ws) => {
+            gameSockets.emit("connection", ws, req);
+        });
+    });
+    return server;
+}
+
 // CODE MANAGEMENT
 const defaultCode = `#include <iostream>
 #include <sstream>
@@ -892,6 +1239,8 @@ app.post("/api/compile-code", authenticate, async (req, res) => {
             // ADD THIS: Small delay to ensure file system operations complete
             await new Promise(resolve => setTimeout(resolve, 100));
 
+            rewarmBot(nickname);
+
             console.log("Compilation successful");
             res.json({ success: true });
         } catch (compileError) {
@@ -982,6 +1331,10 @@ app.get("/api/get-opponents", async (req, res) => {
 });
 
 // BOT VS BOT GAME
+// Plays a bot game. Clients that accept application/x-ndjson (or
+// text/event-stream) get every move as soon as the judge reports it,
+// {"event": "move", ...} then {"event": "result", ...} without the moves;
+// everyone else gets the whole result as one JSON object at the end.
 app.post("/api/start-bot-game", async (req, res) => {
     try {
         const { player1, player2, selectedPiece } = req.body;
@@ -991,6 +1344,15 @@ app.post("/api/start-bot-game", async (req, res) => {
             return res.status(400).json({ error: "Both players are required" });
         }
 
+        const accept = req.headers.accept || "";
+        const sse = accept.includes("text/event-stream");
+        const streaming = sse || accept.includes("application/x-ndjson");
+        const sendEvent = (event) => {
+            if (res.writableEnded || res.destroyed) return;
+            const line = JSON.stringify(event);
+            res.write(sse ? `data: ${line}\n\n` : `${line}\n`);
+        };
+
         const gameProcess = spawn(
             "python3",
             [
@@ -998,17 +1360,52 @@ app.post("/api/start-bot-game", async (req, res) => {
                 player1,
                 player2,
                 selectedPiece,
+                "--cache",
+                gameCachePath,
+                "--stream",
             ],
             {
                 cwd: playingDir,
             },
         );
 
-        let outputData = "";
+        if (streaming) {
+            res.writeHead(200, {
+                "Content-Type": sse ? "text/event-stream" : "application/x-ndjson",
+                "Cache-Control": "no-cache",
+                "X-Accel-Buffering": "no",
+            });
+            res.flushHeaders();
+            // Stop the game when the spectator goes away
+            res.on("close", () => {
+                if (gameProcess.exitCode === null) gameProcess.kill();
+            });
+        }
+
+        let pending = "";
+        let gameData = null;
 
         gameProcess.stdout.on("data", (data) => {
-            console.log("Received data from python:", data.toString());
-            outputData += data.toString();
+            pending += data.toString();
+            const lines = pending.split("\n");
+            pending = lines.pop();
+
+            for (const line of lines) {
+                if (!line.trim()) continue;
+                let event;
+                try {
+                    event = JSON.parse(line);
+                } catch (error) {
+                    console.error("Invalid judge output:", line);
+                    continue;
+                }
+                if (event.event === "result") {
+                    const { event: _, ...result } = event;
+                    gameData = result;
+                } else if (streaming) {
+                    sendEvent(event);
+                }
+            }
         });
 
         gameProcess.stderr.on("data", (data) => {
@@ -1018,31 +1415,43 @@ app.post("/api/start-bot-game", async (req, res) => {
         gameProcess.on("close", async (code) => {
             console.log("Game process closed with code:", code);
 
-            try {
-                const gameData = JSON.parse(outputData);
-
-                // Save game to history
-                try {
-                    await dbRun(
-                        "INSERT INTO game_history (player1, player2, winner, moves) VALUES (?, ?, ?, ?)",
-                        [
-                            player1,
-                            player2,
-                            gameData.winner || null,
-                            JSON.stringify(gameData.moves || []),
-                        ],
-                    );
-                } catch (dbError) {
-                    console.error("Error saving game to history:", dbError);
+            if (!gameData) {
+                console.error("Bot game ended without a result");
+                if (streaming) {
+                    sendEvent({ event: "result", error: "Failed to parse game data" });
+                    if (!res.destroyed) res.end();
+                    return;
                 }
+                return res.status(500).json({ error: "Failed to parse game data" });
+            }
 
+            // Save game to history, with the colour player1 ended up playing
+            let player1Piece = selectedPiece === "O" ? "O" : "X";
+            if (gameData.swapped) {
+                player1Piece = player1Piece === "O" ? "X" : "O";
+            }
+            try {
+                await dbRun(
+                    "INSERT INTO game_history (player1, player2, player1_piece, winner, moves) VALUES (?, ?, ?, ?, ?)",
+                    [
+                        player1,
+                        player2,
+                        player1Piece,
+                        gameData.winner || null,
+                        JSON.stringify(gameData.moves || []),
+                    ],
+                );
+                schedulePositionIndexUpdate();
+            } catch (dbError) {
+                console.error("Error saving game to history:", dbError);
+            }
+
+            if (streaming) {
+                const { moves, ...result } = gameData;
+                sendEvent({ event: "result", ...result });
+                if (!res.destroyed) res.end();
+            } else {
                 res.json(gameData);
-            } catch (error) {
-                console.error("Error parsing game data:", error);
-                res.status(500).json({
-                    error: "Failed to parse game data",
-                    rawOutput: outputData,
-                });
             }
         });
     } catch (error) {
@@ -1144,11 +1553,18 @@ app.put("/api/admin/users/:userId", authenticateAdmin, async (req, res) => {
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 player1 TEXT NOT NULL,
                 player2 TEXT NOT NULL,
+                player1_piece TEXT,
                 winner TEXT,
                 moves TEXT,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         `);
+        // Tables created before seats were recorded lack player1_piece;
+        // their rows keep NULL there
+        const columns = await dbAll("PRAGMA table_info(game_history)");
+        if (!columns.some((column) => column.name === "player1_piece")) {
+            await dbRun("ALTER TABLE game_history ADD COLUMN player1_piece TEXT");
+        }
         console.log("Game history table initialized");
     } catch (error) {
         console.error("Error initializing game history table:", error);
@@ -1222,6 +1638,7 @@ app.put(
                 classroom || null,
                 userId,
             ]);
+            forgetUserClassroom(userId);
 
             res.json({ success: true });
         } catch (error) {
@@ -1240,20 +1657,6 @@ app.post("/api/admin/start-tournament", authenticateAdmin, async (req, res) => {
             return res.status(400).json({ error: "Room ID is required" });
         }
 
-        // Begin transaction
-        await dbRun("BEGIN TRANSACTION");
-
-        // Delete any existing tournaments for this room
-        await dbRun(
-            "DELETE FROM tournament_results WHERE tournament_id IN (SELECT id FROM tournaments WHERE room_id = ?)",
-            [roomId],
-        );
-        await dbRun(
-            "DELETE FROM tournament_matches WHERE tournament_id IN (SELECT id FROM tournaments WHERE room_id = ?)",
-            [roomId],
-        );
-        await dbRun("DELETE FROM tournaments WHERE room_id = ?", [roomId]);
-
         // Get all programs whose owners belong to this classroom
         const programs = await dbAll(
             `
@@ -1266,7 +1669,6 @@ app.post("/api/admin/start-tournament", authenticateAdmin, async (req, res) => {
         );
 
         if (programs.length < 2) {
-            await dbRun("ROLLBACK");
             return res
                 .status(400)
                 .json({
@@ -1278,52 +1680,66 @@ app.post("/api/admin/start-tournament", authenticateAdmin, async (req, res) => {
         const gamesPerPair = 10; // 5 as O, 5 as X
         const totalMatches =
             ((programs.length * (programs.length - 1)) / 2) * gamesPerPair;
-
-        // Create tournament record
-        const tournamentResult = await dbRun(
-            "INSERT INTO tournaments (room_id, status, total_matches, completed_matches) VALUES (?, ?, ?, ?)",
-            [roomId, "in_progress", totalMatches, 0],
-        );
-
-        const tournamentId = tournamentResult.id;
-
-        // Schedule all matches
         const programNames = programs.map((p) => p.name);
 
-        // Create matches (each program vs every other program, 10 times)
-        for (let i = 0; i < programNames.length; i++) {
-            for (let j = i + 1; j < programNames.length; j++) {
-                const player1 = programNames[i];
-                const player2 = programNames[j];
-
-                // 5 games with player1 as O (first parameter)
-                for (let game = 0; game < 5; game++) {
-                    await dbRun(
-                        "INSERT INTO tournament_matches (tournament_id, player1, player2, player1_piece, status) VALUES (?, ?, ?, ?, ?)",
-                        [tournamentId, player1, player2, "O", "pending"],
-                    );
-                }
+        const { tournamentId, oldTournaments } = await dbTransaction(async ({ dbRun, dbAll, dbInsertMany }) => {
+            // Delete any existing tournaments for this room
+            const oldTournaments = await dbAll(
+                "SELECT id FROM tournaments WHERE room_id = ?",
+                [roomId],
+            );
+            await dbRun(
+                "DELETE FROM tournament_results WHERE tournament_id IN (SELECT id FROM tournaments WHERE room_id = ?)",
+                [roomId],
+            );
+            await dbRun(
+                "DELETE FROM tournament_matches WHERE tournament_id IN (SELECT id FROM tournaments WHERE room_id = ?)",
+                [roomId],
+            );
+            await dbRun("DELETE FROM tournaments WHERE room_id = ?", [roomId]);
 
-                // 5 games with player2 as O (first parameter)
-                for (let game = 0; game < 5; game++) {
-                    await dbRun(
-                        "INSERT INTO tournament_matches (tournament_id, player1, player2, player1_piece, status) VALUES (?, ?, ?, ?, ?)",
-                        [tournamentId, player2, player1, "O", "pending"],
-                    );
+            // Create tournament record
+            const tournamentResult = await dbRun(
+                "INSERT INTO tournaments (room_id, status, total_matches, completed_matches) VALUES (?, ?, ?, ?)",
+                [roomId, "in_progress", totalMatches, 0],
+            );
+            const tournamentId = tournamentResult.id;
+
+            // Schedule all matches: each program vs every other program,
+            // 5 games with each of them as O (the first player)
+            const matchRows = [];
+            for (let i = 0; i < programNames.length; i++) {
+                for (let j = i + 1; j < programNames.length; j++) {
+                    const player1 = programNames[i];
+                    const player2 = programNames[j];
+                    for (let game = 0; game < 5; game++) {
+                        matchRows.push([tournamentId, player1, player2, "O", "pending"]);
+                    }
+                    for (let game = 0; game < 5; game++) {
+                        matchRows.push([tournamentId, player2, player1, "O", "pending"]);
+                    }
                 }
             }
-        }
+            await dbInsertMany(
+                "tournament_matches",
+                ["tournament_id", "player1", "player2", "player1_piece", "status"],
+                matchRows,
+            );
 
-        // Initialize results table with all players
-        for (const program of programNames) {
-            await dbRun(
-                "INSERT INTO tournament_results (tournament_id, player) VALUES (?, ?)",
-                [tournamentId, program],
+            // Initialize results table with all players
+            await dbInsertMany(
+                "tournament_results",
+                ["tournament_id", "player"],
+                programNames.map((program) => [tournamentId, program]),
             );
-        }
 
-        // Commit transaction
-        await dbRun("COMMIT");
+            return { tournamentId, oldTournaments };
+        });
+
+        invalidateClassroom(roomId);
+        for (const { id } of oldTournaments) {
+            await fs.promises.rm(tournamentJournal(id), { force: true });
+        }
 
         // Start the tournament in the background
         startTournamentGames(tournamentId);
@@ -1336,8 +1752,6 @@ app.post("/api/admin/start-tournament", authenticateAdmin, async (req, res) => {
             programs: programNames,
         });
     } catch (error) {
-        // Rollback on error
-        await dbRun("ROLLBACK");
         console.error("Error starting tournament:", error);
         res.status(500).json({ error: "Failed to start tournament" });
     }
@@ -1345,6 +1759,13 @@ app.post("/api/admin/start-tournament", authenticateAdmin, async (req, res) => {
 
 async function startTournamentGames(tournamentId) {
     try {
+        if (TOURNAMENT_QUEUE) {
+            console.log(
+                `Tournament ${tournamentId} queued for playing_programs/worker.py`,
+            );
+            return;
+        }
+
         console.log(
             `Starting tournament games for tournament ID ${tournamentId}`,
         );
@@ -1357,181 +1778,381 @@ async function startTournamentGames(tournamentId) {
 
         console.log(`Found ${matches.length} pending matches`);
 
-        // Process matches one by one
-        for (const match of matches) {
-            try {
-                console.log(
-                    `Processing match: ${match.player1} vs ${match.player2}, ${match.player1} plays as ${match.player1_piece}`,
-                );
-
-                // Update match status to in_progress
-                await dbRun(
-                    'UPDATE tournament_matches SET status = "in_progress" WHERE id = ?',
-                    [match.id],
-                );
+        if (matches.length === 0) {
+            return;
+        }
 
-                // Run the actual game between the two programs
-                const gameResult = await runBotGame(
-                    match.player1,
-                    match.player2,
-                );
+        await dbRun(
+            'UPDATE tournament_matches SET status = "in_progress" WHERE tournament_id = ? AND status = "pending"',
+            [tournamentId],
+        );
 
-                // ADD DEBUGGING HERE
-                console.log(`Game result for match ${match.id}:`, {
-                    winner: gameResult.winner,
-                    success: gameResult.success,
-                    moves: gameResult.moves ? gameResult.moves.length : 0,
-                    fullResult: gameResult,
-                });
+        // Play all matches concurrently in one batch judge; results are
+        // buffered as they stream in and written in batches
+        const matchesById = new Map(matches.map((match) => [match.id, match]));
+        const recorder = tournamentRecorder(tournamentId);
 
-                // Determine the winner based on the symbol returned
-                let winner = null;
-                if (gameResult.winner === "O") {
-                    winner = match.player1; // First player was O
-                    console.log(`Winner determined: ${winner} (O)`);
-                } else if (gameResult.winner === "X") {
-                    winner = match.player2; // Second player was X
-                    console.log(`Winner determined: ${winner} (X)`);
-                } else if (gameResult.winner === "_") {
-                    winner = "both";
-                    console.log("draw");
-                } else {
-                    console.log(
-                        `No winner - draw or error. gameResult.winner = ${gameResult.winner}`,
-                    );
-                }
+        await runBotGamesBatch(matches, tournamentJournal(tournamentId), (gameResult) => {
+            const match = matchesById.get(gameResult.id);
+            if (!match) {
+                console.error("Result for unknown match:", gameResult);
+                return;
+            }
+            matchesById.delete(gameResult.id);
+            recorder.add(match, gameResult);
+        });
 
-                // Update match with results
-                await dbRun(
-                    `UPDATE tournament_matches
-                     SET winner = ?,
-                         moves = ?,
-                         status = "completed",
-                         completed_at = CURRENT_TIMESTAMP
-                     WHERE id = ?`,
-                    [winner, JSON.stringify(gameResult.moves || []), match.id],
-                );
+        // Matches the judge never reported on count as failed
+        for (const match of matchesById.values()) {
+            recorder.add(match, { error: "No result from judge" });
+        }
+        await recorder.close();
 
-                console.log(`Match ${match.id} updated with winner: ${winner}`);
+        console.log(`Tournament ${tournamentId} processing completed`);
+    } catch (error) {
+        console.error(`Error processing tournament ${tournamentId}:`, error);
+    }
+}
 
-                // Rest of the function stays the same...
-                // Update tournament results with scoring
-                if (winner === "both") { // winner === '_' i.e. draw
-                    await dbRun(
-                        "UPDATE tournament_results SET draws = draws + 1, points = points + 1 WHERE tournament_id = ? AND player = ?",
-                        [tournamentId, match.player1],
-                    );
-                    await dbRun(
-                        "UPDATE tournament_results SET draws = draws + 1, points = points + 1 WHERE tournament_id = ? AND player = ?",
-                        [tournamentId, match.player2],
-                    );
-                } else if (winner) {
-                    await dbRun(
-                        "UPDATE tournament_results SET wins = wins + 1, points = points + 3 WHERE tournament_id = ? AND player = ?",
-                        [tournamentId, winner],
-                    );
+// Results are written in batches: every RESULT_FLUSH_MS, or once
+// RESULT_FLUSH_SIZE results are waiting, one transaction stores the finished
+// matches together with the summed score changes of their players and the
+// tournament's progress. Results lost to a crash before their flush are
+// still in the tournament journal and are reported again on resume.
+const RESULT_FLUSH_MS = 1000;
+const RESULT_FLUSH_SIZE = 200;
+
+// Winner name ("both" for a draw, null if none) and final status of a match
+function matchOutcome(match, gameResult) {
+    if (gameResult.error) {
+        console.error(`Error processing match ${match.id}:`, gameResult.error);
+        return { winner: null, status: "failed" };
+    }
+    if (gameResult.skipped) {
+        return { winner: null, status: "skipped" };
+    }
 
-                    const loser =
-                        winner === match.player1
-                            ? match.player2
-                            : match.player1;
-                    await dbRun(
-                        "UPDATE tournament_results SET losses = losses + 1 WHERE tournament_id = ? AND player = ?",
-                        [tournamentId, loser],
-                    );
-                }
+    // Determine the winner based on the symbol returned; after a swap
+    // opening the first player ended up with the X stones
+    const firstSymbol = gameResult.swapped ? "X" : "O";
+    let winner = null;
+    if (gameResult.winner === firstSymbol) {
+        winner = match.player1;
+    } else if (gameResult.winner === "O" || gameResult.winner === "X") {
+        winner = match.player2;
+    } else if (gameResult.winner === "_") {
+        winner = "both";
+    } else {
+        console.log(
+            `No winner - draw or error. gameResult.winner = ${gameResult.winner}`,
+        );
+    }
+    return { winner, status: "completed" };
+}
 
-                await dbRun(
-                    "UPDATE tournaments SET completed_matches = completed_matches + 1 WHERE id = ?",
-                    [tournamentId],
+function tournamentRecorder(tournamentId) {
+    let pending = [];
+    let timer = null;
+    let writing = Promise.resolve();
+
+    const flush = () => {
+        clearTimeout(timer);
+        timer = null;
+        const batch = pending;
+        pending = [];
+        if (batch.length > 0) {
+            writing = writing
+                .then(() => writeMatchResults(tournamentId, batch))
+                .catch((error) =>
+                    console.error(
+                        `Error recording results of tournament ${tournamentId}:`,
+                        error,
+                    ),
                 );
+        }
+        return writing;
+    };
+
+    return {
+        add(match, gameResult) {
+            pending.push({ match, gameResult });
+            if (pending.length >= RESULT_FLUSH_SIZE) {
+                flush();
+            } else if (!timer) {
+                timer = setTimeout(flush, RESULT_FLUSH_MS);
+            }
+        },
+        close: flush,
+    };
+}
 
-                const tournament = await dbGet(
-                    "SELECT * FROM tournaments WHERE id = ?",
-                    [tournamentId],
-                );
+async function writeMatchResults(tournamentId, batch) {
+    // Score changes per player: a win is 3 points, a draw 1
+    const deltas = new Map();
+    const delta = (player) => {
+        if (!deltas.has(player)) {
+            deltas.set(player, { wins: 0, losses: 0, draws: 0, points: 0 });
+        }
+        return deltas.get(player);
+    };
+
+    const updates = batch.map(({ match, gameResult }) => {
+        const { winner, status } = matchOutcome(match, gameResult);
+        if (winner === "both") {
+            for (const player of [match.player1, match.player2]) {
+                delta(player).draws += 1;
+                delta(player).points += 1;
+            }
+        } else if (winner) {
+            const loser =
+                winner === match.player1 ? match.player2 : match.player1;
+            delta(winner).wins += 1;
+            delta(winner).points += 3;
+            delta(loser).losses += 1;
+        }
+        const moves = status === "completed" ? JSON.stringify(gameResult.moves || []) : null;
+        return [winner, moves, status, gameResult.swapped ? 1 : 0, match.id];
+    });
 
-                if (tournament.completed_matches >= tournament.total_matches) {
-                    await dbRun(
-                        'UPDATE tournaments SET status = "completed", completed_at = CURRENT_TIMESTAMP WHERE id = ?',
-                        [tournamentId],
-                    );
-                }
+    const tournament = await dbTransaction(async ({ dbRun, dbGet }) => {
+        for (const update of updates) {
+            await dbRun(
+                `UPDATE tournament_matches
+                 SET winner = ?,
+                     moves = COALESCE(?, moves),
+                     status = ?,
+                     player1_piece = CASE WHEN ? THEN (CASE player1_piece WHEN 'X' THEN 'O' ELSE 'X' END)
+                                          ELSE player1_piece END,
+                     completed_at = CURRENT_TIMESTAMP
+                 WHERE id = ?`,
+                update,
+            );
+        }
+        for (const [player, { wins, losses, draws, points }] of deltas) {
+            await dbRun(
+                `UPDATE tournament_results
+                 SET wins = wins + ?, losses = losses + ?, draws = draws + ?, points = points + ?
+                 WHERE tournament_id = ? AND player = ?`,
+                [wins, losses, draws, points, tournamentId, player],
+            );
+        }
+        await dbRun(
+            `UPDATE tournaments
+             SET completed_matches = completed_matches + ?,
+                 status = CASE WHEN completed_matches + ? >= total_matches THEN "completed" ELSE status END,
+                 completed_at = CASE WHEN completed_matches + ? >= total_matches THEN CURRENT_TIMESTAMP ELSE completed_at END
+             WHERE id = ?`,
+            [batch.length, batch.length, batch.length, tournamentId],
+        );
+        return dbGet("SELECT * FROM tournaments WHERE id = ?", [tournamentId]);
+    });
 
-                console.log(
-                    `Match completed: ${match.player1} vs ${match.player2}, winner: ${winner || "draw"}`,
-                );
-            } catch (matchError) {
-                console.error(
-                    `Error processing match ${match.id}:`,
-                    matchError,
-                );
+    console.log(
+        `Recorded ${batch.length} match results for tournament ${tournamentId}`,
+    );
+    applyToLeaderboards(
+        tournament,
+        updates.map(([, , status]) => status),
+        deltas,
+    );
+    schedulePositionIndexUpdate();
+    if (tournament && tournament.status === "completed") {
+        await fs.promises.rm(tournamentJournal(tournamentId), { force: true });
+        updateBotStats(tournamentId);
+    }
+}
 
-                await dbRun(
-                    'UPDATE tournament_matches SET status = "failed" WHERE id = ?',
-                    [match.id],
-                );
+// Bot statistics of a finished tournament, computed by analytics.py; a
+// tournament finished by workers gets them on its first leaderboard request.
+// Each tournament is analysed at most once per server run, so a failing run
+// or a tournament without analysable games is not retried on every read.
+const botStatsRuns = new Set();
 
-                await dbRun(
-                    "UPDATE tournaments SET completed_matches = completed_matches + 1 WHERE id = ?",
-                    [tournamentId],
-                );
-            }
+function updateBotStats(tournamentId) {
+    if (botStatsRuns.has(tournamentId)) {
+        return;
+    }
+    botStatsRuns.add(tournamentId);
+
+    const analytics = spawn(
+        "python3",
+        [
+            path.join(playingDir, "analytics.py"),
+            "--tournament",
+            String(tournamentId),
+        ],
+        { cwd: playingDir },
+    );
+    analytics.stderr.on("data", (data) => {
+        console.log(`Bot statistics debug: ${data.toString()}`);
+    });
+    const finished = (error) => {
+        if (error) {
+            console.error(`Error computing bot statistics of tournament ${tournamentId}:`, error);
         }
+        refreshLeaderboardStats(tournamentId);
+    };
+    analytics.on("error", finished);
+    analytics.on("close", (code) =>
+        finished(code ? new Error(`analytics.py exited with code ${code}`) : null),
+    );
+}
 
-        console.log(`Tournament ${tournamentId} processing completed`);
-    } catch (error) {
-        console.error(`Error processing tournament ${tournamentId}:`, error);
+// The position index catches up with new games a few seconds after they
+// are stored, one positions.py run at a time
+const POSITION_INDEX_DELAY = 5000;
+const positionIndex = { timer: null, running: false, again: false };
+
+function schedulePositionIndexUpdate() {
+    if (!positionIndex.timer) {
+        positionIndex.timer = setTimeout(updatePositionIndex, POSITION_INDEX_DELAY);
+    }
+}
+
+function updatePositionIndex() {
+    positionIndex.timer = null;
+    if (positionIndex.running) {
+        positionIndex.again = true;
+        return;
+    }
+    positionIndex.running = true;
+
+    const indexer = spawn(
+        "python3",
+        [
+            path.join(playingDir, "positions.py"),
+            "--index",
+            positionIndexPath,
+            "update",
+        ],
+        { cwd: playingDir },
+    );
+    indexer.stderr.on("data", (data) => {
+        console.log(`Position index debug: ${data.toString()}`);
+    });
+    const finished = (error) => {
+        if (error) {
+            console.error("Error updating position index:", error);
+        }
+        positionIndex.running = false;
+        if (positionIndex.again) {
+            positionIndex.again = false;
+            schedulePositionIndexUpdate();
+        }
+    };
+    indexer.on("error", finished);
+    indexer.on("close", (code) =>
+        finished(code ? new Error(`positions.py exited with code ${code}`) : null),
+    );
+}
+
+// Tournaments interrupted by a restart: their unrecorded matches go back to
+// pending and are handed to the judge again together with the journal, which
+// reports the games it already finished and plays only the rest. Queued
+// tournaments need nothing: workers take over matches whose lease ran out.
+async function resumeTournaments() {
+    if (TOURNAMENT_QUEUE) {
+        return;
+    }
+    const tournaments = await dbAll(
+        'SELECT id FROM tournaments WHERE status = "in_progress"',
+    );
+    for (const { id } of tournaments) {
+        const { changes } = await dbRun(
+            'UPDATE tournament_matches SET status = "pending" WHERE tournament_id = ? AND status = "in_progress"',
+            [id],
+        );
+        console.log(`Resuming tournament ${id} (${changes} unfinished matches)`);
+        await startTournamentGames(id);
     }
 }
 
-function runBotGame(player_O, player_X) {
+// Number of games the batch judge plays at the same time
+const TOURNAMENT_WORKERS = parseInt(process.env.TOURNAMENT_WORKERS, 10) ||
+    os.cpus().length;
+
+// With TOURNAMENT_EARLY_STOP=1 tournaments go through scheduler.py, which
+// stops a pairing once one bot clearly dominates; the rest of its games are
+// stored as skipped and score nothing, so standings are ranked by points per
+// game (see pointsPerGame)
+const TOURNAMENT_EARLY_STOP = process.env.TOURNAMENT_EARLY_STOP === "1";
+
+// With TOURNAMENT_QUEUE=1 the server only schedules tournaments; their
+// matches are claimed and played by any number of worker.py processes
+// sharing the database
+const TOURNAMENT_QUEUE = process.env.TOURNAMENT_QUEUE === "1";
+
+// JUDGE_METRICS=<file> makes the tournament judge record per-game metrics
+// (think time per move, judge overhead, bot CPU time and peak RSS, how each
+// game ended); Prometheus text for *.prom files, NDJSON otherwise. The judge
+// daemon inherits the variable and records interactive games there too.
+const JUDGE_METRICS = process.env.JUDGE_METRICS;
+
+// Plays all matches in one bot_interactive_judge.py process and calls
+// onResult for every finished game (results arrive in completion order).
+// Games already in the journal are reported from it without being replayed.
+function runBotGamesBatch(matches, journalPath, onResult) {
     return new Promise((resolve, reject) => {
-        try {
-            console.log(`Running bot game: ${player_O} (O) vs ${player_X} (X)`);
-
-            const gameProcess = spawn(
-                "python3",
-                [
-                    path.join(playingDir, "bot_interactive_judge.py"),
-                    player_O, // First parameter is always O
-                    player_X, // Second parameter is always X
-                    "O", // This indicates first player is O
-                ],
-                { cwd: playingDir },
-            );
+        console.log(
+            `Running ${matches.length} bot games on ${TOURNAMENT_WORKERS} workers`,
+        );
 
-            let outputData = "";
+        const args = TOURNAMENT_EARLY_STOP
+            ? [path.join(playingDir, "scheduler.py")]
+            : [path.join(playingDir, "bot_interactive_judge.py"), "--batch"];
 
-            gameProcess.stdout.on("data", (data) => {
-                outputData += data.toString();
-            });
+        const gameProcess = spawn(
+            "python3",
+            [
+                ...args,
+                "--workers",
+                String(TOURNAMENT_WORKERS),
+                "--cache",
+                gameCachePath,
+                "--journal",
+                journalPath,
+                ...(JUDGE_METRICS ? ["--metrics", JUDGE_METRICS] : []),
+            ],
+            { cwd: playingDir },
+        );
 
-            gameProcess.stderr.on("data", (data) => {
-                console.log(`Bot game debug: ${data.toString()}`);
-            });
+        let pending = "";
 
-            gameProcess.on("close", (code) => {
+        gameProcess.stdout.on("data", (data) => {
+            pending += data.toString();
+            const lines = pending.split("\n");
+            pending = lines.pop();
+
+            for (const line of lines) {
+                if (!line.trim()) continue;
                 try {
-                    const gameData = JSON.parse(outputData);
-                    resolve(gameData);
+                    onResult(JSON.parse(line));
                 } catch (error) {
-                    reject(
-                        new Error(
-                            `Failed to parse game data: ${error.message}, raw output: ${outputData}`,
-                        ),
-                    );
+                    console.error("Invalid batch judge output:", line);
                 }
-            });
+            }
+        });
 
-            // Add timeout to prevent hanging
-            setTimeout(() => {
-                gameProcess.kill();
-                reject(new Error("Game timeout"));
-            }, 20000); // 30 second timeout
-        } catch (error) {
-            reject(error);
+        gameProcess.stderr.on("data", (data) => {
+            console.log(`Bot game debug: ${data.toString()}`);
+        });
+
+        gameProcess.on("error", reject);
+        gameProcess.on("close", (code) => {
+            console.log("Batch judge closed with code:", code);
+            resolve();
+        });
+
+        for (const match of matches) {
+            gameProcess.stdin.write(
+                JSON.stringify({
+                    id: match.id,
+                    player_O: match.player1,
+                    player_X: match.player2,
+                }) + "\n",
+            );
         }
+        gameProcess.stdin.end();
     });
 }
 
@@ -1594,11 +2215,11 @@ app.get(
                 return res.status(404).json({ error: "Tournament not found" });
             }
 
-            // Get results sorted by points (leaderboard)
+            // Get results sorted by points per game (leaderboard)
             const results = await dbAll(
                 `SELECT * FROM tournament_results
              WHERE tournament_id = ?
-             ORDER BY points DESC, wins DESC`,
+             ORDER BY points * 1.0 / MAX(wins + draws + losses, 1) DESC, points DESC, wins DESC`,
                 [id],
             );
 
@@ -1622,34 +2243,29 @@ app.delete(
         try {
             const { id } = req.params;
 
-            // Begin transaction
-            await dbRun("BEGIN TRANSACTION");
-
-            // Delete tournament matches
-            await dbRun(
-                "DELETE FROM tournament_matches WHERE tournament_id = ?",
-                [id],
-            );
-
-            // Delete tournament results
-            await dbRun(
-                "DELETE FROM tournament_results WHERE tournament_id = ?",
-                [id],
-            );
+            await dbTransaction(async ({ dbRun }) => {
+                // Delete tournament matches
+                await dbRun(
+                    "DELETE FROM tournament_matches WHERE tournament_id = ?",
+                    [id],
+                );
 
-            // Delete the tournament itself
-            await dbRun("DELETE FROM tournaments WHERE id = ?", [id]);
+                // Delete tournament results
+                await dbRun(
+                    "DELETE FROM tournament_results WHERE tournament_id = ?",
+                    [id],
+                );
 
-            // Commit transaction
-            await dbRun("COMMIT");
+                // Delete the tournament itself
+                await dbRun("DELETE FROM tournaments WHERE id = ?", [id]);
+            });
+            invalidateTournament(id);
 
             res.json({
                 success: true,
                 message: "Tournament deleted successfully",
             });
         } catch (error) {
-            // Rollback on error
-            await dbRun("ROLLBACK");
             console.error("Error deleting tournament:", error);
             res.status(500).json({ error: "Failed to delete tournament" });
         }
@@ -1676,84 +2292,283 @@ app.get(
     },
 );
 
-app.get("/api/classroom/leaderboard", authenticate, async (req, res) => {
-    try {
-        // Get user's classroom
-        const user = await dbGet("SELECT classroom FROM users WHERE id = ?", [
-            req.user.id,
-        ]);
+// Classroom leaderboards and tournament lists are served from memory. A
+// classroom's entry holds its tournaments with the standings of the latest
+// completed one and of those still running. The tournament runner applies
+// every batch of results it writes to the entry, so the rush of refreshes
+// after a tournament ends is answered without touching the database.
+// Starting or deleting a tournament drops the entry. Queue workers
+// (TOURNAMENT_QUEUE=1) write results behind the server's back, so with them
+// an entry is only trusted for LEADERBOARD_QUEUE_TTL.
+const LEADERBOARD_QUEUE_TTL = 5000;
+const leaderboardCache = {
+    rooms: new Map(), // classroom -> entry
+    classrooms: new Map(), // user id -> classroom
+    loading: new Map(), // classroom -> promise of its entry
+    generation: 0, // bumped by every change, so loads racing one are not kept
+    hits: 0,
+    misses: 0,
+    updates: 0,
+    invalidations: 0,
+};
 
-        if (!user || !user.classroom) {
-            return res.json({
-                success: false,
-                message: "Nie jesteś przypisany do żadnej klasy",
-            });
-        }
+async function userClassroom(userId) {
+    const key = String(userId);
+    if (leaderboardCache.classrooms.has(key)) {
+        return leaderboardCache.classrooms.get(key);
+    }
+    const user = await dbGet("SELECT classroom FROM users WHERE id = ?", [userId]);
+    const classroom = user ? user.classroom : null;
+    leaderboardCache.classrooms.set(key, classroom);
+    return classroom;
+}
 
-        // Get the most recent completed tournament for this classroom
-        const latestTournament = await dbGet(
-            `
-            SELECT * FROM tournaments
-            WHERE room_id = ? AND status = 'completed'
-            ORDER BY completed_at DESC
-            LIMIT 1
-        `,
-            [user.classroom],
+function forgetUserClassroom(userId) {
+    leaderboardCache.classrooms.delete(String(userId));
+}
+
+async function classroomEntry(classroom) {
+    const cached = leaderboardCache.rooms.get(classroom);
+    if (cached && (!cached.expires || cached.expires > Date.now())) {
+        leaderboardCache.hits++;
+        return cached;
+    }
+    leaderboardCache.misses++;
+    // Concurrent misses of one classroom share a single load
+    if (!leaderboardCache.loading.has(classroom)) {
+        leaderboardCache.loading.set(
+            classroom,
+            loadClassroomEntry(classroom).finally(() =>
+                leaderboardCache.loading.delete(classroom),
+            ),
         );
+    }
+    return leaderboardCache.loading.get(classroom);
+}
+
+async function loadClassroomEntry(classroom) {
+    const generation = leaderboardCache.generation;
+    const tournaments = await dbAll(
+        "SELECT * FROM tournaments WHERE room_id = ? ORDER BY created_at DESC",
+        [classroom],
+    );
+    const latest = latestCompleted(tournaments);
+    const standings = new Map();
+    for (const tournament of tournaments) {
+        if (tournament === latest || tournament.status === "in_progress") {
+            standings.set(tournament.id, await loadStandings(tournament.id));
+        }
+    }
+
+    const entry = {
+        tournaments,
+        standings,
+        expires: TOURNAMENT_QUEUE ? Date.now() + LEADERBOARD_QUEUE_TTL : null,
+        leaderboard: null, // response bodies, built on first read
+        tournamentList: null,
+    };
+    if (generation === leaderboardCache.generation) {
+        leaderboardCache.rooms.set(classroom, entry);
+    }
+    return entry;
+}
+
+async function loadStandings(tournamentId) {
+    const results = await dbAll(
+        "SELECT player, wins, losses, draws, points FROM tournament_results WHERE tournament_id = ?",
+        [tournamentId],
+    );
+    const matches = await dbGet(
+        `
+        SELECT
+            COUNT(*) as total,
+            COUNT(CASE WHEN status = 'completed' THEN 1 END) as completed,
+            COUNT(CASE WHEN status = 'failed' THEN 1 END) as failed,
+            COUNT(CASE WHEN status = 'skipped' THEN 1 END) as skipped
+        FROM tournament_matches
+        WHERE tournament_id = ?
+    `,
+        [tournamentId],
+    );
+    return {
+        results: new Map(results.map((result) => [result.player, result])),
+        matches,
+        stats: await loadBotStats(tournamentId),
+    };
+}
+
+async function loadBotStats(tournamentId) {
+    const rows = await dbAll(
+        `SELECT player, games_as_o, wins_as_o, games_as_x, wins_as_x, avg_plies,
+                win_chances, missed_wins, block_chances, missed_blocks
+         FROM bot_stats WHERE tournament_id = ?`,
+        [tournamentId],
+    );
+    return new Map(rows.map(({ player, ...row }) => [player, row]));
+}
+
+function latestCompleted(tournaments) {
+    let latest = null;
+    for (const tournament of tournaments) {
+        if (
+            tournament.status === "completed" &&
+            (!latest || tournament.completed_at > latest.completed_at)
+        ) {
+            latest = tournament;
+        }
+    }
+    return latest;
+}
+
+function invalidateClassroom(classroom) {
+    leaderboardCache.generation++;
+    if (leaderboardCache.rooms.delete(classroom)) {
+        leaderboardCache.invalidations++;
+    }
+}
+
+function invalidateTournament(tournamentId) {
+    for (const [classroom, entry] of leaderboardCache.rooms) {
+        if (entry.tournaments.some((t) => t.id === Number(tournamentId))) {
+            invalidateClassroom(classroom);
+        }
+    }
+    leaderboardCache.generation++;
+}
+
+// Applies a written batch of match results: the tournament's fresh row, the
+// batch's match statuses and the summed score changes per player
+function applyToLeaderboards(tournament, statuses, deltas) {
+    leaderboardCache.generation++;
+    const entry = tournament && leaderboardCache.rooms.get(tournament.room_id);
+    if (!entry) {
+        return;
+    }
+    const index = entry.tournaments.findIndex((t) => t.id === tournament.id);
+    const standings = entry.standings.get(tournament.id);
+    if (index === -1 || !standings) {
+        return invalidateClassroom(tournament.room_id);
+    }
+
+    entry.tournaments[index] = tournament;
+    for (const status of statuses) {
+        if (status in standings.matches) {
+            standings.matches[status]++;
+        }
+    }
+    for (const [player, delta] of deltas) {
+        const result = standings.results.get(player);
+        if (result) {
+            for (const key of ["wins", "losses", "draws", "points"]) {
+                result[key] += delta[key];
+            }
+        }
+    }
+    entry.leaderboard = null;
+    entry.tournamentList = null;
+    leaderboardCache.updates++;
+}
+
+async function refreshLeaderboardStats(tournamentId) {
+    try {
+        const stats = await loadBotStats(tournamentId);
+        for (const entry of leaderboardCache.rooms.values()) {
+            const standings = entry.standings.get(tournamentId);
+            if (standings) {
+                standings.stats = stats;
+                entry.leaderboard = null;
+            }
+        }
+    } catch (error) {
+        console.error("Error refreshing leaderboard statistics:", error);
+    }
+}
+
+function leaderboardResponse(classroom, entry) {
+    const latest = latestCompleted(entry.tournaments);
+    if (!latest) {
+        return {
+            success: false,
+            message: "Brak zakończonych zawodów dla twojej klasy",
+        };
+    }
+
+    const { results, matches, stats } = entry.standings.get(latest.id);
+    if (stats.size === 0) {
+        updateBotStats(latest.id);
+    }
+    const sorted = [...results.values()].sort(
+        (a, b) =>
+            pointsPerGame(b) - pointsPerGame(a) || b.points - a.points || b.wins - a.wins,
+    );
+
+    return {
+        success: true,
+        classroom,
+        tournament: {
+            id: latest.id,
+            startDate: latest.created_at,
+            endDate: latest.completed_at,
+            totalMatches: matches.total,
+            completedMatches: matches.completed,
+            failedMatches: matches.failed,
+            skippedMatches: matches.skipped,
+        },
+        leaderboard: sorted.map((result, index) => ({
+            position: index + 1,
+            player: result.player,
+            points: result.points,
+            pointsPerGame: Math.round(pointsPerGame(result) * 100) / 100,
+            wins: result.wins,
+            draws: result.draws,
+            losses: result.losses,
+            matchesPlayed: result.wins + result.draws + result.losses,
+            stats: stats.get(result.player) || null,
+        })),
+    };
+}
+
+// Pairings stopped early by scheduler.py leave players with different
+// numbers of games, so standings compare points per game played
+function pointsPerGame(result) {
+    const games = result.wins + result.draws + result.losses;
+    return games > 0 ? result.points / games : 0;
+}
+
+function tournamentListResponse(classroom, entry) {
+    return {
+        success: true,
+        classroom,
+        tournaments: entry.tournaments.map((t) => ({
+            id: t.id,
+            status: t.status,
+            startDate: t.created_at,
+            endDate: t.completed_at,
+            totalMatches: t.total_matches,
+            completedMatches: t.completed_matches,
+            progress:
+                t.total_matches > 0
+                    ? Math.round((t.completed_matches / t.total_matches) * 100)
+                    : 0,
+        })),
+    };
+}
 
-        if (!latestTournament) {
+app.get("/api/classroom/leaderboard", authenticate, async (req, res) => {
+    try {
+        const classroom = await userClassroom(req.user.id);
+        if (!classroom) {
             return res.json({
                 success: false,
-                message: "Brak zakończonych zawodów dla twojej klasy",
+                message: "Nie jesteś przypisany do żadnej klasy",
             });
         }
 
-        // Get results for this tournament
-        const results = await dbAll(
-            `
-            SELECT tr.*, t.completed_at, t.created_at as tournament_start
-            FROM tournament_results tr
-            JOIN tournaments t ON tr.tournament_id = t.id
-            WHERE tr.tournament_id = ?
-            ORDER BY tr.points DESC, tr.wins DESC
-        `,
-            [latestTournament.id],
-        );
-
-        // Get tournament details including match statistics
-        const tournamentStats = await dbGet(
-            `
-            SELECT
-                COUNT(*) as total_matches,
-                COUNT(CASE WHEN status = 'completed' THEN 1 END) as completed_matches,
-                COUNT(CASE WHEN status = 'failed' THEN 1 END) as failed_matches
-            FROM tournament_matches
-            WHERE tournament_id = ?
-        `,
-            [latestTournament.id],
-        );
-
-        res.json({
-            success: true,
-            classroom: user.classroom,
-            tournament: {
-                id: latestTournament.id,
-                startDate: latestTournament.created_at,
-                endDate: latestTournament.completed_at,
-                totalMatches: tournamentStats.total_matches,
-                completedMatches: tournamentStats.completed_matches,
-                failedMatches: tournamentStats.failed_matches,
-            },
-            leaderboard: results.map((result, index) => ({
-                position: index + 1,
-                player: result.player,
-                points: result.points,
-                wins: result.wins,
-                draws: result.draws,
-                losses: result.losses,
-                matchesPlayed: result.wins + result.draws + result.losses,
-            })),
-        });
+        const entry = await classroomEntry(classroom);
+        if (!entry.leaderboard) {
+            entry.leaderboard = leaderboardResponse(classroom, entry);
+        }
+        res.json(entry.leaderboard);
     } catch (error) {
         console.error("Error fetching classroom leaderboard:", error);
         res.status(500).json({ error: "Failed to fetch leaderboard" });
@@ -1763,50 +2578,37 @@ app.get("/api/classroom/leaderboard", authenticate, async (req, res) => {
 // Get all tournaments for user's classroom (for history)
 app.get("/api/classroom/tournaments", authenticate, async (req, res) => {
     try {
-        const user = await dbGet("SELECT classroom FROM users WHERE id = ?", [
-            req.user.id,
-        ]);
-
-        if (!user || !user.classroom) {
+        const classroom = await userClassroom(req.user.id);
+        if (!classroom) {
             return res.json({
                 success: false,
                 message: "Nie jesteś przypisany do żadnej klasy",
             });
         }
 
-        const tournaments = await dbAll(
-            `
-            SELECT * FROM tournaments
-            WHERE room_id = ?
-            ORDER BY created_at DESC
-        `,
-            [user.classroom],
-        );
-
-        res.json({
-            success: true,
-            classroom: user.classroom,
-            tournaments: tournaments.map((t) => ({
-                id: t.id,
-                status: t.status,
-                startDate: t.created_at,
-                endDate: t.completed_at,
-                totalMatches: t.total_matches,
-                completedMatches: t.completed_matches,
-                progress:
-                    t.total_matches > 0
-                        ? Math.round(
-                              (t.completed_matches / t.total_matches) * 100,
-                          )
-                        : 0,
-            })),
-        });
+        const entry = await classroomEntry(classroom);
+        if (!entry.tournamentList) {
+            entry.tournamentList = tournamentListResponse(classroom, entry);
+        }
+        res.json(entry.tournamentList);
     } catch (error) {
         console.error("Error fetching classroom tournaments:", error);
         res.status(500).json({ error: "Failed to fetch tournaments" });
     }
 });
 
+app.get("/api/admin/leaderboard-cache", authenticateAdmin, (req, res) => {
+    const { rooms, classrooms, loading, generation, ...counts } = leaderboardCache;
+    const lookups = counts.hits + counts.misses;
+    res.json({
+        ...counts,
+        hitRate: lookups > 0 ? counts.hits / lookups : null,
+        classrooms: rooms.size,
+        users: classrooms.size,
+        loading: loading.size,
+    });
+});
+
 // Update user role (only for professor)
 app.put("/api/admin/users/:userId/role", authenticateAdmin, async (req, res) => {
     try {
@@ -1856,25 +2658,20 @@ app.delete("/api/admin/users/:userId", authenticateAdmin, async (req, res) => {
             return res.status(400).json({ error: "Cannot delete professor account" });
         }
 
-        // Begin transaction
-        await dbRun("BEGIN TRANSACTION");
+        await dbTransaction(async ({ dbRun }) => {
+            // Delete user's programs first
+            await dbRun("DELETE FROM programs WHERE owner_id = ?", [userId]);
 
-        // Delete user's programs first
-        await dbRun("DELETE FROM programs WHERE owner_id = ?", [userId]);
+            // Delete user's game history
+            await dbRun("DELETE FROM game_history WHERE player1 = ? OR player2 = ?", [targetUser.username, targetUser.username]);
 
-        // Delete user's game history
-        await dbRun("DELETE FROM game_history WHERE player1 = ? OR player2 = ?", [targetUser.username, targetUser.username]);
-
-        // Delete the user
-        await dbRun("DELETE FROM users WHERE id = ?", [userId]);
-
-        // Commit transaction
-        await dbRun("COMMIT");
+            // Delete the user
+            await dbRun("DELETE FROM users WHERE id = ?", [userId]);
+        });
+        forgetUserClassroom(userId);
 
         res.json({ success: true });
     } catch (error) {
-        // Rollback on error
-        await dbRun("ROLLBACK");
         console.error("Error deleting user:", error);
         res.status(500).json({ error: "Failed to delete user" });
     }
@@ -1890,6 +2687,12 @@ app.delete("/api/admin/users/:userId", authenticateAdmin, async (req, res) => {
             {
                 name: 'random',
                 filename: 'random.cpp'
+            },
+            {
+                // Python reference engine, linked rather than compiled
+                name: 'boss',
+                filename: 'engine.py',
+                script: true
             }
         ];
 
@@ -1904,11 +2707,18 @@ app.delete("/api/admin/users/:userId", authenticateAdmin, async (req, res) => {
             }
 
             try {
-                console.log(`Compiling default program: ${program.name}`);
-                await compileCode(sourceFile, compiledPath);
+                if (program.script) {
+                    await fs.promises.rm(compiledPath, { force: true });
+                    await fs.promises.symlink(program.filename, compiledPath);
+                } else {
+                    console.log(`Compiling default program: ${program.name}`);
+                    await compileCode(sourceFile, compiledPath);
+                }
 
                 await fs.promises.chmod(compiledPath, 0o755);
 
+                rewarmBot(program.name, true);
+
                 const code = await fs.promises.readFile(sourceFile, 'utf8');
 
                 const existingProgram = await dbGet(
@@ -1943,6 +2753,13 @@ app.delete("/api/admin/users/:userId", authenticateAdmin, async (req, res) => {
     } catch (error) {
         console.error("Error initializing default programs:", error);
     }
+
+    // Default programs are in place, so interrupted tournaments can go on
+    try {
+        await resumeTournaments();
+    } catch (error) {
+        console.error("Error resuming tournaments:", error);
+    }
 })();
 
 // const PORT = process.env.PORT || 4000;
@@ -1963,7 +2780,7 @@ if (process.env.NODE_ENV === "production") {
             ),
         };
 
-        https.createServer(httpsOptions, app).listen(443, () => {
+        acceptGameSockets(https.createServer(httpsOptions, app)).listen(443, () => {
             console.log("HTTPS Server running on port 443");
         });
 
@@ -1981,13 +2798,13 @@ if (process.env.NODE_ENV === "production") {
     } catch (error) {
         console.error("Failed to start HTTPS server:", error);
         console.log("Falling back to HTTP on port 4000");
-        app.listen(4000, () => {
+        acceptGameSockets(app.listen(4000, () => {
             console.log("Server running on port 4000");
-        });
+        }));
     }
 } else {
     // Development server
-    app.listen(4000, () => {
+    acceptGameSockets(app.listen(4000, () => {
         console.log("Development server running on port 4000");
-    });
+    }));
 }